@@ -0,0 +1,256 @@
+"""Cache for ``BreakEvenResponse`` keyed by ``YYYY-MM``.
+
+Break-even figures only change when ``fixed_costs`` or ``sales_data`` rows of
+that month change. Those writes are detected with SQLAlchemy session events and
+the affected months are dropped from the cache once the transaction commits.
+
+Each month also has a generation that invalidation bumps. ``get`` returns the
+generation seen before the lookup and ``set`` stores nothing if it has moved
+on since, so a request that read the totals just before a commit cannot put
+them back after the commit invalidated the month.
+
+The default backend is an in-process LRU with TTL. Set
+``PRICING_CACHE_REDIS_URL`` to share entries between workers through any
+Redis-compatible server (requires the ``redis`` package).
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Callable, Dict, Iterable, Optional, Protocol, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from .config import get_settings
+from .models import FixedCost, SalesData
+from .schemas import BreakEvenResponse
+
+_PENDING_MONTHS_KEY = "break_even_cache_pending_months"
+
+
+class CacheBackend(Protocol):
+    def get(self, key: str) -> Optional[str]: ...
+
+    def generation(self, key: str) -> int: ...
+
+    def set(self, key: str, value: str, generation: Optional[int] = None) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+class LocalTTLBackend:
+    """Thread-safe LRU with per-entry expiry."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def generation(self, key: str) -> int:
+        with self._lock:
+            return self._generations.get(key, 0)
+
+    def set(self, key: str, value: str, generation: Optional[int] = None) -> None:
+        with self._lock:
+            if generation is not None and generation != self._generations.get(key, 0):
+                return
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Shared backend for any server speaking the Redis protocol."""
+
+    def __init__(self, url: str, ttl_seconds: float, prefix: str = "pricing:break-even:") -> None:
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    # Values live under a versioned key, ``<prefix><key>:<generation>``; deleting
+    # bumps ``<prefix>generation:<key>``, so a late ``set`` lands on a key no one reads.
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._client.get(f"{self.prefix}{key}:{self.generation(key)}")
+        return value.decode() if isinstance(value, bytes) else value
+
+    def generation(self, key: str) -> int:
+        return int(self._client.get(f"{self.prefix}generation:{key}") or 0)
+
+    def set(self, key: str, value: str, generation: Optional[int] = None) -> None:
+        if generation is None:
+            generation = self.generation(key)
+        self._client.set(
+            f"{self.prefix}{key}:{generation}", value, ex=max(int(self.ttl_seconds), 1)
+        )
+
+    def delete(self, key: str) -> None:
+        self._client.incr(f"{self.prefix}generation:{key}")
+
+    def clear(self) -> None:
+        keys = list(self._client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self._client.delete(*keys)
+
+
+class BreakEvenCache:
+    def __init__(self, backend: CacheBackend, enabled: bool = True) -> None:
+        self.backend = backend
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def get(self, year_month: str) -> Tuple[Optional[BreakEvenResponse], int]:
+        """The cached response (or ``None``) and the generation to pass to ``set``."""
+        if not self.enabled:
+            return None, 0
+        # Read before the value: an invalidation in between makes the fill a no-op.
+        generation = self.backend.generation(year_month)
+        value = self.backend.get(year_month)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None, generation
+            self.hits += 1
+        return BreakEvenResponse.parse_raw(value), generation
+
+    def set(self, year_month: str, response: BreakEvenResponse, generation: int) -> None:
+        """Store ``response`` unless the month was invalidated since ``get``."""
+        if self.enabled:
+            self.backend.set(year_month, response.json(), generation)
+
+    def invalidate(self, months: Iterable[date]) -> None:
+        for month in months:
+            self.backend.delete(f"{month:%Y-%m}")
+            with self._lock:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = self.misses = self.invalidations = 0
+        if isinstance(self.backend, LocalTTLBackend):
+            self.backend.evictions = self.backend.expirations = 0
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        stats: Dict[str, object] = {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+        if isinstance(self.backend, LocalTTLBackend):
+            stats.update(
+                entries=len(self.backend),
+                max_entries=self.backend.max_entries,
+                ttl_seconds=self.backend.ttl_seconds,
+                evictions=self.backend.evictions,
+                expirations=self.backend.expirations,
+            )
+        return stats
+
+
+def _build_cache() -> BreakEvenCache:
+    settings = get_settings()
+    backend: CacheBackend
+    if settings.cache_redis_url:
+        backend = RedisBackend(settings.cache_redis_url, settings.break_even_cache_ttl_seconds)
+    else:
+        backend = LocalTTLBackend(
+            settings.break_even_cache_max_entries, settings.break_even_cache_ttl_seconds
+        )
+    return BreakEvenCache(backend, enabled=settings.break_even_cache_enabled)
+
+
+break_even_cache = _build_cache()
+
+
+def _affected_months(obj: object) -> Set[date]:
+    if isinstance(obj, FixedCost):
+        attribute = "year_month"
+    elif isinstance(obj, SalesData):
+        attribute = "sale_date"
+    else:
+        return set()
+    state = inspect(obj)
+    values = [state.dict.get(attribute), *state.attrs[attribute].history.deleted]
+    return {value.replace(day=1) for value in values if value is not None}
+
+
+def _collect_dirty_months(session: Session, flush_context) -> None:
+    months: Set[date] = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        months |= _affected_months(obj)
+    if months:
+        session.info.setdefault(_PENDING_MONTHS_KEY, set()).update(months)
+
+
+def _invalidate_committed(session: Session) -> None:
+    months = session.info.pop(_PENDING_MONTHS_KEY, None)
+    if months:
+        break_even_cache.invalidate(months)
+
+
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_MONTHS_KEY, None)
+
+
+def invalidate_months(months: Iterable[date]) -> None:
+    """Invalidate months written outside the ORM unit of work (bulk inserts)."""
+    break_even_cache.invalidate({month.replace(day=1) for month in months})
+
+
+event.listen(Session, "after_flush", _collect_dirty_months)
+event.listen(Session, "after_commit", _invalidate_committed)
+event.listen(Session, "after_rollback", _discard_pending)
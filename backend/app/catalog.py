@@ -0,0 +1,93 @@
+"""Helpers for the ``GET /api/products`` catalog listing.
+
+Pages are addressed by an opaque cursor (the last ``product_code``), validated
+with an ETag derived from each row's ``updated_at``, and serialized as a stream
+of JSON fragments so a 1000-row page never exists as one big string.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+STREAM_BATCH_ROWS = 200
+
+
+class CursorError(ValueError):
+    """Raised for cursors that were not produced by ``encode_cursor``."""
+
+
+def encode_cursor(product_code: str) -> str:
+    return base64.urlsafe_b64encode(product_code.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        product_code = base64.b64decode(padded, altchars=b"-_", validate=True).decode()
+    except (binascii.Error, UnicodeDecodeError) as exc:
+        raise CursorError("invalid cursor") from exc
+    if not product_code:
+        raise CursorError("invalid cursor")
+    return product_code
+
+
+def page_etag(query_key: str, rows: Sequence[Any], pattern_stamps: Sequence[Any] = ()) -> str:
+    """Strong ETag over the request and every row's identity and version."""
+    digest = hashlib.sha1(query_key.encode())
+    for row in rows:
+        digest.update(f"|{row.id}:{row.updated_at.isoformat() if row.updated_at else ''}".encode())
+    for stamp in pattern_stamps:
+        digest.update(f"|p:{stamp}".encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {value.strip().removeprefix("W/") for value in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _number(value: Optional[Decimal]) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+def product_item(row: Any, patterns: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    item = {
+        "product_code": row.product_code,
+        "product_name": row.product_name,
+        "category": row.category,
+        "unit_cost_per_kg": _number(row.unit_cost_per_kg),
+        "unit_price_per_kg": _number(row.unit_price_per_kg),
+        "target_margin_rate": _number(row.target_margin_rate),
+        "min_margin_rate": _number(row.min_margin_rate),
+        "unit": row.unit,
+        "updated_at": row.updated_at.isoformat() if isinstance(row.updated_at, datetime) else None,
+    }
+    if patterns is not None:
+        item["price_patterns"] = patterns
+    return item
+
+
+def iter_page_json(
+    items: Iterator[Dict[str, Any]], next_cursor: Optional[str], limit: int
+) -> Iterator[bytes]:
+    """Serialize ``ProductListResponse`` incrementally."""
+    yield b'{"items":['
+    batch: List[str] = []
+    first = True
+    for item in items:
+        batch.append(json.dumps(item, ensure_ascii=False, separators=(",", ":")))
+        if len(batch) >= STREAM_BATCH_ROWS:
+            yield (("" if first else ",") + ",".join(batch)).encode()
+            first = False
+            batch = []
+    if batch:
+        yield (("" if first else ",") + ",".join(batch)).encode()
+    tail = json.dumps({"next_cursor": next_cursor, "limit": limit}, separators=(",", ":"))
+    yield b"]," + tail[1:].encode()
@@ -0,0 +1,164 @@
+"""Negotiated response compression (brotli, then gzip) above a size threshold.
+
+Bodies smaller than ``PRICING_COMPRESSION_MIN_BYTES`` and non-text content types
+are passed through; streamed responses (the product catalog) are compressed
+chunk by chunk and flushed so the client still receives rows incrementally.
+Brotli needs the optional ``brotli`` package; without it only gzip is offered.
+"""
+from __future__ import annotations
+
+import zlib
+from typing import List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+Headers = List[Tuple[bytes, bytes]]
+
+_COMPRESSIBLE = (b"text/", b"json", b"xml", b"javascript")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick ``br`` or ``gzip`` from an ``Accept-Encoding`` header (``q=0`` excluded)."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    wildcard = accepted.get("*", 0.0)
+    offered = ("br", "gzip") if brotli is not None else ("gzip",)
+    for encoding in offered:
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+class _Encoder:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int) -> None:
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+def _header(headers: Headers, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _without(headers: Headers, *names: bytes) -> Headers:
+    return [(key, value) for key, value in headers if key.lower() not in names]
+
+
+def _vary(headers: Headers) -> Headers:
+    vary = _header(headers, b"vary")
+    if vary is None:
+        return headers + [(b"vary", b"Accept-Encoding")]
+    if b"accept-encoding" in vary.lower():
+        return headers
+    return _without(headers, b"vary") + [(b"vary", vary + b", Accept-Encoding")]
+
+
+def _compressed_headers(headers: Headers, encoding: str) -> Headers:
+    compressed = _without(headers, b"content-length", b"etag")
+    etag = _header(headers, b"etag")
+    if etag is not None:
+        # The representation changed; a weak validator still matches If-None-Match.
+        compressed.append((b"etag", etag if etag.startswith(b"W/") else b"W/" + etag))
+    compressed.append((b"content-encoding", encoding.encode()))
+    return compressed
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing compressible responses of ``min_size`` bytes or more."""
+
+    def __init__(
+        self, app, min_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4
+    ) -> None:
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = dict(scope["headers"])
+        encoding = choose_encoding(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, encoder, passthrough
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                content_type = _header(headers, b"content-type") or b""
+                if _header(headers, b"content-encoding") is not None or not any(
+                    marker in content_type for marker in _COMPRESSIBLE
+                ):
+                    passthrough = True
+                    await send(message)
+                    return
+                start_message = {**message, "headers": _vary(headers)}
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                start, start_message = start_message, None
+                if not more_body and len(body) < self.min_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = _Encoder(encoding, self.gzip_level, self.brotli_quality)
+                headers = _compressed_headers(start["headers"], encoding)
+                if more_body:
+                    await send({**start, "headers": headers})
+                    await send({**message, "body": encoder.chunk(body)})
+                    return
+                compressed = encoder.finish(body)
+                headers.append((b"content-length", str(len(compressed)).encode()))
+                await send({**start, "headers": headers})
+                await send({**message, "body": compressed})
+                return
+
+            if more_body:
+                await send({**message, "body": encoder.chunk(body)})
+            else:
+                await send({**message, "body": encoder.finish(body)})
+
+        await self.app(scope, receive, send_wrapper)
+
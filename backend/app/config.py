@@ -1,5 +1,6 @@
 import os
 from functools import lru_cache
+from typing import Optional
 
 from pydantic import BaseSettings, Field
 
@@ -9,7 +10,159 @@ class Settings(BaseSettings):
         default="sqlite:///./pricing.db",
         description="SQLAlchemy database URL. Defaults to local SQLite for development.",
     )
+    create_schema_on_startup: bool = Field(
+        default=True,
+        description="Create missing tables during application startup (disable in production "
+        "and run `python -m app.migrate` instead).",
+    )
+    read_database_urls: list[str] = Field(
+        default_factory=list,
+        description="Read replicas (JSON list) serving read-only endpoints round-robin.",
+    )
+    read_replica_retry_seconds: float = Field(
+        default=30, gt=0, description="Seconds before a replica that failed to connect is retried."
+    )
+    read_your_writes_seconds: float = Field(
+        default=5,
+        ge=0,
+        description="Reads stay on the primary this long after a commit that wrote data (0 "
+        "disables).",
+    )
     allowed_cors_origins: list[str] = Field(default_factory=lambda: ["*"])
+    db_pool_size: int = Field(default=5, ge=1, description="Persistent pooled connections.")
+    db_max_overflow: int = Field(
+        default=10, ge=0, description="Extra connections allowed beyond db_pool_size."
+    )
+    db_pool_timeout: float = Field(
+        default=30, gt=0, description="Seconds to wait for a pooled connection."
+    )
+    db_pool_pre_ping: bool = True
+    db_pool_recycle: int = Field(
+        default=1800, description="Seconds before a pooled connection is replaced (-1 disables)."
+    )
+    db_statement_timeout_ms: Optional[int] = Field(
+        default=None, gt=0, description="PostgreSQL statement_timeout applied per connection."
+    )
+    import_chunk_size: int = Field(
+        default=1000,
+        gt=0,
+        description="Rows per bulk upsert batch when streaming Excel imports.",
+    )
+    import_parse_workers: Optional[int] = Field(
+        default=None,
+        gt=0,
+        description="Processes parsing uploaded workbooks (defaults to the CPU count).",
+    )
+    import_parse_buffer_chunks: int = Field(
+        default=8,
+        gt=0,
+        description="Parsed chunks queued between the parse workers and the writer.",
+    )
+    import_zip_max_members: int = Field(
+        default=50, gt=0, description="Excel workbooks accepted in one ZIP upload."
+    )
+    import_zip_max_uncompressed_bytes: int = Field(
+        default=200 * 1024 * 1024,
+        gt=0,
+        description="Total uncompressed size of the workbooks in one ZIP upload.",
+    )
+    import_job_workers: int = Field(
+        default=2, gt=0, description="Threads running background Excel import jobs."
+    )
+    import_job_retention: int = Field(
+        default=100, gt=0, description="Finished import jobs kept for status polling."
+    )
+    sales_import_chunk_size: int = Field(
+        default=20_000,
+        gt=0,
+        description="Rows per COPY/executemany batch when importing sales exports.",
+    )
+    sales_import_max_warnings: int = Field(
+        default=1000, ge=0, description="Row warnings returned per sales import."
+    )
+    price_simulation_batch_limit: int = Field(
+        default=50_000,
+        gt=0,
+        description="Maximum number of items accepted by /api/price-simulations/batch.",
+    )
+    break_even_series_max_months: int = Field(
+        default=60,
+        gt=0,
+        description="Maximum number of months returned by /api/break-even/series.",
+    )
+    simulation_history_enabled: bool = Field(
+        default=True, description="Record calculate results in price_simulations."
+    )
+    simulation_history_queue_size: int = Field(
+        default=10_000, gt=0, description="Rows buffered before the overflow policy applies."
+    )
+    simulation_history_batch_size: int = Field(
+        default=500, gt=0, description="Rows per write-behind INSERT."
+    )
+    simulation_history_flush_seconds: float = Field(
+        default=1.0, gt=0, description="Maximum age of a buffered row before it is written."
+    )
+    simulation_history_overflow: str = Field(
+        default="drop",
+        regex="^(drop|block)$",
+        description="drop: discard rows when the queue is full; block: wait for space first.",
+    )
+    simulation_history_block_ms: float = Field(
+        default=50, ge=0, description="How long the block policy waits for queue space."
+    )
+    break_even_sensitivity_max_points: int = Field(
+        default=10_000,
+        gt=0,
+        description="Maximum scenarios (grid points) per /api/break-even/sensitivity request.",
+    )
+    elasticity_min_observations: int = Field(
+        default=6,
+        ge=2,
+        description="Months of sales a product needs for its own elasticity (fewer use the "
+        "category's pooled fit).",
+    )
+    elasticity_max_price_change: float = Field(
+        default=0.2,
+        gt=0,
+        lt=1,
+        description="Optimal prices stay within this fraction of the current list price.",
+    )
+    elasticity_refresh_seconds: float = Field(
+        default=60, ge=0, description="Seconds between incremental elasticity model refreshes."
+    )
+    elasticity_full_refresh_seconds: float = Field(
+        default=3600, gt=0, description="Seconds between full reloads of the elasticity model."
+    )
+    margin_ladder_cache_ttl_seconds: float = Field(
+        default=60, gt=0, description="Seconds before cached margin ladders are reloaded."
+    )
+    guard_min_margin_cache_ttl_seconds: float = Field(
+        default=60,
+        gt=0,
+        description="Seconds before the cached per-product min_margin_rate map is reloaded.",
+    )
+    break_even_cache_enabled: bool = True
+    break_even_cache_ttl_seconds: float = Field(default=300, gt=0)
+    break_even_cache_max_entries: int = Field(default=256, gt=0)
+    cache_redis_url: Optional[str] = Field(
+        default=None,
+        description="Redis-compatible URL for a cache shared between workers.",
+    )
+    compression_enabled: bool = Field(
+        default=True, description="Compress responses with brotli or gzip when accepted."
+    )
+    compression_min_bytes: int = Field(
+        default=1024, ge=0, description="Smaller responses are sent uncompressed."
+    )
+    compression_gzip_level: int = Field(default=6, ge=1, le=9)
+    compression_brotli_quality: int = Field(default=4, ge=0, le=11)
+    profiling_enabled: bool = Field(
+        default=False,
+        description="Sample stacks continuously and dump collapsed stacks for slow requests.",
+    )
+    profiling_interval_ms: float = Field(default=5, gt=0)
+    profiling_slow_request_ms: float = Field(default=500, ge=0)
+    profiling_output_dir: str = "profiles"
 
     class Config:
         env_file = ".env"
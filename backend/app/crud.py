@@ -1,40 +1,375 @@
 from __future__ import annotations
 
-from datetime import date
+from collections import defaultdict
+from datetime import date, datetime
 from decimal import Decimal
-from typing import Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
-from sqlalchemy import Select, func, select
+from sqlalchemy import Date, Select, and_, cast, delete, func, literal, or_, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from .models import FixedCost, Product, SalesData
+from .models import (
+    UNASSIGNED_PRODUCT_ID,
+    FixedCost,
+    MonthlySalesRollup,
+    PriceSimulation,
+    Product,
+    ProductImport,
+    SalesData,
+    _uuid,
+)
+from .partitions import sales_partitions
+from .price_patterns import refresh_product_patterns
+from .utils import ensure_decimal, product_content_hash
 
+Bind = Union[Session, Connection]
+RollupKey = Tuple[date, str]
 
-def _as_decimal(value: object) -> Decimal:
-    """Convert DB aggregation results to ``Decimal`` safely."""
-    if isinstance(value, Decimal):
-        return value
-    return Decimal(str(value))
+SALES_COPY_COLUMNS = (
+    "id",
+    "product_id",
+    "sale_date",
+    "quantity_kg",
+    "unit_price_per_kg",
+    "unit_cost_per_kg",
+    "created_at",
+)
 
+PRODUCT_UPSERT_COLUMNS = (
+    "product_name",
+    "category",
+    "unit_cost_per_kg",
+    "unit_price_per_kg",
+    "target_margin_rate",
+    "min_margin_rate",
+    "unit",
+    "content_hash",
+)
 
-def get_fixed_cost_total(session: Session, month: date) -> Decimal:
-    stmt: Select = select(func.coalesce(func.sum(FixedCost.amount), 0)).where(
+
+def _dialect_name(bind: Bind) -> str:
+    if isinstance(bind, Session):
+        return bind.get_bind().dialect.name
+    return bind.dialect.name
+
+
+def _dialect_insert(bind: Bind):
+    """Return the dialect specific ``insert`` that supports ``ON CONFLICT``."""
+    dialect = _dialect_name(bind)
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:  # pragma: no cover - unsupported backend
+        raise NotImplementedError(f"bulk upsert is not supported on {dialect}")
+    return insert
+
+
+def _fixed_cost_total_stmt(month: date) -> Select:
+    return select(func.coalesce(func.sum(FixedCost.amount), 0)).where(
         FixedCost.year_month == month
     )
-    result = session.execute(stmt).scalar_one()
-    return _as_decimal(result)
 
 
-def get_sales_summary(session: Session, start: date, end: date) -> Tuple[Decimal, Decimal]:
-    revenue_stmt: Select = select(
-        func.coalesce(func.sum(SalesData.quantity_kg * SalesData.unit_price_per_kg), 0)
-    ).where(SalesData.sale_date >= start, SalesData.sale_date < end)
-    variable_cost_stmt: Select = select(
-        func.coalesce(func.sum(SalesData.quantity_kg * SalesData.unit_cost_per_kg), 0)
+def _sales_summary_stmt(start: date, end: date) -> Select:
+    # Both sums share one scan of ix_sales_data_sale_date_amounts.
+    return select(
+        func.coalesce(func.sum(SalesData.quantity_kg * SalesData.unit_price_per_kg), 0),
+        func.coalesce(func.sum(SalesData.quantity_kg * SalesData.unit_cost_per_kg), 0),
     ).where(SalesData.sale_date >= start, SalesData.sale_date < end)
-    revenue = _as_decimal(session.execute(revenue_stmt).scalar_one())
-    variable_cost = _as_decimal(session.execute(variable_cost_stmt).scalar_one())
-    return revenue, variable_cost
+
+
+def get_fixed_cost_total(session: Session, month: date) -> Decimal:
+    result = session.execute(_fixed_cost_total_stmt(month)).scalar_one()
+    return ensure_decimal(result)
+
+
+def get_sales_summary(session: Session, start: date, end: date) -> Tuple[Decimal, Decimal]:
+    revenue, variable_cost = session.execute(_sales_summary_stmt(start, end)).one()
+    return ensure_decimal(revenue), ensure_decimal(variable_cost)
+
+
+def month_start(value: date) -> date:
+    return value.replace(day=1)
+
+
+def next_month(month: date) -> date:
+    if month.month == 12:
+        return date(month.year + 1, 1, 1)
+    return date(month.year, month.month + 1, 1)
+
+
+def _month_start_expr(bind: Bind, column):
+    if _dialect_name(bind) == "sqlite":
+        return func.date(column, "start of month")
+    return cast(func.date_trunc("month", column), Date)
+
+
+def get_rollup_break_even_totals(
+    session: Session, month: date
+) -> Tuple[Decimal, Decimal, Decimal]:
+    """Return ``(fixed_cost_total, revenue, variable_cost)`` from the monthly rollup."""
+    stmt = select(
+        func.coalesce(func.sum(MonthlySalesRollup.revenue), 0),
+        func.coalesce(func.sum(MonthlySalesRollup.variable_cost), 0),
+        _fixed_cost_total_stmt(month).scalar_subquery(),
+    ).where(MonthlySalesRollup.year_month == month)
+    revenue, variable_cost, fixed_cost_total = session.execute(stmt).one()
+    return ensure_decimal(fixed_cost_total), ensure_decimal(revenue), ensure_decimal(variable_cost)
+
+
+def get_rollup_monthly_totals(
+    session: Session, start: date, end: date
+) -> Dict[date, Tuple[Decimal, Decimal]]:
+    """Return ``{month: (revenue, variable_cost)}`` for months in ``[start, end)``."""
+    stmt = (
+        select(
+            MonthlySalesRollup.year_month,
+            func.sum(MonthlySalesRollup.revenue),
+            func.sum(MonthlySalesRollup.variable_cost),
+        )
+        .where(MonthlySalesRollup.year_month >= start, MonthlySalesRollup.year_month < end)
+        .group_by(MonthlySalesRollup.year_month)
+    )
+    return {
+        month: (ensure_decimal(revenue), ensure_decimal(variable_cost))
+        for month, revenue, variable_cost in session.execute(stmt)
+    }
+
+
+def get_fixed_cost_totals(session: Session, start: date, end: date) -> Dict[date, Decimal]:
+    """Return ``{month: fixed_cost_total}`` for months in ``[start, end)``."""
+    stmt = (
+        select(FixedCost.year_month, func.sum(FixedCost.amount))
+        .where(FixedCost.year_month >= start, FixedCost.year_month < end)
+        .group_by(FixedCost.year_month)
+    )
+    return {month: ensure_decimal(total) for month, total in session.execute(stmt)}
+
+
+def get_rollup_category_totals(
+    session: Session, month: date
+) -> List[Tuple[Optional[str], Decimal, Decimal]]:
+    """Return ``(category, revenue, variable_cost)`` per product category for ``month``.
+
+    Sales without a product (or without a category) are reported under ``None``.
+    """
+    stmt = (
+        select(
+            Product.category,
+            func.sum(MonthlySalesRollup.revenue),
+            func.sum(MonthlySalesRollup.variable_cost),
+        )
+        .outerjoin(Product, Product.id == MonthlySalesRollup.product_id)
+        .where(MonthlySalesRollup.year_month == month)
+        .group_by(Product.category)
+    )
+    return [
+        (category, ensure_decimal(revenue), ensure_decimal(variable_cost))
+        for category, revenue, variable_cost in session.execute(stmt)
+    ]
+
+
+def get_rollup_product_breakdown(session: Session, month: date) -> List[Any]:
+    stmt = (
+        select(
+            MonthlySalesRollup.product_id,
+            Product.product_code,
+            Product.product_name,
+            Product.category,
+            MonthlySalesRollup.revenue,
+            MonthlySalesRollup.variable_cost,
+            MonthlySalesRollup.quantity_kg,
+        )
+        .outerjoin(Product, Product.id == MonthlySalesRollup.product_id)
+        .where(MonthlySalesRollup.year_month == month)
+        .order_by(MonthlySalesRollup.revenue.desc(), MonthlySalesRollup.product_id)
+    )
+    return list(session.execute(stmt))
+
+
+def sales_rollup_deltas(
+    rows: Iterable[Tuple[date, Optional[str], Any, Any, Any]],
+) -> Dict[RollupKey, List[Decimal]]:
+    """Aggregate ``(sale_date, product_id, quantity, price, cost)`` rows per rollup key.
+
+    NULL amounts contribute nothing, mirroring SQL ``SUM`` semantics.
+    """
+    deltas: Dict[RollupKey, List[Decimal]] = defaultdict(
+        lambda: [Decimal("0"), Decimal("0"), Decimal("0")]
+    )
+    for sale_date, product_id, quantity, price, cost in rows:
+        totals = deltas[(month_start(sale_date), product_id or UNASSIGNED_PRODUCT_ID)]
+        if quantity is None:
+            continue
+        quantity = ensure_decimal(quantity)
+        totals[2] += quantity
+        if price is not None:
+            totals[0] += quantity * ensure_decimal(price)
+        if cost is not None:
+            totals[1] += quantity * ensure_decimal(cost)
+    return deltas
+
+
+def apply_sales_rollup(bind: Bind, deltas: Dict[RollupKey, List[Decimal]]) -> None:
+    """Add ``deltas`` to ``monthly_sales_rollup`` with one ``INSERT ... ON CONFLICT``."""
+    if not deltas:
+        return
+    now = datetime.utcnow()
+    table = MonthlySalesRollup.__table__
+    insert = _dialect_insert(bind)
+    stmt = insert(table).values(
+        [
+            {
+                "year_month": year_month,
+                "product_id": product_id,
+                "revenue": revenue,
+                "variable_cost": variable_cost,
+                "quantity_kg": quantity,
+                "updated_at": now,
+            }
+            for (year_month, product_id), (revenue, variable_cost, quantity) in deltas.items()
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.year_month, table.c.product_id],
+        set_={
+            "revenue": table.c.revenue + stmt.excluded.revenue,
+            "variable_cost": table.c.variable_cost + stmt.excluded.variable_cost,
+            "quantity_kg": table.c.quantity_kg + stmt.excluded.quantity_kg,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    bind.execute(stmt)
+
+
+def rebuild_sales_rollup(
+    bind: Bind, start: Optional[date] = None, end: Optional[date] = None
+) -> int:
+    """Recompute rollup rows for months in ``[start, end)`` (all months when omitted)."""
+    table = MonthlySalesRollup.__table__
+    delete_stmt = delete(table)
+    month_expr = _month_start_expr(bind, SalesData.sale_date)
+    source = select(
+        month_expr,
+        func.coalesce(SalesData.product_id, literal(UNASSIGNED_PRODUCT_ID)),
+        func.coalesce(func.sum(SalesData.quantity_kg * SalesData.unit_price_per_kg), 0),
+        func.coalesce(func.sum(SalesData.quantity_kg * SalesData.unit_cost_per_kg), 0),
+        func.coalesce(func.sum(SalesData.quantity_kg), 0),
+        literal(datetime.utcnow()),
+    ).group_by(month_expr, func.coalesce(SalesData.product_id, literal(UNASSIGNED_PRODUCT_ID)))
+    if start is not None:
+        delete_stmt = delete_stmt.where(table.c.year_month >= start)
+        source = source.where(SalesData.sale_date >= start)
+    if end is not None:
+        delete_stmt = delete_stmt.where(table.c.year_month < end)
+        source = source.where(SalesData.sale_date < end)
+
+    bind.execute(delete_stmt)
+    result = bind.execute(
+        table.insert().from_select(
+            ["year_month", "product_id", "revenue", "variable_cost", "quantity_kg", "updated_at"],
+            source,
+        )
+    )
+    return result.rowcount
+
+
+def get_products_by_codes(session: Session, product_codes: List[str]) -> Dict[str, Product]:
+    stmt = select(Product).where(Product.product_code.in_(product_codes))
+    return {product.product_code: product for product in session.execute(stmt).scalars()}
+
+
+def list_products(
+    session: Session,
+    after: Optional[str],
+    limit: int,
+    category: Optional[str] = None,
+    min_margin_rate: Optional[Decimal] = None,
+    max_margin_rate: Optional[Decimal] = None,
+    name_query: Optional[str] = None,
+    name_match: str = "substring",
+) -> List[Any]:
+    """One keyset page of products ordered by ``product_code`` (codes after ``after``).
+
+    Rows are plain tuples rather than ORM objects so large pages stay cheap.
+    ``name_query`` matches ``product_name`` case-insensitively; on PostgreSQL
+    both prefix and substring ILIKE patterns can use the pg_trgm index.
+    """
+    stmt = select(
+        Product.id,
+        Product.product_code,
+        Product.product_name,
+        Product.category,
+        Product.unit_cost_per_kg,
+        Product.unit_price_per_kg,
+        Product.target_margin_rate,
+        Product.min_margin_rate,
+        Product.unit,
+        Product.updated_at,
+    )
+    if after is not None:
+        stmt = stmt.where(Product.product_code > after)
+    if category is not None:
+        stmt = stmt.where(Product.category == category)
+    if min_margin_rate is not None:
+        stmt = stmt.where(Product.target_margin_rate >= min_margin_rate)
+    if max_margin_rate is not None:
+        stmt = stmt.where(Product.target_margin_rate <= max_margin_rate)
+    if name_query:
+        if name_match == "prefix":
+            stmt = stmt.where(Product.product_name.istartswith(name_query, autoescape=True))
+        else:
+            stmt = stmt.where(Product.product_name.icontains(name_query, autoescape=True))
+    return session.execute(stmt.order_by(Product.product_code).limit(limit)).all()
+
+
+def list_price_simulations(
+    session: Session,
+    before: Optional[Tuple[datetime, str]],
+    limit: int,
+    product_code: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> List[Any]:
+    """One keyset page of simulation history, newest first.
+
+    ``before`` is the ``(simulation_at, id)`` of the previous page's last row.
+    A ``product_code`` filter walks ``ix_price_simulations_product_simulation_at``.
+    """
+    stmt = select(
+        PriceSimulation.id,
+        PriceSimulation.simulation_at,
+        Product.product_code,
+        PriceSimulation.input_cost_per_kg,
+        PriceSimulation.target_margin_rate,
+        PriceSimulation.calculated_price_per_kg,
+        PriceSimulation.selected_price_per_kg,
+        PriceSimulation.quantity_kg,
+        PriceSimulation.gross_profit_total,
+        PriceSimulation.parameters,
+    ).outerjoin(Product, Product.id == PriceSimulation.product_id)
+    if product_code is not None:
+        stmt = stmt.where(Product.product_code == product_code)
+    if start is not None:
+        stmt = stmt.where(PriceSimulation.simulation_at >= start)
+    if end is not None:
+        stmt = stmt.where(PriceSimulation.simulation_at < end)
+    if before is not None:
+        simulation_at, simulation_id = before
+        stmt = stmt.where(
+            or_(
+                PriceSimulation.simulation_at < simulation_at,
+                and_(
+                    PriceSimulation.simulation_at == simulation_at,
+                    PriceSimulation.id < simulation_id,
+                ),
+            )
+        )
+    stmt = stmt.order_by(PriceSimulation.simulation_at.desc(), PriceSimulation.id.desc())
+    return session.execute(stmt.limit(limit)).all()
 
 
 def upsert_product(session: Session, data: dict) -> Product:
@@ -49,3 +384,187 @@ def upsert_product(session: Session, data: dict) -> Product:
         for key, value in data.items():
             setattr(product, key, value)
     return product
+
+
+def bulk_upsert_products(
+    session: Session, rows: List[Dict[str, Any]]
+) -> Tuple[int, int, int]:
+    """Upsert a chunk of products with one lookup and one ``INSERT ... ON CONFLICT``.
+
+    Returns ``(inserted, updated, unchanged)`` counts. Duplicate ``product_code``
+    values in the chunk are collapsed so the last row wins, matching sequential
+    ``upsert_product``. Rows whose ``content_hash`` equals the stored one are not
+    written at all, so their ``updated_at`` (and the catalog ETags) stay put.
+    Price patterns are refreshed for written rows whose cost or category changed.
+    """
+    if not rows:
+        return 0, 0, 0
+    latest = {row["product_code"]: row for row in rows}
+    existing = {
+        product_code: (product_id, category, unit_cost, content_hash)
+        for product_code, product_id, category, unit_cost, content_hash in session.execute(
+            select(
+                Product.product_code,
+                Product.id,
+                Product.category,
+                Product.unit_cost_per_kg,
+                Product.content_hash,
+            ).where(Product.product_code.in_(list(latest)))
+        )
+    }
+
+    now = datetime.utcnow()
+    values = []
+    for product_code, row in latest.items():
+        content_hash = row.get("content_hash") or product_content_hash(row)
+        current = existing.get(product_code)
+        if current is not None and current[3] == content_hash:
+            continue
+        values.append(
+            {
+                "id": _uuid(),
+                **row,
+                "content_hash": content_hash,
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+    unchanged = len(latest) - len(values)
+    if not values:
+        return 0, 0, unchanged
+
+    insert = _dialect_insert(session)
+    stmt = insert(Product.__table__).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Product.__table__.c.product_code],
+        set_={
+            **{column: stmt.excluded[column] for column in PRODUCT_UPSERT_COLUMNS},
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    session.execute(stmt)
+
+    changed = []
+    updated = 0
+    for value in values:
+        current = existing.get(value["product_code"])
+        if current is None:
+            changed.append((value["id"], value.get("category"), value.get("unit_cost_per_kg")))
+            continue
+        updated += 1
+        product_id, category, unit_cost, _ = current
+        new_cost = value.get("unit_cost_per_kg")
+        cost_changed = (unit_cost is None) != (new_cost is None) or (
+            new_cost is not None and ensure_decimal(unit_cost) != ensure_decimal(new_cost)
+        )
+        if cost_changed or category != value.get("category"):
+            changed.append((product_id, value.get("category"), new_cost))
+    refresh_product_patterns(session, changed)
+
+    return len(values) - updated, updated, unchanged
+
+
+def get_products_version(session: Session) -> Tuple[Optional[datetime], int]:
+    """``(max(updated_at), count)`` of the catalog; changes whenever a product does."""
+    latest, count = session.execute(
+        select(func.max(Product.updated_at), func.count(Product.id))
+    ).one()
+    return latest, count
+
+
+def get_applied_import(session: Session, digest: str) -> Optional[ProductImport]:
+    """The earlier import of the same workbook, if the catalog is still as it left it."""
+    previous = session.get(ProductImport, digest)
+    if previous is None:
+        return None
+    if (previous.products_updated_at, previous.product_count) != get_products_version(session):
+        return None
+    return previous
+
+
+def record_product_import(
+    session: Session, digest: str, filename: Optional[str], imported: int, skipped: int
+) -> ProductImport:
+    """Remember a workbook together with the catalog version it produced."""
+    products_updated_at, product_count = get_products_version(session)
+    record = session.get(ProductImport, digest)
+    if record is None:
+        record = ProductImport(content_sha256=digest)
+        session.add(record)
+    record.filename = filename
+    record.imported = imported
+    record.skipped = skipped
+    record.products_updated_at = products_updated_at
+    record.product_count = product_count
+    record.imported_at = datetime.utcnow()
+    return record
+
+
+def get_product_id_map(session: Session) -> Dict[str, str]:
+    """``product_code -> id`` for every product, loaded once per sales import."""
+    return dict(session.execute(select(Product.product_code, Product.id)).all())
+
+
+def insert_sales_rows(bind: Bind, rows: List[Dict[str, Any]]) -> int:
+    """Append ``sales_data`` rows without going through the ORM.
+
+    PostgreSQL streams them with ``COPY``; other dialects use a single
+    ``executemany``. Callers own rollup maintenance and cache invalidation,
+    because the ORM ``after_flush`` hooks never see these rows.
+    """
+    if not rows:
+        return 0
+    now = datetime.utcnow()
+    for row in rows:
+        row.setdefault("id", _uuid())
+        row.setdefault("created_at", now)
+
+    if _dialect_name(bind) != "postgresql":
+        bind.execute(SalesData.__table__.insert(), rows)
+        return len(rows)
+
+    # Monthly partitions (sql/008) must exist before COPY routes rows into them.
+    sales_partitions.ensure(bind, {row["sale_date"] for row in rows})
+    connection = bind.connection() if isinstance(bind, Session) else bind
+    dbapi_connection = connection.connection.driver_connection
+    copy_sql = f"COPY sales_data ({', '.join(SALES_COPY_COLUMNS)}) FROM STDIN"
+    with dbapi_connection.cursor() as cursor:
+        if hasattr(cursor, "copy"):  # psycopg 3
+            with cursor.copy(copy_sql) as copy:
+                for row in rows:
+                    copy.write_row([row[column] for column in SALES_COPY_COLUMNS])
+        else:  # pragma: no cover - psycopg2
+            import csv
+            import io
+
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow(
+                    ["" if row[column] is None else row[column] for column in SALES_COPY_COLUMNS]
+                )
+            buffer.seek(0)
+            cursor.copy_expert(f"{copy_sql} WITH (FORMAT csv)", buffer)
+    return len(rows)
+
+
+# Async variants run the same statements on an ``AsyncSession`` via ``run_sync``,
+# so the SQL (and the session hooks in rollup/cache) stays in one place.
+
+
+async def bulk_upsert_products_async(
+    session: AsyncSession, rows: List[Dict[str, Any]]
+) -> Tuple[int, int, int]:
+    return await session.run_sync(bulk_upsert_products, rows)
+
+
+async def get_applied_import_async(
+    session: AsyncSession, digest: str
+) -> Optional[ProductImport]:
+    return await session.run_sync(get_applied_import, digest)
+
+
+async def record_product_import_async(
+    session: AsyncSession, digest: str, filename: Optional[str], imported: int, skipped: int
+) -> ProductImport:
+    return await session.run_sync(record_product_import, digest, filename, imported, skipped)
@@ -1,19 +1,161 @@
+import time
 from contextlib import contextmanager
+from functools import lru_cache
+from typing import Optional
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from .config import Settings, get_settings
+from .metrics import PoolMetrics, async_pool_metrics, pool_metrics
+from .observability import instrument_queries
+from .replicas import REPLICA_KEY, ReplicaRouter, recent_writes
+
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+class _InstrumentedPoolMixin:
+    """Records checkout wait time, overflow connections and checkout timeouts."""
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        overflow_before = self._overflow
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout()
+            raise
+        finally:
+            self.metrics.wait_seconds.observe(time.perf_counter() - started)
+        if self._overflow > max(overflow_before, 0):
+            self.metrics.record_overflow()
+        return connection
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    metrics: PoolMetrics = pool_metrics
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    metrics: PoolMetrics = async_pool_metrics
+
+
+def async_database_url(database_url: str) -> URL:
+    """Swap the configured driver for its asyncio counterpart (asyncpg / aiosqlite)."""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:  # pragma: no cover - unsupported backend
+        raise ValueError(f"no async driver configured for {backend}")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def engine_options(
+    settings: Settings,
+    use_async: bool = False,
+    database_url: Optional[str] = None,
+    metrics: Optional[PoolMetrics] = None,
+) -> dict:
+    """Translate ``PRICING_DB_*`` settings into ``create_engine`` keyword arguments.
+
+    ``metrics`` gives the pool its own ``PoolMetrics`` instead of the shared
+    sync / async ones (one per read replica).
+    """
+    backend = make_url(database_url or settings.database_url).get_backend_name()
+    options: dict = {"pool_pre_ping": settings.db_pool_pre_ping}
+    if not use_async:
+        options["future"] = True
+    if backend == "sqlite":
+        # SQLite keeps SQLAlchemy's file/memory specific pools.
+        return options
+    poolclass = InstrumentedAsyncQueuePool if use_async else InstrumentedQueuePool
+    if metrics is not None:
+        poolclass = type(poolclass.__name__, (poolclass,), {"metrics": metrics})
+    options.update(
+        poolclass=poolclass,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+    )
+    if backend == "postgresql" and settings.db_statement_timeout_ms:
+        timeout = settings.db_statement_timeout_ms
+        if use_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(timeout)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
 
-from .config import get_settings
 
 settings = get_settings()
-engine = create_engine(settings.database_url, future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
 Base = declarative_base()
 
 
+@lru_cache()
+def get_engine() -> Engine:
+    """Create the engine on first use so importing the app loads no DB driver."""
+    engine = create_engine(settings.database_url, **engine_options(settings))
+    pool_metrics.instrument(engine)
+    instrument_queries(engine)
+    return engine
+
+
+@lru_cache()
+def get_sessionmaker() -> sessionmaker:
+    """Dependency for work that outlives the request (background jobs)."""
+    return sessionmaker(bind=get_engine(), autoflush=False, autocommit=False, future=True)
+
+
 def get_session():
-    db = SessionLocal()
+    db = get_sessionmaker()()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@lru_cache()
+def get_replica_router() -> ReplicaRouter:
+    """Create the ``PRICING_READ_DATABASE_URLS`` engines on first use."""
+    engines, replica_metrics = [], []
+    for url in settings.read_database_urls:
+        metrics = PoolMetrics()
+        engine = create_engine(url, **engine_options(settings, database_url=url, metrics=metrics))
+        metrics.instrument(engine)
+        instrument_queries(engine)
+        engines.append(engine)
+        replica_metrics.append(metrics)
+    return ReplicaRouter(
+        engines,
+        retry_seconds=settings.read_replica_retry_seconds,
+        pool_metrics=replica_metrics,
+    )
+
+
+def _open_read_session() -> Session:
+    factory = get_sessionmaker()
+    router = get_replica_router()
+    if router.engines and not recent_writes.within(settings.read_your_writes_seconds):
+        for engine in router.candidates():
+            session = factory(bind=engine, info={REPLICA_KEY: True})
+            try:
+                session.connection()  # checks the replica out now (pool_pre_ping)
+            except exc.DBAPIError:
+                session.close()
+                router.mark_down(engine)
+                continue
+            router.mark_up(engine)
+            return session
+    return factory()
+
+
+def get_read_session():
+    """Dependency for read-only endpoints: a replica session, else the primary."""
+    db = _open_read_session()
     try:
         yield db
     finally:
@@ -22,7 +164,7 @@ def get_session():
 
 @contextmanager
 def session_scope():
-    session = SessionLocal()
+    session = get_sessionmaker()()
     try:
         yield session
         session.commit()
@@ -31,3 +173,35 @@ def session_scope():
         raise
     finally:
         session.close()
+
+
+@lru_cache()
+def get_async_sessionmaker():
+    """Create the asyncio engine on first use so the async drivers stay optional."""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(
+        async_database_url(settings.database_url), **engine_options(settings, use_async=True)
+    )
+    async_pool_metrics.instrument(async_engine.sync_engine)
+    instrument_queries(async_engine.sync_engine)
+    return async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_session():
+    async with get_async_sessionmaker()() as session:
+        yield session
+
+
+async def dispose_async_engine() -> None:
+    if get_async_sessionmaker.cache_info().currsize:
+        await get_async_sessionmaker().kw["bind"].dispose()
+        get_async_sessionmaker.cache_clear()
+
+
+def dispose_engine() -> None:
+    if get_replica_router.cache_info().currsize:
+        get_replica_router().dispose()
+        get_replica_router.cache_clear()
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
@@ -0,0 +1,478 @@
+"""Price elasticity of demand and profit-maximizing prices.
+
+Each complete month in ``monthly_sales_rollup`` is one observation per product:
+the average price ``revenue / quantity_kg`` and the volume sold. Demand follows
+the constant-elasticity curve ``ln q = a + b ln p``, where ``b`` is the elasticity.
+
+The model keeps per-product sufficient statistics (n, Σx, Σy, Σx², Σxy with
+x = ln p, y = ln q), so every product is fitted at once by closed-form least
+squares in NumPy. A product with fewer than ``PRICING_ELASTICITY_MIN_OBSERVATIONS``
+months, or without price variation, uses its category's pooled within-product
+slope ``Σ Sxy / Σ Sxx``; its own averages still anchor the intercept.
+
+With unit cost c, profit ``(p - c) · q(p)`` peaks at ``p* = c · b / (1 + b)``
+when b < -1 and has no interior maximum otherwise. The solver clamps p* to
+±``PRICING_ELASTICITY_MAX_PRICE_CHANGE`` around the list price (or the average
+observed price), because the fit says nothing about prices far from the data.
+It then raises the price to ``c / (1 - min_margin_rate)``.
+
+Refreshes are incremental. Only rollup rows and products whose ``updated_at``
+moved since the last refresh are read, and each row replaces its previous
+contribution. A month becomes an observation once it is over. A full reload
+every ``PRICING_ELASTICITY_FULL_REFRESH_SECONDS`` drops deleted rows and
+resets float drift.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Union
+
+from sqlalchemy import Float, or_, select, type_coerce
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .config import get_settings
+from .crud import month_start
+from .models import UNASSIGNED_PRODUCT_ID, MonthlySalesRollup, Product
+from .money import half_up_array
+
+Bind = Union[Session, Connection]
+
+# Rows written by transactions that committed after the previous refresh
+# but stamped before it are read again; replacing a point is idempotent.
+_WATERMARK_OVERLAP = timedelta(minutes=5)
+# Sum of squared log-price deviations below which a product's price never moved.
+_MIN_LOG_PRICE_SPREAD = 1e-6
+# Point keys are product_index * _MONTH_KEYS + (year * 12 + month - 1).
+_MONTH_KEYS = 1_000_000
+_N, _SX, _SY, _SXX, _SXY = range(5)
+SOURCES = (None, "category", "product")
+
+
+@dataclass
+class PriceSolution:
+    """Solver output for ``product_ids``, one array element per product."""
+
+    product_ids: List[str]
+    product_codes: List[str]
+    product_names: List[str]
+    categories: List[Optional[str]]
+    unit_cost: Any
+    current_price: Any
+    elasticity: Any
+    source: Any
+    observations: Any
+    optimal_price: Any
+    gross_margin_rate: Any
+    expected_quantity: Any
+    expected_gross_profit: Any
+    constraint: Any
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """One ``schemas.OptimalPrice`` dict per product, NaN as ``None``."""
+        columns = zip(
+            self.product_codes,
+            self.product_names,
+            self.categories,
+            *(
+                _nullable(values)
+                for values in (
+                    self.unit_cost,
+                    self.current_price,
+                    self.elasticity,
+                    self.optimal_price,
+                    self.gross_margin_rate,
+                    self.expected_quantity,
+                    self.expected_gross_profit,
+                )
+            ),
+            self.source.tolist(),
+            self.observations.tolist(),
+            self.constraint.tolist(),
+        )
+        for (
+            code,
+            name,
+            category,
+            cost,
+            price,
+            elasticity,
+            optimal,
+            margin,
+            quantity,
+            profit,
+            source,
+            observations,
+            constraint,
+        ) in columns:
+            yield {
+                "product_code": code,
+                "product_name": name,
+                "category": category,
+                "unit_cost_per_kg": cost,
+                "unit_price_per_kg": price,
+                "elasticity": None if elasticity is None else round(elasticity, 4),
+                "elasticity_source": SOURCES[source],
+                "observations": observations,
+                "optimal_price_per_kg": None if optimal is None else int(optimal),
+                "gross_margin_rate": margin,
+                "expected_quantity_kg": quantity,
+                "expected_gross_profit": None if profit is None else int(profit),
+                "constraint": constraint,
+            }
+
+
+def _nullable(values: Any) -> List[Optional[float]]:
+    return [value if math.isfinite(value) else None for value in values.tolist()]
+
+
+class ElasticityModel:
+    """Sufficient statistics of every product's price–volume history."""
+
+    def __init__(
+        self,
+        min_observations: int,
+        max_price_change: float,
+        refresh_seconds: float,
+        full_refresh_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+        today: Callable[[], date] = date.today,
+    ) -> None:
+        self.min_observations = min_observations
+        self.max_price_change = max_price_change
+        self.refresh_seconds = refresh_seconds
+        self.full_refresh_seconds = full_refresh_seconds
+        self._clock = clock
+        self._today = today
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._loaded = False
+        self._checked_at = self._loaded_at = -math.inf
+        self._products_seen: Optional[datetime] = None
+        self._rollup_seen: Optional[datetime] = None
+        self._cutoff: Optional[date] = None
+        self._index: Dict[str, int] = {}
+        self._code_index: Dict[str, int] = {}
+        self._category_index: Dict[Optional[str], int] = {}
+        self.product_ids: List[str] = []
+        self.product_codes: List[str] = []
+        self.product_names: List[str] = []
+        self.category_names: List[Optional[str]] = []
+        self._category = self._cost = self._price = self._min_margin = None
+        self._stats = self._keys = self._x = self._y = None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def refresh(self, bind: Bind, force: bool = False) -> None:
+        """Fold rows written since the last refresh into the statistics."""
+        with self._lock:
+            now = self._clock()
+            if not force and self._loaded and now - self._checked_at < self.refresh_seconds:
+                return
+            full = now - self._loaded_at >= self.full_refresh_seconds
+            if full:
+                self._reset()
+            self._load_products(bind)
+            self._load_rollup(bind)
+            self._loaded = True
+            self._checked_at = now
+            if full:
+                self._loaded_at = now
+
+    def _load_products(self, bind: Bind) -> None:
+        import numpy as np
+
+        stmt = select(
+            Product.id,
+            Product.product_code,
+            Product.product_name,
+            Product.category,
+            type_coerce(Product.unit_cost_per_kg, Float),
+            type_coerce(Product.unit_price_per_kg, Float),
+            type_coerce(Product.min_margin_rate, Float),
+            Product.updated_at,
+        )
+        if self._products_seen is not None:
+            stmt = stmt.where(Product.updated_at >= self._products_seen - _WATERMARK_OVERLAP)
+        rows = _connection(bind).execute(stmt).all()
+        if self._category is None:
+            self._category = np.zeros(0, np.int64)
+            self._cost, self._price, self._min_margin = (np.zeros(0) for _ in range(3))
+            self._stats = np.zeros((5, 0))
+            self._keys = np.zeros(0, np.int64)
+            self._x, self._y = np.zeros(0), np.zeros(0)
+        if not rows:
+            return
+
+        positions, categories = [], []
+        for product_id, code, name, category, _, _, _, updated_at in rows:
+            position = self._index.get(product_id)
+            if position is None:
+                position = self._index[product_id] = len(self.product_ids)
+                self.product_ids.append(product_id)
+                self.product_codes.append(code)
+                self.product_names.append(name)
+            else:
+                self._code_index.pop(self.product_codes[position], None)
+                self.product_codes[position] = code
+                self.product_names[position] = name
+            self._code_index[code] = position
+            if category not in self._category_index:
+                self._category_index[category] = len(self.category_names)
+                self.category_names.append(category)
+            positions.append(position)
+            categories.append(self._category_index[category])
+            if updated_at is not None and (
+                self._products_seen is None or updated_at > self._products_seen
+            ):
+                self._products_seen = updated_at
+
+        grow = len(self.product_ids) - len(self._cost)
+        if grow:
+            self._category = np.concatenate([self._category, np.zeros(grow, np.int64)])
+            self._cost, self._price, self._min_margin = (
+                np.concatenate([values, np.full(grow, np.nan)])
+                for values in (self._cost, self._price, self._min_margin)
+            )
+            self._stats = np.concatenate([self._stats, np.zeros((5, grow))], axis=1)
+        positions = np.asarray(positions, np.int64)
+        self._category[positions] = categories
+        for target, column in ((self._cost, 4), (self._price, 5), (self._min_margin, 6)):
+            target[positions] = [np.nan if row[column] is None else row[column] for row in rows]
+
+    def _load_rollup(self, bind: Bind) -> None:
+        import numpy as np
+
+        cutoff = month_start(self._today())
+        table = MonthlySalesRollup
+        stmt = select(
+            table.product_id,
+            table.year_month,
+            # Floats straight from the driver: Decimal conversion dominates a full load.
+            type_coerce(table.revenue, Float),
+            type_coerce(table.quantity_kg, Float),
+            table.updated_at,
+        ).where(table.year_month < cutoff, table.product_id != UNASSIGNED_PRODUCT_ID)
+        if self._rollup_seen is not None:
+            stmt = stmt.where(
+                or_(
+                    table.updated_at >= self._rollup_seen - _WATERMARK_OVERLAP,
+                    # Months that ended since the last refresh, however old their rows.
+                    table.year_month >= self._cutoff,
+                )
+            )
+        rows = _connection(bind).execute(stmt).all()
+        self._cutoff = cutoff
+        if not rows:
+            return
+        product_ids, year_months, revenue, quantity, updated = zip(*rows)
+        seen = max(filter(None, updated), default=None)
+        if seen is not None and (self._rollup_seen is None or seen > self._rollup_seen):
+            self._rollup_seen = seen
+
+        index = self._index
+        products = np.array([index.get(product_id, -1) for product_id in product_ids], np.int64)
+        month_numbers = {value: value.year * 12 + value.month - 1 for value in set(year_months)}
+        months = np.array([month_numbers[value] for value in year_months], np.int64)
+        revenue = np.array(revenue, float)  # None becomes nan
+        quantity = np.array(quantity, float)
+        known = products >= 0
+        if not known.all():
+            products, months, revenue, quantity = (
+                values[known] for values in (products, months, revenue, quantity)
+            )
+        keys = products * _MONTH_KEYS + months
+        valid = (revenue > 0) & (quantity > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x = np.log(revenue / quantity)
+            y = np.log(quantity)
+
+        # Take back the previous contribution of every point read again.
+        found_at = np.searchsorted(self._keys, keys)
+        found = found_at < len(self._keys)
+        found[found] = self._keys[found_at[found]] == keys[found]
+        old = found_at[found]
+        self._accumulate(products[found], self._x[old], self._y[old], -1.0)
+        replace = found & valid
+        self._x[found_at[replace]] = x[replace]
+        self._y[found_at[replace]] = y[replace]
+        removed = found_at[found & ~valid]
+        if len(removed):
+            self._keys, self._x, self._y = (
+                np.delete(values, removed) for values in (self._keys, self._x, self._y)
+            )
+
+        added = ~found & valid
+        if added.any():
+            order = np.argsort(keys[added], kind="stable")
+            new_keys, new_x, new_y = (values[added][order] for values in (keys, x, y))
+            at = np.searchsorted(self._keys, new_keys)
+            self._keys = np.insert(self._keys, at, new_keys)
+            self._x = np.insert(self._x, at, new_x)
+            self._y = np.insert(self._y, at, new_y)
+        self._accumulate(products[valid], x[valid], y[valid], 1.0)
+
+    def _accumulate(self, products: Any, x: Any, y: Any, sign: float) -> None:
+        import numpy as np
+
+        if not len(products):
+            return
+        size = self._stats.shape[1]
+        for row, weights in (
+            (_N, None),
+            (_SX, x),
+            (_SY, y),
+            (_SXX, x * x),
+            (_SXY, x * y),
+        ):
+            self._stats[row] += sign * np.bincount(products, weights=weights, minlength=size)
+
+    def fit(self) -> Dict[str, Any]:
+        """Elasticity, intercept, source and observation count for every product."""
+        with self._lock:
+            return self._fit()
+
+    def _fit(self) -> Dict[str, Any]:
+        import numpy as np
+
+        n, sx, sy, sxx, sxy = self._stats
+        category = self._category
+        n = np.rint(n)
+        has_data = n > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_x = np.where(has_data, sx / n, np.nan)
+            mean_y = np.where(has_data, sy / n, np.nan)
+            spread_xx = np.where(has_data, sxx - sx * mean_x, 0.0)
+            spread_xy = np.where(has_data, sxy - sx * mean_y, 0.0)
+            varies = spread_xx > _MIN_LOG_PRICE_SPREAD
+            own = varies & (n >= self.min_observations)
+            pooled = varies & (n >= 2)
+            groups = len(self.category_names)
+            category_xx = np.bincount(category, np.where(pooled, spread_xx, 0.0), groups)
+            category_xy = np.bincount(category, np.where(pooled, spread_xy, 0.0), groups)
+            category_slope = np.where(
+                category_xx > _MIN_LOG_PRICE_SPREAD, category_xy / category_xx, np.nan
+            )
+            elasticity = np.where(own, spread_xy / spread_xx, category_slope[category])
+        source = np.where(own, 2, np.where(np.isfinite(elasticity), 1, 0))
+        return {
+            "elasticity": elasticity,
+            "intercept": mean_y - elasticity * mean_x,
+            "mean_log_price": mean_x,
+            "source": source,
+            "observations": n.astype(np.int64),
+        }
+
+    def solve(
+        self,
+        bind: Bind,
+        product_codes: Optional[Sequence[str]] = None,
+        category: Optional[str] = None,
+    ) -> PriceSolution:
+        """Profit-maximizing prices, in ``product_codes`` order or by product code.
+
+        Without ``product_codes`` the whole catalog (or ``category``) is solved.
+        Unknown codes are skipped.
+        """
+        import numpy as np
+
+        self.refresh(bind)
+        with self._lock:
+            fitted = self._fit()
+            if product_codes is not None:
+                positions = np.asarray(
+                    [self._code_index[code] for code in product_codes if code in self._code_index],
+                    np.int64,
+                )
+            else:
+                positions = np.asarray(
+                    sorted(self._code_index.values(), key=self.product_codes.__getitem__),
+                    np.int64,
+                )
+            if category is not None:
+                wanted = self._category_index.get(category, -1)
+                positions = positions[self._category[positions] == wanted]
+            cost = self._cost[positions]
+            price = self._price[positions]
+            min_margin = self._min_margin[positions]
+            ids = [self.product_ids[i] for i in positions]
+            codes = [self.product_codes[i] for i in positions]
+            names = [self.product_names[i] for i in positions]
+            categories = [self.category_names[i] for i in self._category[positions]]
+        elasticity = fitted["elasticity"][positions]
+        intercept = fitted["intercept"][positions]
+
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            anchor = np.where(price > 0, price, np.exp(fitted["mean_log_price"][positions]))
+            lower = anchor * (1 - self.max_price_change)
+            upper = anchor * (1 + self.max_price_change)
+            unconstrained = np.where(
+                elasticity < -1, cost * elasticity / (1 + elasticity), np.inf
+            )
+            clamped = np.fmin(np.fmax(unconstrained, lower), upper)
+            floor = np.where(min_margin < 1, cost / (1 - min_margin), np.nan)
+            solvable = (cost > 0) & np.isfinite(elasticity) & np.isfinite(clamped)
+            raised = solvable & (floor > clamped)
+            # Rounded up at the floor so the price never earns less than min_margin_rate.
+            optimal = np.where(
+                raised,
+                np.ceil(np.round(floor, 6)),
+                half_up_array(np, np.where(solvable, clamped, 0.0), 0),
+            )
+            optimal = np.where(solvable, optimal, np.nan)
+            quantity = np.exp(intercept + elasticity * np.log(optimal))
+            profit = (optimal - cost) * quantity
+            margin = (optimal - cost) / optimal
+        constraint = np.where(
+            ~solvable,
+            None,
+            np.where(
+                raised,
+                "min_margin",
+                np.where(
+                    (unconstrained < lower) | (unconstrained > upper), "max_change", "none"
+                ),
+            ),
+        )
+        return PriceSolution(
+            product_ids=ids,
+            product_codes=codes,
+            product_names=names,
+            categories=categories,
+            unit_cost=cost,
+            current_price=price,
+            elasticity=elasticity,
+            source=fitted["source"][positions],
+            observations=fitted["observations"][positions],
+            optimal_price=optimal,
+            gross_margin_rate=half_up_array(np, margin, 4),
+            expected_quantity=half_up_array(np, quantity, 3),
+            expected_gross_profit=half_up_array(np, profit, 0),
+            constraint=constraint,
+        )
+
+
+def _connection(bind: Bind) -> Connection:
+    # Core rows without the ORM result layer; the statements select columns only.
+    return bind.connection() if isinstance(bind, Session) else bind
+
+
+def _build_model() -> ElasticityModel:
+    settings = get_settings()
+    return ElasticityModel(
+        min_observations=settings.elasticity_min_observations,
+        max_price_change=settings.elasticity_max_price_change,
+        refresh_seconds=settings.elasticity_refresh_seconds,
+        full_refresh_seconds=settings.elasticity_full_refresh_seconds,
+    )
+
+
+price_elasticity = _build_model()
@@ -0,0 +1,186 @@
+"""Margin guard across the catalog and sales history.
+
+Every sale line and every product list price is checked against the product's
+``min_margin_rate`` (level ``min``) or ``target_margin_rate`` (level ``target``)
+in one grouped SQL statement, using the same ``utils.below_margin`` rule as the
+single-simulation guard. Lost gross profit is what the violating lines would
+have earned at the threshold price: ``(cost / (1 - margin) - price) * quantity``.
+
+``/api/price-simulations/calculate`` resolves a product's ``min_margin_rate``
+from ``min_margin_rates``, an in-memory map of the catalog, so the hot path does
+not query ``products`` per request. The map is dropped when a commit writes
+``products`` (ORM flushes and bulk upserts) and reloaded after
+``PRICING_GUARD_MIN_MARGIN_CACHE_TTL_SECONDS`` so other workers pick up changes.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import and_, case, event, func, or_, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from .config import get_settings
+from .models import Product, SalesData
+from .utils import below_margin, margin_floor_price
+
+GUARD_LEVELS = ("min", "target")
+
+_PRODUCT_WRITE_KEY = "guard_products_written"
+
+
+class MinMarginCache:
+    """``product_code -> min_margin_rate`` for the catalog, loaded with a single query."""
+
+    def __init__(self, ttl_seconds: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._rates: Optional[Dict[str, Decimal]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def rates(self, bind: Union[Session, Connection]) -> Dict[str, Decimal]:
+        rates = self._rates
+        if rates is not None and self._clock() - self._loaded_at < self.ttl_seconds:
+            return rates
+        rows = bind.execute(
+            select(Product.product_code, Product.min_margin_rate).where(
+                Product.min_margin_rate.is_not(None)
+            )
+        ).all()
+        with self._lock:
+            self._rates = dict(rows)
+            self._loaded_at = self._clock()
+            return self._rates
+
+    def rate_for(
+        self, bind: Union[Session, Connection], product_code: str
+    ) -> Optional[Decimal]:
+        return self.rates(bind).get(product_code)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._rates = None
+
+
+min_margin_rates = MinMarginCache(get_settings().guard_min_margin_cache_ttl_seconds)
+
+
+def _threshold_column(level: str):
+    return Product.min_margin_rate if level == "min" else Product.target_margin_rate
+
+
+def violation_report(
+    session: Session, start: date, end: date, level: str, offset: int, limit: int
+) -> Tuple[int, List[Any]]:
+    """Products with violating sale lines in ``[start, end)`` or a violating list price.
+
+    Returns ``(total, rows)``; rows are ordered by lost gross profit, largest first.
+    """
+    threshold = _threshold_column(level)
+    price = SalesData.unit_price_per_kg
+    cost = SalesData.unit_cost_per_kg
+    violating = and_(
+        SalesData.quantity_kg.is_not(None), below_margin(price, cost, threshold)
+    )
+
+    sales = (
+        select(
+            SalesData.product_id.label("product_id"),
+            func.count().label("sale_lines"),
+            func.sum(case((violating, 1), else_=0)).label("violating_lines"),
+            func.sum(case((violating, SalesData.quantity_kg), else_=0)).label(
+                "violating_quantity_kg"
+            ),
+            func.sum(
+                case(
+                    (
+                        violating,
+                        (margin_floor_price(cost, threshold) - price) * SalesData.quantity_kg,
+                    ),
+                    else_=0,
+                )
+            ).label("lost_gross_profit"),
+            func.min(case((violating, SalesData.sale_date))).label("first_violation_date"),
+            func.max(case((violating, SalesData.sale_date))).label("last_violation_date"),
+            func.min(case((price > 0, (price - cost) / price))).label("worst_margin_rate"),
+        )
+        .join(Product, Product.id == SalesData.product_id)
+        .where(SalesData.sale_date >= start, SalesData.sale_date < end, threshold.is_not(None))
+        .group_by(SalesData.product_id)
+        .subquery()
+    )
+
+    list_price_violation = below_margin(
+        Product.unit_price_per_kg, Product.unit_cost_per_kg, threshold
+    )
+    lost = func.coalesce(sales.c.lost_gross_profit, 0)
+    stmt = (
+        select(
+            Product.id.label("product_id"),
+            Product.product_code,
+            Product.product_name,
+            Product.category,
+            Product.min_margin_rate,
+            Product.target_margin_rate,
+            Product.unit_cost_per_kg,
+            Product.unit_price_per_kg,
+            case((list_price_violation, True), else_=False).label("list_price_violation"),
+            func.coalesce(sales.c.sale_lines, 0).label("sale_lines"),
+            func.coalesce(sales.c.violating_lines, 0).label("violating_lines"),
+            func.coalesce(sales.c.violating_quantity_kg, 0).label("violating_quantity_kg"),
+            lost.label("lost_gross_profit"),
+            sales.c.first_violation_date,
+            sales.c.last_violation_date,
+            sales.c.worst_margin_rate,
+            func.count().over().label("total"),
+        )
+        .outerjoin(sales, sales.c.product_id == Product.id)
+        .where(or_(sales.c.violating_lines > 0, list_price_violation))
+        .order_by(lost.desc(), Product.product_code)
+        .offset(offset)
+        .limit(limit)
+    )
+    rows = session.execute(stmt).all()
+    if rows:
+        return rows[0].total, rows
+    if offset == 0:
+        return 0, []
+    # Past the last page: the window count is not available without rows.
+    total = session.execute(
+        select(func.count()).select_from(stmt.limit(None).offset(None).subquery())
+    ).scalar_one()
+    return total, []
+
+
+def _mark_flushed_products(session: Session, flush_context) -> None:
+    if any(
+        isinstance(obj, Product) for obj in (*session.new, *session.dirty, *session.deleted)
+    ):
+        session.info[_PRODUCT_WRITE_KEY] = True
+
+
+def _mark_executed_products(state: ORMExecuteState) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, "table", None)
+        if getattr(table, "name", None) == Product.__tablename__:
+            state.session.info[_PRODUCT_WRITE_KEY] = True
+
+
+def _invalidate_committed_products(session: Session) -> None:
+    if session.info.pop(_PRODUCT_WRITE_KEY, False):
+        min_margin_rates.invalidate()
+
+
+def _discard_product_writes(session: Session) -> None:
+    session.info.pop(_PRODUCT_WRITE_KEY, None)
+
+
+event.listen(Session, "after_flush", _mark_flushed_products)
+event.listen(Session, "do_orm_execute", _mark_executed_products)
+event.listen(Session, "after_commit", _invalidate_committed_products)
+event.listen(Session, "after_rollback", _discard_product_writes)
@@ -0,0 +1,227 @@
+"""Write-behind recording of ``/api/price-simulations/calculate`` results.
+
+The endpoint only enqueues a row; a background thread drains the bounded queue
+and writes ``price_simulations`` with one multi-row INSERT per batch, flushing
+when ``PRICING_SIMULATION_HISTORY_BATCH_SIZE`` rows are pending or the oldest
+pending row is ``PRICING_SIMULATION_HISTORY_FLUSH_SECONDS`` old, and once more
+at shutdown. Product codes are resolved to ids per batch, so the request path
+never touches the database for history.
+
+When the queue is full the ``drop`` policy discards the row immediately; the
+``block`` policy waits up to ``PRICING_SIMULATION_HISTORY_BLOCK_MS`` for space
+(backpressure) before dropping. Both outcomes are counted in ``/metrics``.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from .config import get_settings
+from .metrics import Histogram
+from .models import PriceSimulation, Product, _uuid
+from .utils import ensure_decimal
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop", "block")
+
+
+class _FlushRequest:
+    """Queue marker asking the writer to write everything before it and report back."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class WriteBehindBuffer:
+    def __init__(
+        self,
+        max_queue: int,
+        batch_size: int,
+        flush_seconds: float,
+        overflow: str = "drop",
+        block_seconds: float = 0.05,
+    ) -> None:
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}")
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.overflow = overflow
+        self.block_seconds = block_seconds
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._session_factory: Optional[sessionmaker] = None
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self.backpressure_waits = 0
+        self.backpressure_seconds = 0.0
+        self.flush_seconds_histogram = Histogram()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def record(self, row: Dict[str, Any], session_factory: sessionmaker) -> bool:
+        """Enqueue one row; returns ``False`` when it was dropped."""
+        self._ensure_started(session_factory)
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            if self.overflow == "drop" or not self._put_blocking(row):
+                with self._lock:
+                    self.dropped += 1
+                return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def _put_blocking(self, row: Dict[str, Any]) -> bool:
+        started = time.perf_counter()
+        try:
+            self._queue.put(row, timeout=self.block_seconds)
+            return True
+        except queue.Full:
+            return False
+        finally:
+            with self._lock:
+                self.backpressure_waits += 1
+                self.backpressure_seconds += time.perf_counter() - started
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write every row enqueued so far; returns ``False`` on timeout."""
+        if self._thread is None:
+            return True
+        request = _FlushRequest()
+        self._queue.put(request)
+        return request.done.wait(timeout)
+
+    def stop(self, timeout: Optional[float] = 10) -> None:
+        """Flush pending rows and stop the writer (called at application shutdown)."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "write_errors": self.write_errors,
+                "backpressure_waits": self.backpressure_waits,
+                "backpressure_seconds": self.backpressure_seconds,
+                "queue_depth": self.queue_depth,
+            }
+
+    def _ensure_started(self, session_factory: sessionmaker) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._session_factory = session_factory
+                self._thread = threading.Thread(
+                    target=self._run, name="simulation-history", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        pending: List[Dict[str, Any]] = []
+        deadline: Optional[float] = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, dict):
+                pending.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_seconds
+                if len(pending) < self.batch_size:
+                    continue
+            if pending:
+                self._write(pending)
+                pending, deadline = [], None
+            if isinstance(item, _FlushRequest):
+                item.done.set()
+            elif item is _STOP:
+                return
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        started = time.perf_counter()
+        try:
+            with self._session_factory() as session:
+                codes = {row["product_code"] for row in rows if row.get("product_code")}
+                product_ids = (
+                    dict(
+                        session.execute(
+                            select(Product.product_code, Product.id).where(
+                                Product.product_code.in_(list(codes))
+                            )
+                        ).all()
+                    )
+                    if codes
+                    else {}
+                )
+                session.execute(
+                    PriceSimulation.__table__.insert(),
+                    [_table_row(row, product_ids) for row in rows],
+                )
+                session.commit()
+        except Exception:
+            logger.exception("failed to write %d price simulation rows", len(rows))
+            with self._lock:
+                self.write_errors += len(rows)
+            return
+        finally:
+            self.flush_seconds_histogram.observe(time.perf_counter() - started)
+        with self._lock:
+            self.written += len(rows)
+
+
+def _table_row(row: Dict[str, Any], product_ids: Dict[str, str]) -> Dict[str, Any]:
+    parameters = {key: row[key] for key in ("product_code", "product_name", "min_margin_rate")}
+    return {
+        "id": _uuid(),
+        "product_id": product_ids.get(row.get("product_code")),
+        "simulation_at": row["simulation_at"],
+        # The request path hands over raw floats; Decimal(str()) happens here.
+        "input_cost_per_kg": ensure_decimal(row["input_cost_per_kg"]),
+        "target_margin_rate": ensure_decimal(row["target_margin_rate"]),
+        "calculated_price_per_kg": row["calculated_price_per_kg"],
+        "selected_price_per_kg": None,
+        "quantity_kg": ensure_decimal(row["quantity_kg"])
+        if row["quantity_kg"] is not None
+        else None,
+        "gross_profit_total": row["gross_profit_total"],
+        "parameters": json.dumps(parameters, ensure_ascii=False, default=str),
+        "created_at": datetime.utcnow(),
+    }
+
+
+_settings = get_settings()
+simulation_history = WriteBehindBuffer(
+    _settings.simulation_history_queue_size,
+    _settings.simulation_history_batch_size,
+    _settings.simulation_history_flush_seconds,
+    _settings.simulation_history_overflow,
+    _settings.simulation_history_block_ms / 1000,
+)
@@ -0,0 +1,571 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import multiprocessing
+import queue
+import threading
+import time
+import zipfile
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .schemas import ExcelImportChunk, ExcelImportResponse, ExcelImportWarning
+from .utils import product_content_hash, round_rate
+
+DEFAULT_COLUMN_MAPPING = {
+    "product_code": "C",
+    "product_name": "D",
+    "category": "E",
+    "unit_cost_per_kg": "F",
+    "unit_price_per_kg": "G",
+    "target_margin_rate": "H",
+    "min_margin_rate": "I",
+}
+
+
+# ``sheets`` value selecting every worksheet of each workbook.
+ALL_SHEETS = "*"
+WORKBOOK_EXTENSIONS = (".xlsx", ".xlsm")
+
+
+class WorkbookError(ValueError):
+    """Raised when the uploaded file cannot be opened as a workbook."""
+
+
+class UploadLimitError(ValueError):
+    """Raised when a ZIP upload exceeds the configured member count or size."""
+
+
+@dataclass
+class ProductChunk:
+    """A bounded batch of normalized product rows read from the sheet."""
+
+    index: int
+    sheet: Optional[str] = None
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    # Sheet row number of each entry in ``rows``.
+    row_numbers: List[int] = field(default_factory=list)
+    warnings: List[ExcelImportWarning] = field(default_factory=list)
+    processed: int = 0
+    skipped: int = 0
+    # Rows dropped before writing because a later row of the upload wins.
+    superseded: int = 0
+    # Rows of earlier chunks, already written, that a row of this chunk replaced.
+    overwritten: int = 0
+    parse_ms: float = 0.0
+
+
+@dataclass
+class ImportSummary:
+    """Accumulates per-chunk write results into an ``ExcelImportResponse``."""
+
+    imported: int = 0
+    skipped: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    superseded: int = 0
+    duplicate: bool = False
+    rows_processed: int = 0
+    warnings: List[ExcelImportWarning] = field(default_factory=list)
+    chunks: List[ExcelImportChunk] = field(default_factory=list)
+
+    def add(
+        self,
+        chunk: ProductChunk,
+        counts: Tuple[int, int, int],
+        write_ms: float,
+    ) -> None:
+        inserted, updated, unchanged = counts
+        # Superseded rows were read fine, they just lost to a later row.
+        self.imported += len(chunk.rows) + chunk.superseded
+        self.skipped += chunk.skipped
+        self.inserted += inserted
+        self.updated += updated
+        self.unchanged += unchanged
+        self.superseded += chunk.superseded + chunk.overwritten
+        self.rows_processed += chunk.processed
+        self.warnings.extend(chunk.warnings)
+        self.chunks.append(
+            ExcelImportChunk(
+                index=chunk.index,
+                sheet=chunk.sheet,
+                rows=chunk.processed,
+                inserted=inserted,
+                updated=updated,
+                unchanged=unchanged,
+                parse_ms=round(chunk.parse_ms, 3),
+                write_ms=round(write_ms, 3),
+            )
+        )
+
+    @classmethod
+    def duplicate_of(cls, imported: int, skipped: int) -> "ImportSummary":
+        """Summary for a workbook that was already applied: every row is unchanged."""
+        return cls(imported=imported, skipped=skipped, unchanged=imported, duplicate=True)
+
+    def to_response(self) -> ExcelImportResponse:
+        return ExcelImportResponse(
+            imported=self.imported,
+            skipped=self.skipped,
+            inserted=self.inserted,
+            updated=self.updated,
+            unchanged=self.unchanged,
+            superseded=self.superseded,
+            duplicate=self.duplicate,
+            warnings=self.warnings,
+            chunks=self.chunks,
+        )
+
+
+def workbook_digest(
+    content: bytes, mapping: Dict[str, str], sheets: Optional[Sequence[str]] = None
+) -> str:
+    """Identity of an upload: its bytes plus the column mapping and sheets read."""
+    digest = hashlib.sha256(content)
+    digest.update(json.dumps(mapping, sort_keys=True).encode())
+    if sheets is not None:
+        digest.update(json.dumps(list(sheets)).encode())
+    return digest.hexdigest()
+
+
+def _column_index(column_letter: Optional[str]) -> Optional[int]:
+    """Translate an Excel column letter (``"C"``) to a zero-based tuple index."""
+    if not column_letter:
+        return None
+    from openpyxl.utils import column_index_from_string
+
+    return column_index_from_string(column_letter) - 1
+
+
+def _cell_value(row: Sequence[Any], column_index: Optional[int]) -> Any:
+    # read_only rows are trimmed to the last non-empty cell, so guard the index.
+    if column_index is None or column_index >= len(row):
+        return None
+    return row[column_index]
+
+
+def _normalize_rate(value: Any) -> Optional[Decimal]:
+    if value is None:
+        return None
+    try:
+        numeric = Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    if numeric > Decimal("1"):
+        numeric = numeric / Decimal("100")
+    if numeric < Decimal("0"):
+        return None
+    return round_rate(numeric)
+
+
+def _normalize_currency(value: Any) -> Optional[Decimal]:
+    if value is None:
+        return None
+    try:
+        numeric = Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    return (numeric * Decimal("1000")).quantize(Decimal("0.001"), rounding=ROUND_HALF_UP)
+
+
+def _parse_row(
+    row: Sequence[Any], row_index: int, columns: Dict[str, Optional[int]]
+) -> Tuple[Optional[Dict[str, Any]], Optional[ExcelImportWarning]]:
+    product_code = _cell_value(row, columns["product_code"])
+    product_name = _cell_value(row, columns["product_name"])
+
+    if not product_code or not product_name:
+        return None, ExcelImportWarning(
+            row=row_index,
+            field="product_code",
+            reason="missing product_code or product_name",
+        )
+
+    unit_cost = _normalize_currency(_cell_value(row, columns["unit_cost_per_kg"]))
+    unit_price = _normalize_currency(_cell_value(row, columns["unit_price_per_kg"]))
+
+    if unit_cost is None or unit_price is None:
+        return None, ExcelImportWarning(
+            row=row_index,
+            field="unit_cost_per_kg",
+            reason="non-numeric",
+        )
+
+    target_margin_rate = _normalize_rate(_cell_value(row, columns["target_margin_rate"]))
+    min_margin_rate = _normalize_rate(_cell_value(row, columns["min_margin_rate"]))
+    category = _cell_value(row, columns["category"])
+
+    product = {
+        "product_code": str(product_code).strip(),
+        "product_name": str(product_name).strip(),
+        "category": str(category).strip() if category else None,
+        "unit_cost_per_kg": unit_cost,
+        "unit_price_per_kg": unit_price,
+        "target_margin_rate": target_margin_rate,
+        "min_margin_rate": min_margin_rate,
+        "unit": "JPY/kg",
+    }
+    # Hashed here so the parse workers, not the request thread, pay for it.
+    product["content_hash"] = product_content_hash(product)
+    return product, None
+
+
+def iter_product_chunks(
+    rows: Iterable[Sequence[Any]],
+    mapping: Dict[str, str],
+    chunk_size: int,
+    first_row: int = 2,
+    sheet: Optional[str] = None,
+) -> Iterator[ProductChunk]:
+    """Normalize sheet rows lazily, yielding at most ``chunk_size`` rows per chunk.
+
+    ``rows`` is expected to come from ``worksheet.iter_rows(values_only=True)`` so
+    the workbook is never materialized cell by cell.
+    """
+    columns = {key: _column_index(mapping.get(key)) for key in DEFAULT_COLUMN_MAPPING}
+    chunk = ProductChunk(index=0, sheet=sheet)
+    started = time.perf_counter()
+
+    for row_index, row in enumerate(rows, start=first_row):
+        product_data, warning = _parse_row(row, row_index, columns)
+        chunk.processed += 1
+        if warning is not None:
+            warning.sheet = sheet
+            chunk.skipped += 1
+            chunk.warnings.append(warning)
+        else:
+            chunk.rows.append(product_data)
+            chunk.row_numbers.append(row_index)
+
+        if chunk.processed >= chunk_size:
+            chunk.parse_ms = (time.perf_counter() - started) * 1000
+            yield chunk
+            chunk = ProductChunk(index=chunk.index + 1, sheet=sheet)
+            started = time.perf_counter()
+
+    if chunk.processed:
+        chunk.parse_ms = (time.perf_counter() - started) * 1000
+        yield chunk
+
+
+def _open_workbook(content: bytes) -> Any:
+    from openpyxl import load_workbook
+
+    try:
+        return load_workbook(filename=io.BytesIO(content), read_only=True, data_only=True)
+    except Exception as exc:
+        raise WorkbookError("Failed to read Excel file") from exc
+
+
+def iter_workbook_chunks(
+    content: bytes,
+    mapping: Dict[str, str],
+    chunk_size: int,
+    sheet: Optional[str] = None,
+    source: Optional[str] = None,
+) -> Iterator[ProductChunk]:
+    """Stream normalized chunks from ``sheet`` (the active sheet by default).
+
+    ``source`` names the ZIP member the workbook came from; it prefixes the sheet
+    label on chunks and warnings.
+    """
+    workbook = _open_workbook(content)
+    try:
+        if sheet is None:
+            worksheet = workbook.active
+        elif sheet in workbook.sheetnames:
+            worksheet = workbook[sheet]
+        else:
+            raise WorkbookError(f"Sheet not found: {sheet}")
+        label = f"{source}:{worksheet.title}" if source else worksheet.title
+        yield from iter_product_chunks(
+            worksheet.iter_rows(min_row=2, values_only=True), mapping, chunk_size, sheet=label
+        )
+    finally:
+        workbook.close()
+
+
+def stream_workbook(
+    chunks: Any,
+    target: int,
+    content: bytes,
+    mapping: Dict[str, str],
+    chunk_size: int,
+    sheet: Optional[str] = None,
+    source: Optional[str] = None,
+) -> None:
+    """Parse one sheet of ``content``, putting ``(target, chunk)`` on ``chunks`` as it goes.
+
+    Runs inside the parse worker pool (one task per sheet), so it only depends
+    on openpyxl and the normalization helpers (no database access). Ends with
+    ``(target, None)``, or ``(target, WorkbookError)`` when the sheet is unreadable.
+    """
+    try:
+        for chunk in iter_workbook_chunks(content, mapping, chunk_size, sheet, source):
+            chunks.put((target, chunk))
+    except WorkbookError as exc:
+        chunks.put((target, exc))
+        return
+    except Exception:
+        chunks.put((target, WorkbookError("Failed to read Excel file")))
+        return
+    chunks.put((target, None))
+
+
+def workbook_sheet_names(content: bytes) -> List[str]:
+    """Worksheet titles in workbook order (runs in the parse worker pool)."""
+    workbook = _open_workbook(content)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def split_upload(
+    content: bytes,
+    max_members: Optional[int] = None,
+    max_uncompressed_bytes: Optional[int] = None,
+) -> List[Tuple[Optional[str], bytes]]:
+    """Split an upload into ``(zip_member, workbook_bytes)`` pairs.
+
+    An ``.xlsx`` file is itself a ZIP archive, so a plain workbook is recognised
+    by its ``[Content_Types].xml`` part and returned as ``[(None, content)]``.
+    Any other archive yields its ``.xlsx`` / ``.xlsm`` members sorted by name;
+    that order decides which file wins a ``product_code`` conflict. The member
+    count and the declared uncompressed sizes are checked against the limits
+    before anything is extracted (``zipfile`` stops reading at the declared
+    size, so a member cannot inflate past it).
+    """
+    buffer = io.BytesIO(content)
+    if not zipfile.is_zipfile(buffer):
+        return [(None, content)]
+    try:
+        with zipfile.ZipFile(buffer) as archive:
+            names = archive.namelist()
+            if "[Content_Types].xml" in names:
+                return [(None, content)]
+            members = sorted(
+                name
+                for name in names
+                if name.lower().endswith(WORKBOOK_EXTENSIONS)
+                and not name.startswith("__MACOSX/")
+                and not name.rsplit("/", 1)[-1].startswith(("~$", "."))
+            )
+            if not members:
+                raise WorkbookError("ZIP archive contains no Excel workbooks")
+            if max_members is not None and len(members) > max_members:
+                raise UploadLimitError(
+                    f"ZIP archive may contain at most {max_members} Excel workbooks"
+                )
+            total = sum(archive.getinfo(name).file_size for name in members)
+            if max_uncompressed_bytes is not None and total > max_uncompressed_bytes:
+                raise UploadLimitError(
+                    "ZIP archive workbooks may total at most "
+                    f"{max_uncompressed_bytes} bytes uncompressed"
+                )
+            return [(name, archive.read(name)) for name in members]
+    except zipfile.BadZipFile as exc:
+        raise WorkbookError("Failed to read Excel file") from exc
+
+
+def select_sheets(
+    available: Sequence[Sequence[str]], sheets: Sequence[str]
+) -> List[List[str]]:
+    """Resolve requested sheet names against each workbook's ``available`` titles.
+
+    ``[ALL_SHEETS]`` takes every sheet in workbook order; otherwise the requested
+    order is kept (later sheets win conflicts) and a name missing from every
+    workbook is an error.
+    """
+    if list(sheets) == [ALL_SHEETS]:
+        return [list(names) for names in available]
+    missing = [name for name in sheets if not any(name in names for names in available)]
+    if missing:
+        raise WorkbookError(f"Sheet not found: {', '.join(missing)}")
+    return [[name for name in sheets if name in names] for names in available]
+
+
+class LastSeen:
+    """The winning row per ``product_code`` while an upload is written chunk by chunk.
+
+    Rows rank by ``(target, row)``: the sheet's position in the request (ZIP
+    members by name, then sheet order) and its row number, so the catalog ends
+    up as if the sheets were imported one after another even though chunks
+    arrive in whatever order the parse workers finish them. Only one entry per
+    product code is kept, never the rows themselves.
+    """
+
+    def __init__(self) -> None:
+        self._rows: Dict[str, Tuple[int, int, Optional[str]]] = {}
+
+    def resolve(self, target: int, chunk: ProductChunk) -> ProductChunk:
+        """Drop rows that lose to a row already seen; warn about rows this chunk beats."""
+        keep: Dict[str, int] = {}
+        for position, row in enumerate(chunk.rows):
+            product_code = row["product_code"]
+            row_number = chunk.row_numbers[position]
+            seen = self._rows.get(product_code)
+            if seen is not None and seen[:2] > (target, row_number):
+                chunk.superseded += 1
+                chunk.warnings.append(_superseded(row_number, chunk.sheet, seen[2], seen[1]))
+                continue
+            if seen is not None:
+                if keep.pop(product_code, None) is not None:
+                    chunk.superseded += 1
+                else:
+                    chunk.overwritten += 1
+                chunk.warnings.append(_superseded(seen[1], seen[2], chunk.sheet, row_number))
+            self._rows[product_code] = (target, row_number, chunk.sheet)
+            keep[product_code] = position
+        if len(keep) < len(chunk.rows):
+            positions = sorted(keep.values())
+            chunk.rows = [chunk.rows[position] for position in positions]
+            chunk.row_numbers = [chunk.row_numbers[position] for position in positions]
+        chunk.warnings.sort(key=lambda warning: warning.row)
+        return chunk
+
+
+def _superseded(
+    row: int, sheet: Optional[str], winner_sheet: Optional[str], winner_row: int
+) -> ExcelImportWarning:
+    location = f"{winner_sheet} row {winner_row}" if winner_sheet else f"row {winner_row}"
+    return ExcelImportWarning(
+        row=row, field="product_code", reason=f"superseded by {location}", sheet=sheet
+    )
+
+
+def iter_upload_chunks(
+    executor: Executor,
+    content: bytes,
+    mapping: Dict[str, str],
+    chunk_size: int,
+    sheets: Optional[Sequence[str]] = None,
+    buffer_chunks: int = 8,
+    max_members: Optional[int] = None,
+    max_uncompressed_bytes: Optional[int] = None,
+) -> Iterator[ProductChunk]:
+    """Stream the chunks of every selected sheet of every workbook in ``content``.
+
+    Each sheet is one ``stream_workbook`` task on ``executor``; tasks hand chunks
+    back through a queue of at most ``buffer_chunks`` entries, so parsing runs
+    ahead of the writer by a bounded amount and no sheet is held in memory whole.
+    Chunks come out as they arrive, numbered in that order, after ``LastSeen``
+    has removed the rows a later row of the upload replaces. ZIP uploads are
+    limited as in ``split_upload``. A pool broken by a dead worker is dropped
+    so the next upload gets a fresh one from ``get_parse_executor``.
+    """
+    workbooks = split_upload(content, max_members, max_uncompressed_bytes)
+    futures: List[Future] = []
+    try:
+        if sheets is None:
+            targets = [(member, data, None) for member, data in workbooks]
+        else:
+            available = list(
+                executor.map(workbook_sheet_names, [data for _, data in workbooks])
+            )
+            targets = [
+                (member, data, sheet)
+                for (member, data), selected in zip(workbooks, select_sheets(available, sheets))
+                for sheet in selected
+            ]
+        chunks = _parse_queue_manager().Queue(maxsize=buffer_chunks)
+        futures = [
+            executor.submit(
+                stream_workbook, chunks, target, data, mapping, chunk_size, sheet, member
+            )
+            for target, (member, data, sheet) in enumerate(targets)
+        ]
+        del workbooks, targets
+        last_seen = LastSeen()
+        running = len(futures)
+        index = 0
+        while running:
+            target, item = _next_chunk(chunks, futures)
+            if item is None:
+                running -= 1
+                continue
+            if isinstance(item, Exception):
+                raise item
+            item.index = index
+            index += 1
+            yield last_seen.resolve(target, item)
+    except BrokenProcessPool as exc:
+        _discard_parse_executor(executor)
+        raise WorkbookError("Failed to read Excel file") from exc
+    finally:
+        for future in futures:
+            future.cancel()
+        # Unblock workers still putting chunks so the pool is free for the next upload.
+        while not all(future.done() for future in futures):
+            try:
+                chunks.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def _next_chunk(chunks: Any, futures: Sequence[Future]) -> Tuple[int, Any]:
+    while True:
+        try:
+            return chunks.get(timeout=1)
+        except queue.Empty:
+            # A worker that died (e.g. killed by the OOM killer) never sends its end marker.
+            for future in futures:
+                if future.done() and not future.cancelled() and future.exception():
+                    error = future.exception()
+                    if isinstance(error, BrokenProcessPool):
+                        raise error
+                    raise WorkbookError("Failed to read Excel file") from error
+
+
+_parse_executor: Optional[ProcessPoolExecutor] = None
+_parse_manager: Optional[Any] = None
+_parse_manager_lock = threading.Lock()
+
+
+def get_parse_executor(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Process pool for CPU-bound workbook parsing, created on first import."""
+    global _parse_executor
+    with _parse_manager_lock:
+        if _parse_executor is None:
+            # spawn: workers must not inherit the server's threads or DB connections.
+            _parse_executor = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _parse_executor
+
+
+def _discard_parse_executor(executor: Executor) -> None:
+    """Forget ``executor`` after a worker died; ``BrokenProcessPool`` is permanent."""
+    global _parse_executor
+    with _parse_manager_lock:
+        if _parse_executor is not executor:
+            return
+        _parse_executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _parse_queue_manager() -> Any:
+    """Server process owning the queues parse workers stream chunks through."""
+    global _parse_manager
+    with _parse_manager_lock:
+        if _parse_manager is None:
+            _parse_manager = multiprocessing.get_context("spawn").Manager()
+        return _parse_manager
+
+
+def shutdown_parse_executor() -> None:
+    global _parse_executor, _parse_manager
+    with _parse_manager_lock:
+        executor, _parse_executor = _parse_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+    with _parse_manager_lock:
+        if _parse_manager is not None:
+            _parse_manager.shutdown()
+            _parse_manager = None
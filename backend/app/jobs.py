@@ -0,0 +1,189 @@
+"""Background Excel import jobs.
+
+``POST /api/import/jobs`` stores the upload, enqueues it on a local thread pool
+and returns immediately; clients poll ``GET /api/import/jobs/{id}`` for
+progress. Workers write chunks as the parse pool streams them in (see
+``importer.iter_upload_chunks``), so progress (rows and throughput) is updated
+after every bulk upsert.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, List, Optional
+from uuid import uuid4
+
+from sqlalchemy.orm import sessionmaker
+
+from . import crud
+from .config import get_settings
+from .importer import (
+    ImportSummary,
+    UploadLimitError,
+    WorkbookError,
+    get_parse_executor,
+    iter_upload_chunks,
+    workbook_digest,
+)
+from .observability import span
+from .schemas import ImportJobStatus
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class ImportJob:
+    def __init__(self, filename: Optional[str] = None) -> None:
+        self.id = str(uuid4())
+        self.filename = filename
+        self.state = QUEUED
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+        self.summary = ImportSummary()
+        self._started = 0.0
+        self._elapsed = 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (SUCCEEDED, FAILED)
+
+    def rows_per_second(self) -> float:
+        elapsed = self._elapsed or (time.perf_counter() - self._started if self._started else 0)
+        return round(self.summary.rows_processed / elapsed, 1) if elapsed > 0 else 0.0
+
+    def status(self, warnings_offset: int, warnings_limit: int) -> ImportJobStatus:
+        summary = self.summary
+        page = summary.warnings[warnings_offset : warnings_offset + warnings_limit]
+        result = None
+        if self.state == SUCCEEDED:
+            result = summary.to_response().copy(update={"warnings": page})
+        return ImportJobStatus(
+            job_id=self.id,
+            status=self.state,
+            filename=self.filename,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            rows_processed=summary.rows_processed,
+            rows_per_second=self.rows_per_second(),
+            imported=summary.imported,
+            skipped=summary.skipped,
+            warnings_total=len(summary.warnings),
+            warnings_offset=warnings_offset,
+            warnings=page,
+            error=self.error,
+            result=result,
+        )
+
+
+class ImportJobQueue:
+    def __init__(self, max_workers: int, retention: int) -> None:
+        self.max_workers = max_workers
+        self.retention = retention
+        self._jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def submit(
+        self,
+        content: bytes,
+        mapping: Dict[str, str],
+        chunk_size: int,
+        session_factory: sessionmaker,
+        filename: Optional[str] = None,
+        sheets: Optional[List[str]] = None,
+    ) -> ImportJob:
+        job = ImportJob(filename=filename)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict_finished()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="import-job"
+                )
+            executor = self._executor
+        executor.submit(self._run, job, content, mapping, chunk_size, session_factory, sheets)
+        return job
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _evict_finished(self) -> None:
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished]:
+            if len(self._jobs) <= self.retention:
+                break
+            del self._jobs[job_id]
+
+    def _run(
+        self,
+        job: ImportJob,
+        content: bytes,
+        mapping: Dict[str, str],
+        chunk_size: int,
+        session_factory: sessionmaker,
+        sheets: Optional[List[str]],
+    ) -> None:
+        job.state = RUNNING
+        job.started_at = datetime.utcnow()
+        job._started = time.perf_counter()
+        session = session_factory()
+        state = FAILED
+        try:
+            # Same identity as POST /api/import/excel, so either path spots the other's imports.
+            digest = workbook_digest(content, mapping, sheets)
+            previous = crud.get_applied_import(session, digest)
+            if previous is not None:
+                job.summary = ImportSummary.duplicate_of(previous.imported, previous.skipped)
+                state = SUCCEEDED
+                return
+            chunks = iter_upload_chunks(
+                get_parse_executor(_settings.import_parse_workers),
+                content,
+                mapping,
+                chunk_size,
+                sheets,
+                buffer_chunks=_settings.import_parse_buffer_chunks,
+                max_members=_settings.import_zip_max_members,
+                max_uncompressed_bytes=_settings.import_zip_max_uncompressed_bytes,
+            )
+            with closing(chunks):
+                for chunk in chunks:
+                    started = time.perf_counter()
+                    with span("import.upsert"):
+                        counts = crud.bulk_upsert_products(session, chunk.rows)
+                    job.summary.add(chunk, counts, (time.perf_counter() - started) * 1000)
+            crud.record_product_import(
+                session, digest, job.filename, job.summary.imported, job.summary.skipped
+            )
+            session.commit()
+            state = SUCCEEDED
+        except (WorkbookError, UploadLimitError) as exc:
+            session.rollback()
+            job.error = str(exc)
+        except Exception as exc:  # pragma: no cover - reported through the job status
+            session.rollback()
+            job.error = f"{type(exc).__name__}: {exc}"
+        finally:
+            session.close()
+            job._elapsed = time.perf_counter() - job._started
+            job.finished_at = datetime.utcnow()
+            job.state = state
+
+
+_settings = get_settings()
+import_jobs = ImportJobQueue(_settings.import_job_workers, _settings.import_job_retention)
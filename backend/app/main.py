@@ -1,30 +1,143 @@
 from __future__ import annotations
 
-import io
+import asyncio
 import json
-from datetime import date, datetime
-from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
-from typing import Any, Dict, Optional
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
 
-from fastapi import Depends, FastAPI, File, Form, HTTPException, UploadFile
+from fastapi import (
+    Depends,
+    FastAPI,
+    File,
+    Form,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    UploadFile,
+)
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
 
-from . import crud
+# rollup registers its session hooks on import.
+from . import crud, guard, price_patterns, rollup, sensitivity  # noqa: F401
+from .cache import break_even_cache
+from .compression import CompressionMiddleware
+from .catalog import (
+    CursorError,
+    decode_cursor,
+    encode_cursor,
+    etag_matches,
+    iter_page_json,
+    page_etag,
+    product_item,
+)
 from .config import get_settings
-from .database import Base, engine, get_session
+from .database import (
+    dispose_async_engine,
+    dispose_engine,
+    get_async_session,
+    get_engine,
+    get_read_session,
+    get_replica_router,
+    get_session,
+    get_sessionmaker,
+)
+from .elasticity import price_elasticity
+from .history import simulation_history
+from .importer import (
+    ALL_SHEETS,
+    DEFAULT_COLUMN_MAPPING,
+    ImportSummary,
+    UploadLimitError,
+    WorkbookError,
+    get_parse_executor,
+    iter_upload_chunks,
+    shutdown_parse_executor,
+    workbook_digest,
+)
+from .jobs import import_jobs
+from .metrics import async_pool_metrics, pool_metrics
+from .money import RATE_SCALE, div_half_up, to_common_scale
+from .migrate import create_schema
+from .models import UNASSIGNED_PRODUCT_ID
+from .observability import TimingMiddleware, render_prometheus, span
+from .profiling import SamplingProfiler
+from .replicas import on_replica
+from .responses import FastJSONResponse
+from .sales_import import SalesFileError, detect_format, import_sales
 from .schemas import (
+    BreakEvenBreakdownResponse,
+    BreakEvenProductBreakdown,
     BreakEvenResponse,
+    BreakEvenSensitivityRequest,
+    BreakEvenSensitivityResponse,
+    BreakEvenSeriesResponse,
     ExcelImportResponse,
-    ExcelImportWarning,
+    GuardReportResponse,
+    GuardViolation,
+    ImportJobStatus,
+    MarginLadderListResponse,
+    MarginLadderRequest,
+    MarginLadderResponse,
+    OptimalPrice,
+    OptimalPriceResponse,
+    PricePattern,
+    PriceSimulationBatchRequest,
+    PriceSimulationBatchResponse,
+    PriceSimulationBatchResult,
+    PriceSimulationHistoryItem,
+    PriceSimulationHistoryResponse,
     PriceSimulationRequest,
     PriceSimulationResponse,
+    ProductPricePatterns,
+    ProductListResponse,
+    ProductPricePatternsResponse,
+    SalesImportResponse,
+)
+from .utils import (
+    PRICE_PATTERN_MARGIN_RATES,
+    PricingInputError,
+    ensure_decimal,
+    round_jpy,
+    round_rate,
+    simulate_price,
 )
-from .utils import generate_price_patterns, round_jpy, round_rate
 
 settings = get_settings()
+profiler = (
+    SamplingProfiler(
+        settings.profiling_interval_ms,
+        settings.profiling_slow_request_ms,
+        settings.profiling_output_dir,
+    )
+    if settings.profiling_enabled
+    else None
+)
 
-app = FastAPI(title="Pricing Decision Support System")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    engine = get_engine()
+    if settings.create_schema_on_startup:
+        await asyncio.to_thread(create_schema, engine)
+    yield
+    if profiler is not None:
+        profiler.stop()
+    simulation_history.stop()
+    import_jobs.shutdown()
+    shutdown_parse_executor()
+    await dispose_async_engine()
+    dispose_engine()
+
+
+app = FastAPI(title="Pricing Decision Support System", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.allowed_cors_origins,
@@ -32,177 +145,742 @@ app.add_middleware(
     allow_headers=["*"],
     allow_credentials=True,
 )
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        min_size=settings.compression_min_bytes,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+    )
+app.add_middleware(TimingMiddleware, profiler=profiler)
 
-Base.metadata.create_all(bind=engine)
-
-ERROR_INVALID_PARAM = {
-    "error": {
-        "code": "INVALID_PARAM",
-        "message": "入力値が不正です",
-    }
-}
-
-DEFAULT_COLUMN_MAPPING = {
-    "product_code": "C",
-    "product_name": "D",
-    "category": "E",
-    "unit_cost_per_kg": "F",
-    "unit_price_per_kg": "G",
-    "target_margin_rate": "H",
-    "min_margin_rate": "I",
-}
+MAX_LADDER_RATES = 20
 
 
 @app.post("/api/price-simulations/calculate", response_model=PriceSimulationResponse)
 def calculate_price_simulation(
     payload: PriceSimulationRequest,
+    session: Session = Depends(get_session),
+    session_factory: sessionmaker = Depends(get_sessionmaker),
 ) -> PriceSimulationResponse:
+    # Floats go straight in: simulate_price reads them exactly as scaled integers.
     try:
-        unit_cost = Decimal(str(payload.unit_cost_per_kg))
-        target_margin_rate = Decimal(str(payload.target_margin_rate))
-        quantity = (
-            Decimal(str(payload.quantity_kg))
-            if payload.quantity_kg is not None
-            else None
+        with span("pricing.simulate"):
+            result = simulate_price(
+                payload.unit_cost_per_kg,
+                payload.target_margin_rate,
+                payload.quantity_kg,
+                min_margin_rate=_guard_min_margin_rate(session, payload),
+            )
+    except PricingInputError as exc:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": {"code": "INVALID_PARAM", "message": str(exc)}},
+        ) from exc
+
+    if settings.simulation_history_enabled:
+        # Written in batches by the history thread; the request never waits on the DB.
+        simulation_history.record(
+            {
+                "simulation_at": datetime.utcnow(),
+                "product_code": payload.product_code,
+                "product_name": payload.product_name,
+                "min_margin_rate": result["guard"]["min_margin_rate"],
+                "input_cost_per_kg": payload.unit_cost_per_kg,
+                "target_margin_rate": payload.target_margin_rate,
+                "calculated_price_per_kg": result["recommended_price_per_kg"],
+                "quantity_kg": payload.quantity_kg,
+                "gross_profit_total": result["gross_profit_total"],
+            },
+            session_factory,
+        )
+    return PriceSimulationResponse(**result)
+
+
+@app.get(
+    "/api/price-simulations/history",
+    response_model=PriceSimulationHistoryResponse,
+    response_class=FastJSONResponse,
+)
+def get_price_simulation_history(
+    product_code: Optional[str] = None,
+    from_date: Optional[date] = Query(default=None, alias="from"),
+    to_date: Optional[date] = Query(default=None, alias="to"),
+    cursor: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=500),
+    session: Session = Depends(get_read_session),
+) -> FastJSONResponse:
+    before = None
+    if cursor:
+        try:
+            simulation_at, _, simulation_id = decode_cursor(cursor).partition("|")
+            before = (datetime.fromisoformat(simulation_at), simulation_id)
+        except (CursorError, ValueError) as exc:
+            raise HTTPException(
+                status_code=400,
+                detail={"error": {"code": "INVALID_PARAM", "message": "Invalid cursor"}},
+            ) from exc
+
+    rows = crud.list_price_simulations(
+        session,
+        before,
+        limit + 1,
+        product_code=product_code,
+        start=datetime.combine(from_date, datetime.min.time()) if from_date else None,
+        # ``to`` is an inclusive day.
+        end=datetime.combine(to_date + timedelta(days=1), datetime.min.time())
+        if to_date
+        else None,
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(f"{last.simulation_at.isoformat()}|{last.id}")
+
+    items = []
+    for row in rows[:limit]:
+        parameters = row.parameters or {}
+        if isinstance(parameters, str):
+            # Text on SQLite; psycopg already decodes the JSONB column on PostgreSQL.
+            parameters = json.loads(parameters)
+        items.append(
+            PriceSimulationHistoryItem(
+                id=row.id,
+                simulation_at=row.simulation_at,
+                product_code=row.product_code or parameters.get("product_code"),
+                product_name=parameters.get("product_name"),
+                input_cost_per_kg=row.input_cost_per_kg,
+                target_margin_rate=row.target_margin_rate,
+                calculated_price_per_kg=row.calculated_price_per_kg,
+                selected_price_per_kg=row.selected_price_per_kg,
+                quantity_kg=row.quantity_kg,
+                gross_profit_total=row.gross_profit_total,
+                min_margin_rate=parameters.get("min_margin_rate"),
+            )
         )
-    except (InvalidOperation, TypeError) as exc:
-        raise HTTPException(status_code=400, detail=ERROR_INVALID_PARAM) from exc
+    return FastJSONResponse(
+        PriceSimulationHistoryResponse(items=items, next_cursor=next_cursor, limit=limit)
+    )
+
+
+def _guard_min_margin_rate(session: Session, payload: PriceSimulationRequest):
+    if payload.min_margin_rate is not None or not payload.product_code:
+        return payload.min_margin_rate
+    # The catalog map is cached, so this only queries after a product write or its TTL.
+    return guard.min_margin_rates.rate_for(session, payload.product_code)
 
-    if unit_cost <= Decimal("0"):
+
+@app.post(
+    "/api/price-simulations/batch",
+    response_model=PriceSimulationBatchResponse,
+    response_class=FastJSONResponse,
+)
+def calculate_price_simulation_batch(
+    payload: PriceSimulationBatchRequest,
+    session: Session = Depends(get_read_session),
+) -> FastJSONResponse:
+    # Checked before any lookup so an oversized batch costs no DB work.
+    size = len(payload.items or []) + len(payload.product_codes or [])
+    if not size or size > settings.price_simulation_batch_limit:
         raise HTTPException(
             status_code=400,
             detail={
                 "error": {
                     "code": "INVALID_PARAM",
-                    "message": "unit_cost_per_kg must be greater than 0",
+                    "message": "batch must contain between 1 and "
+                    f"{settings.price_simulation_batch_limit} items",
                 }
             },
         )
-    if target_margin_rate < Decimal("0") or target_margin_rate >= Decimal("1"):
+
+    items: list = list(payload.items or [])
+    missing: set[int] = set()
+    # Catalog items use their category's margin ladder for price_patterns.
+    ladders: dict[int, tuple] = {}
+    if payload.product_codes:
+        products = crud.get_products_by_codes(session, payload.product_codes)
+        for product_code in payload.product_codes:
+            product = products.get(product_code)
+            if product is None:
+                missing.add(len(items))
+                items.append({"product_code": product_code})
+                continue
+            ladders[len(items)] = price_patterns.margin_ladders.ladder_for(
+                session, product.category
+            )
+            items.append(
+                {
+                    "product_code": product.product_code,
+                    "product_name": product.product_name,
+                    "unit_cost_per_kg": product.unit_cost_per_kg,
+                    "target_margin_rate": payload.target_margin_rate
+                    if payload.target_margin_rate is not None
+                    else product.target_margin_rate,
+                    "quantity_kg": payload.quantity_kg,
+                    "min_margin_rate": product.min_margin_rate,
+                }
+            )
+
+    results: list[PriceSimulationBatchResult] = []
+    failed = 0
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            failed += 1
+            results.append(
+                PriceSimulationBatchResult(
+                    index=index,
+                    error={"code": "INVALID_PARAM", "message": "item must be an object"},
+                )
+            )
+            continue
+        product_code = item.get("product_code")
+        if not isinstance(product_code, str):
+            product_code = None
+        if index in missing:
+            failed += 1
+            results.append(
+                PriceSimulationBatchResult(
+                    index=index,
+                    product_code=product_code,
+                    error={"code": "NOT_FOUND", "message": "product_code not found"},
+                )
+            )
+            continue
+        try:
+            request = PriceSimulationRequest.parse_obj(item)
+            result = simulate_price(
+                request.unit_cost_per_kg,
+                request.target_margin_rate,
+                request.quantity_kg,
+                ladders.get(index),
+                request.min_margin_rate,
+            )
+        except ValidationError as exc:
+            message = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                for error in exc.errors()
+            )
+            error = {"code": "INVALID_PARAM", "message": message}
+        except PricingInputError as exc:
+            error = {"code": "INVALID_PARAM", "message": str(exc)}
+        else:
+            results.append(
+                PriceSimulationBatchResult(
+                    index=index,
+                    product_code=product_code,
+                    result=PriceSimulationResponse(**result),
+                )
+            )
+            continue
+
+        failed += 1
+        results.append(
+            PriceSimulationBatchResult(index=index, product_code=product_code, error=error)
+        )
+
+    return FastJSONResponse(
+        PriceSimulationBatchResponse(
+            succeeded=len(results) - failed,
+            failed=failed,
+            results=results,
+        )
+    )
+
+
+@app.get("/api/products", responses={200: {"model": ProductListResponse}})
+def list_products(
+    cursor: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    category: Optional[str] = None,
+    min_margin_rate: Optional[float] = Query(default=None, ge=0, le=1),
+    max_margin_rate: Optional[float] = Query(default=None, ge=0, le=1),
+    q: Optional[str] = Query(default=None, min_length=1, max_length=200),
+    match: str = Query(default="substring", pattern="^(prefix|substring)$"),
+    include_patterns: bool = False,
+    if_none_match: Optional[str] = Header(default=None),
+    session: Session = Depends(get_read_session),
+) -> Response:
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except CursorError as exc:
         raise HTTPException(
             status_code=400,
-            detail={
-                "error": {
-                    "code": "INVALID_PARAM",
-                    "message": "target_margin_rate must be between 0.0 and 0.9",
+            detail={"error": {"code": "INVALID_PARAM", "message": "Invalid cursor"}},
+        ) from exc
+
+    # One extra row tells us whether another page exists.
+    rows = crud.list_products(
+        session,
+        after,
+        limit + 1,
+        category=category,
+        min_margin_rate=Decimal(str(min_margin_rate)) if min_margin_rate is not None else None,
+        max_margin_rate=Decimal(str(max_margin_rate)) if max_margin_rate is not None else None,
+        name_query=q,
+        name_match=match,
+    )
+    next_cursor = encode_cursor(rows[limit - 1].product_code) if len(rows) > limit else None
+    rows = rows[:limit]
+
+    # Patterns are copied out of the ORM now; the stream runs after the session closes.
+    patterns: Optional[Dict[str, list]] = None
+    pattern_stamps: list = []
+    if include_patterns:
+        patterns = {}
+        stored = price_patterns.get_price_patterns(session, [row.id for row in rows])
+        for product_id, product_patterns in stored.items():
+            patterns[product_id] = [
+                {
+                    "margin_rate": float(pattern.margin_rate),
+                    "price_per_kg": pattern.price_per_kg,
+                    "profit_per_kg": pattern.profit_per_kg,
                 }
-            },
-        )
-    if quantity is not None and quantity < Decimal("0"):
+                for pattern in product_patterns
+            ]
+            pattern_stamps += [pattern.updated_at for pattern in product_patterns]
+
+    query_key = "|".join(
+        str(value)
+        for value in (after, limit, category, min_margin_rate, max_margin_rate, q, match)
+    ) + f"|{include_patterns}"
+    etag = page_etag(query_key, rows, pattern_stamps)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    items = (
+        product_item(row, patterns[row.id] if patterns is not None else None) for row in rows
+    )
+    return StreamingResponse(
+        iter_page_json(items, next_cursor, limit),
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+@app.get("/api/price-patterns", response_model=ProductPricePatternsResponse)
+def get_product_price_patterns(
+    product_codes: list[str] = Query(...),
+    session: Session = Depends(get_read_session),
+) -> ProductPricePatternsResponse:
+    products = crud.get_products_by_codes(session, product_codes)
+    patterns = price_patterns.get_price_patterns(
+        session, [product.id for product in products.values()]
+    )
+    return ProductPricePatternsResponse(
+        products=[
+            ProductPricePatterns(
+                product_code=product.product_code,
+                product_name=product.product_name,
+                category=product.category,
+                unit_cost_per_kg=float(product.unit_cost_per_kg)
+                if product.unit_cost_per_kg is not None
+                else None,
+                price_patterns=[
+                    PricePattern(
+                        margin_rate=float(row.margin_rate),
+                        price_per_kg=row.price_per_kg,
+                        profit_per_kg=row.profit_per_kg,
+                    )
+                    for row in patterns[product.id]
+                ],
+            )
+            for product in (products[code] for code in product_codes if code in products)
+        ]
+    )
+
+
+@app.get(
+    "/api/price-optimization",
+    response_model=OptimalPriceResponse,
+    response_class=FastJSONResponse,
+)
+def get_optimal_prices(
+    product_codes: Optional[list[str]] = Query(default=None),
+    category: Optional[str] = None,
+    session: Session = Depends(get_read_session),
+) -> FastJSONResponse:
+    with span("pricing.optimize"):
+        solution = price_elasticity.solve(session, product_codes, category)
+    return FastJSONResponse(
+        OptimalPriceResponse(items=[OptimalPrice(**row) for row in solution.rows()])
+    )
+
+
+@app.get("/api/margin-ladders", response_model=MarginLadderListResponse)
+def list_margin_ladders(
+    session: Session = Depends(get_read_session),
+) -> MarginLadderListResponse:
+    return MarginLadderListResponse(
+        default=[float(rate) for rate in PRICE_PATTERN_MARGIN_RATES],
+        ladders=[
+            MarginLadderResponse(category=category, margin_rates=[float(rate) for rate in rates])
+            for category, rates in sorted(price_patterns.get_margin_ladders(session).items())
+        ],
+    )
+
+
+@app.put("/api/margin-ladders/{category}", response_model=MarginLadderResponse)
+def put_margin_ladder(
+    category: str,
+    payload: MarginLadderRequest,
+    session: Session = Depends(get_session),
+) -> MarginLadderResponse:
+    if len(payload.margin_rates) > MAX_LADDER_RATES:
         raise HTTPException(
             status_code=400,
             detail={
                 "error": {
                     "code": "INVALID_PARAM",
-                    "message": "quantity_kg must be greater than or equal to 0",
+                    "message": f"a ladder may contain at most {MAX_LADDER_RATES} margin rates",
                 }
             },
         )
-
-    one = Decimal("1")
-    recommended_price = unit_cost / (one - target_margin_rate)
-    gross_profit_per_kg = recommended_price - unit_cost
-
-    price_patterns = [
-        {
-            "margin_rate": float(round_rate(margin_rate)),
-            "price_per_kg": price_per_kg,
-            "profit_per_kg": profit_per_kg,
-        }
-        for margin_rate, price_per_kg, profit_per_kg in generate_price_patterns(unit_cost)
-    ]
-
-    gross_profit_total: Optional[int] = None
-    if quantity is not None:
-        gross_profit_total = round_jpy(gross_profit_per_kg * quantity)
-
-    recommended_price_rounded = round_jpy(recommended_price)
-    gross_profit_per_kg_rounded = round_jpy(gross_profit_per_kg)
-
-    return PriceSimulationResponse(
-        recommended_price_per_kg=recommended_price_rounded,
-        gross_profit_per_kg=gross_profit_per_kg_rounded,
-        gross_profit_total=gross_profit_total,
-        margin_rate=float(round_rate(target_margin_rate)),
-        price_patterns=price_patterns,
-        guard={
-            "min_allowed_price_per_kg": recommended_price_rounded,
-            "is_below_min": False,
-            "warning_message": None,
-        },
+    rates = [round_rate(rate) for rate in payload.margin_rates]
+    refreshed = price_patterns.set_margin_ladder(session, category, rates)
+    session.commit()
+    return MarginLadderResponse(
+        category=category,
+        margin_rates=[float(rate) for rate in sorted(set(rates)) or PRICE_PATTERN_MARGIN_RATES],
+        products_refreshed=refreshed,
     )
 
 
-@app.get("/api/break-even/current", response_model=BreakEvenResponse)
-def get_break_even(
-    year_month: str,
-    session: Session = Depends(get_session),
-) -> BreakEvenResponse:
+def _parse_year_month(year_month: str) -> date:
     try:
         year = int(year_month.split("-")[0])
         month = int(year_month.split("-")[1])
-        month_start = date(year, month, 1)
+        return date(year, month, 1)
     except Exception as exc:  # pragma: no cover - validation
         raise HTTPException(
             status_code=400,
             detail={"error": {"code": "INVALID_PARAM", "message": "Invalid year_month"}},
         ) from exc
 
-    # Determine next month
-    if month == 12:
-        month_end = date(year + 1, 1, 1)
-    else:
-        month_end = date(year, month + 1, 1)
 
-    fixed_cost_total = crud.get_fixed_cost_total(session, month_start)
-    revenue, variable_cost = crud.get_sales_summary(session, month_start, month_end)
+@app.get("/api/break-even/current", response_model=BreakEvenResponse)
+def get_break_even(
+    year_month: str,
+    session: Session = Depends(get_read_session),
+) -> BreakEvenResponse:
+    month_start = _parse_year_month(year_month)
+    cache_key = f"{month_start:%Y-%m}"
+    cached, generation = break_even_cache.get(cache_key)
+    if cached is not None:
+        return cached.copy(update={"year_month": year_month})
+
+    fixed_cost_total, revenue, variable_cost = crud.get_rollup_break_even_totals(
+        session, month_start
+    )
+
+    response = _build_break_even(year_month, fixed_cost_total, revenue, variable_cost)
+    if not on_replica(session):
+        # A lagging replica could cache totals from before the invalidating commit.
+        break_even_cache.set(cache_key, response, generation)
+    return response
+
+
+@app.get(
+    "/api/break-even/series",
+    response_model=BreakEvenSeriesResponse,
+    response_class=FastJSONResponse,
+)
+def get_break_even_series(
+    from_month: str = Query(..., alias="from"),
+    to_month: str = Query(..., alias="to"),
+    session: Session = Depends(get_read_session),
+) -> FastJSONResponse:
+    start = _parse_year_month(from_month)
+    last = _parse_year_month(to_month)
+    months = []
+    month = start
+    while month <= last and len(months) <= settings.break_even_series_max_months:
+        months.append(month)
+        month = crud.next_month(month)
+    if not months or len(months) > settings.break_even_series_max_months:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": {
+                    "code": "INVALID_PARAM",
+                    "message": "from must not be after to and the range may span at most "
+                    f"{settings.break_even_series_max_months} months",
+                }
+            },
+        )
+
+    end = crud.next_month(last)
+    sales = crud.get_rollup_monthly_totals(session, start, end)
+    fixed_costs = crud.get_fixed_cost_totals(session, start, end)
+    zero = Decimal("0")
 
-    variable_cost_rate = (
-        round_rate(variable_cost / revenue) if revenue > 0 else Decimal("0")
+    return FastJSONResponse(
+        BreakEvenSeriesResponse(
+            from_month=f"{start:%Y-%m}",
+            to_month=f"{last:%Y-%m}",
+            months=[
+                _build_break_even(
+                    f"{month:%Y-%m}",
+                    fixed_costs.get(month, zero),
+                    *sales.get(month, (zero, zero)),
+                )
+                for month in months
+            ],
+        )
     )
-    gross_margin_rate_raw = (
-        Decimal("1") - (variable_cost / revenue if revenue > 0 else Decimal("0"))
+
+
+@app.post(
+    "/api/break-even/sensitivity",
+    response_model=BreakEvenSensitivityResponse,
+    response_class=FastJSONResponse,
+)
+def get_break_even_sensitivity(
+    payload: BreakEvenSensitivityRequest,
+    session: Session = Depends(get_read_session),
+) -> FastJSONResponse:
+    month = _parse_year_month(payload.year_month)
+    shape = [
+        len(payload.fixed_cost_changes),
+        len(payload.unit_cost_changes),
+        len(payload.price_changes),
+    ]
+    points = shape[0] * shape[1] * shape[2]
+    if points == 0 or points > settings.break_even_sensitivity_max_points:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": {
+                    "code": "INVALID_PARAM",
+                    "message": "each change list needs at least one value and the grid may "
+                    f"hold at most {settings.break_even_sensitivity_max_points} points",
+                }
+            },
+        )
+
+    fixed_cost_total = crud.get_fixed_cost_total(session, month)
+    category_totals = crud.get_rollup_category_totals(session, month)
+    totals = sensitivity.split_mix(fixed_cost_total, category_totals, payload.categories)
+    with span("break_even.sensitivity"):
+        columns = sensitivity.evaluate_grid(
+            totals, payload.fixed_cost_changes, payload.unit_cost_changes, payload.price_changes
+        )
+    base = _build_break_even(
+        payload.year_month,
+        fixed_cost_total,
+        totals.revenue + totals.other_revenue,
+        totals.variable_cost + totals.other_variable_cost,
     )
-    gross_margin_rate = (
-        round_rate(gross_margin_rate_raw) if gross_margin_rate_raw > 0 else Decimal("0")
+    return FastJSONResponse(
+        BreakEvenSensitivityResponse(
+            year_month=payload.year_month,
+            categories=payload.categories,
+            fixed_cost_changes=payload.fixed_cost_changes,
+            unit_cost_changes=payload.unit_cost_changes,
+            price_changes=payload.price_changes,
+            shape=shape,
+            points=points,
+            base=base,
+            **columns,
+        )
     )
 
-    if gross_margin_rate_raw <= 0:
-        break_even_revenue = None
-        achievement_rate = Decimal("0")
-        delta_revenue = -fixed_cost_total
-    else:
-        break_even_value = fixed_cost_total / gross_margin_rate_raw
-        break_even_revenue = break_even_value
-        achievement_rate = (
-            revenue / break_even_value if break_even_value > 0 else Decimal("0")
+
+@app.get(
+    "/api/guard/violations",
+    response_model=GuardReportResponse,
+    response_class=FastJSONResponse,
+)
+def get_guard_violations(
+    from_month: str = Query(..., alias="from"),
+    to_month: str = Query(..., alias="to"),
+    level: str = Query(default="min", pattern="^(min|target)$"),
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=500),
+    session: Session = Depends(get_read_session),
+) -> FastJSONResponse:
+    start = _parse_year_month(from_month)
+    last = _parse_year_month(to_month)
+    if last < start:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": {"code": "INVALID_PARAM", "message": "from must not be after to"}},
+        )
+
+    total, rows = guard.violation_report(
+        session, start, crud.next_month(last), level, offset, limit
+    )
+    violations = []
+    for row in rows:
+        price = row.unit_price_per_kg
+        list_margin = None
+        if price and row.unit_cost_per_kg is not None:
+            unit_price = ensure_decimal(price)
+            unit_cost = ensure_decimal(row.unit_cost_per_kg)
+            list_margin = float(round_rate((unit_price - unit_cost) / unit_price))
+        violations.append(
+            GuardViolation(
+                product_id=row.product_id,
+                product_code=row.product_code,
+                product_name=row.product_name,
+                category=row.category,
+                min_margin_rate=row.min_margin_rate,
+                target_margin_rate=row.target_margin_rate,
+                unit_price_per_kg=price,
+                list_margin_rate=list_margin,
+                list_price_violation=bool(row.list_price_violation),
+                sale_lines=row.sale_lines,
+                violating_lines=row.violating_lines,
+                violating_quantity_kg=row.violating_quantity_kg,
+                lost_gross_profit=round_jpy(row.lost_gross_profit),
+                first_violation_date=row.first_violation_date,
+                last_violation_date=row.last_violation_date,
+                worst_margin_rate=float(round_rate(row.worst_margin_rate))
+                if row.worst_margin_rate is not None
+                else None,
+            )
         )
-        delta_revenue = revenue - break_even_value
 
-    if achievement_rate >= Decimal("1"):
-        status = "safe"
-    elif achievement_rate >= Decimal("0.8"):
-        status = "warning"
+    return FastJSONResponse(
+        GuardReportResponse(
+            from_month=f"{start:%Y-%m}",
+            to_month=f"{last:%Y-%m}",
+            level=level,
+            total=total,
+            offset=offset,
+            limit=limit,
+            violations=violations,
+        )
+    )
+
+
+def _build_break_even(
+    year_month: str,
+    fixed_cost_total: Decimal,
+    revenue: Decimal,
+    variable_cost: Decimal,
+) -> BreakEvenResponse:
+    # Exact scaled integers (see ``money``): the amounts share one decimal scale
+    # and every ratio is carried as numerator / denominator until rounding.
+    scale, (fixed, sales, variable) = to_common_scale(
+        [ensure_decimal(value) for value in (fixed_cost_total, revenue, variable_cost)]
+    )
+    if sales > 0:
+        variable_cost_rate = div_half_up(variable * RATE_SCALE, sales)
+        margin_numerator, margin_denominator = sales - variable, sales
     else:
+        variable_cost_rate = 0
+        margin_numerator, margin_denominator = 1, 1
+    gross_margin_rate = (
+        div_half_up(margin_numerator * RATE_SCALE, margin_denominator)
+        if margin_numerator > 0
+        else 0
+    )
+
+    achievement_rate = 0
+    if margin_numerator <= 0:
+        break_even_revenue = 0
+        delta_revenue = div_half_up(-fixed, scale)
         status = "danger"
+    else:
+        # break-even = fixed / margin; achievement = revenue / break-even.
+        break_even_revenue = div_half_up(fixed * margin_denominator, margin_numerator * scale)
+        delta_revenue = div_half_up(
+            sales * margin_numerator - fixed * margin_denominator, margin_numerator * scale
+        )
+        achieved = sales * margin_numerator
+        required = fixed * margin_denominator
+        if required > 0 and achieved > 0:
+            achievement_rate = div_half_up(achieved * RATE_SCALE, required)
+        if required > 0 and achieved >= required:
+            status = "safe"
+        elif required > 0 and 5 * achieved >= 4 * required:
+            status = "warning"
+        else:
+            status = "danger"
 
     return BreakEvenResponse(
         year_month=year_month,
-        fixed_costs=round_jpy(fixed_cost_total),
-        current_revenue=round_jpy(revenue),
-        variable_cost_rate=float(variable_cost_rate),
-        gross_margin_rate=float(gross_margin_rate),
-        break_even_revenue=round_jpy(break_even_revenue)
-        if break_even_revenue is not None
-        else 0,
-        achievement_rate=float(round_rate(achievement_rate))
-        if achievement_rate > 0
-        else 0.0,
-        delta_revenue=round_jpy(delta_revenue),
+        fixed_costs=div_half_up(fixed, scale),
+        current_revenue=div_half_up(sales, scale),
+        variable_cost_rate=variable_cost_rate / RATE_SCALE,
+        gross_margin_rate=gross_margin_rate / RATE_SCALE,
+        break_even_revenue=break_even_revenue,
+        achievement_rate=achievement_rate / RATE_SCALE,
+        delta_revenue=delta_revenue,
         status=status,
     )
 
 
+@app.get(
+    "/api/break-even/products",
+    response_model=BreakEvenBreakdownResponse,
+    response_class=FastJSONResponse,
+)
+def get_break_even_products(
+    year_month: str,
+    session: Session = Depends(get_read_session),
+) -> FastJSONResponse:
+    month_start = _parse_year_month(year_month)
+    rows = crud.get_rollup_product_breakdown(session, month_start)
+    total_revenue = sum((ensure_decimal(row.revenue) for row in rows), Decimal("0"))
+
+    products = []
+    for row in rows:
+        revenue = ensure_decimal(row.revenue)
+        variable_cost = ensure_decimal(row.variable_cost)
+        gross_profit = revenue - variable_cost
+        products.append(
+            BreakEvenProductBreakdown(
+                product_id=None if row.product_id == UNASSIGNED_PRODUCT_ID else row.product_id,
+                product_code=row.product_code,
+                product_name=row.product_name,
+                category=row.category,
+                revenue=round_jpy(revenue),
+                variable_cost=round_jpy(variable_cost),
+                gross_profit=round_jpy(gross_profit),
+                quantity_kg=float(row.quantity_kg),
+                gross_margin_rate=float(round_rate(gross_profit / revenue))
+                if revenue > 0
+                else 0.0,
+                revenue_share=float(round_rate(revenue / total_revenue))
+                if total_revenue > 0
+                else 0.0,
+            )
+        )
+
+    return FastJSONResponse(BreakEvenBreakdownResponse(year_month=year_month, products=products))
+
+
+@app.get("/api/metrics/pool")
+def get_pool_metrics() -> dict:
+    return {
+        "sync": pool_metrics.snapshot(),
+        "async": async_pool_metrics.snapshot(),
+        "replicas": get_replica_router().status(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_prometheus_metrics() -> PlainTextResponse:
+    return PlainTextResponse(
+        render_prometheus(
+            {
+                "sync": pool_metrics,
+                "async": async_pool_metrics,
+                **get_replica_router().pool_metrics(),
+            },
+            {"price_simulations": simulation_history},
+        ),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@app.get("/api/cache/stats")
+def get_cache_stats() -> dict:
+    return {"break_even": break_even_cache.stats()}
+
+
 def _parse_column_mapping(column_mapping: Optional[str]) -> Dict[str, str]:
     if not column_mapping:
         return DEFAULT_COLUMN_MAPPING
@@ -224,116 +902,152 @@ def _parse_column_mapping(column_mapping: Optional[str]) -> Dict[str, str]:
         ) from exc
 
 
-def _cell_value(sheet, column_letter: str, row_index: int) -> Any:
-    cell = sheet[f"{column_letter}{row_index}"]
-    return cell.value
-
-
-def _normalize_rate(value: Any) -> Optional[Decimal]:
-    if value is None:
-        return None
-    try:
-        numeric = Decimal(str(value))
-    except (InvalidOperation, TypeError, ValueError):
-        return None
-    if numeric > Decimal("1"):
-        numeric = numeric / Decimal("100")
-    if numeric < Decimal("0"):
-        return None
-    return round_rate(numeric)
-
-
-def _normalize_currency(value: Any) -> Optional[Decimal]:
-    if value is None:
+def _parse_sheet_selection(sheets: Optional[str]) -> Optional[List[str]]:
+    if not sheets:
         return None
+    if sheets.strip() == ALL_SHEETS:
+        return [ALL_SHEETS]
     try:
-        numeric = Decimal(str(value))
-    except (InvalidOperation, TypeError, ValueError):
-        return None
-    return (numeric * Decimal("1000")).quantize(Decimal("0.001"), rounding=ROUND_HALF_UP)
+        data = json.loads(sheets)
+        if not isinstance(data, list) or not data or not all(isinstance(v, str) for v in data):
+            raise ValueError
+        return data
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": {
+                    "code": "INVALID_PARAM",
+                    "message": 'sheets must be "*" or a JSON array of sheet names',
+                }
+            },
+        ) from exc
 
 
-@app.post("/api/import/excel", response_model=ExcelImportResponse)
+@app.post(
+    "/api/import/excel", response_model=ExcelImportResponse, response_class=FastJSONResponse
+)
 async def import_excel(
     file: UploadFile = File(...),
     column_mapping: Optional[str] = Form(default=None),
-    session: Session = Depends(get_session),
-) -> ExcelImportResponse:
-    from openpyxl import load_workbook
-
+    sheets: Optional[str] = Form(default=None),
+    session: AsyncSession = Depends(get_async_session),
+) -> FastJSONResponse:
     content = await file.read()
+    mapping = _parse_column_mapping(column_mapping)
+    selected_sheets = _parse_sheet_selection(sheets)
+
+    digest = workbook_digest(content, mapping, selected_sheets)
+    previous = await crud.get_applied_import_async(session, digest)
+    if previous is not None:
+        # Same bytes and mapping, and the catalog is untouched since: nothing to do.
+        summary = ImportSummary.duplicate_of(previous.imported, previous.skipped)
+        return FastJSONResponse(summary.to_response())
+
+    # openpyxl parsing is CPU-bound: the process pool parses every selected sheet
+    # in parallel while this coroutine writes chunks as they arrive.
+    loop = asyncio.get_running_loop()
+    chunks = iter_upload_chunks(
+        get_parse_executor(settings.import_parse_workers),
+        content,
+        mapping,
+        settings.import_chunk_size,
+        selected_sheets,
+        settings.import_parse_buffer_chunks,
+        settings.import_zip_max_members,
+        settings.import_zip_max_uncompressed_bytes,
+    )
+    summary = ImportSummary()
     try:
-        workbook = load_workbook(filename=io.BytesIO(content), data_only=True)
-    except Exception as exc:  # pragma: no cover - invalid file
+        while True:
+            with span("import.parse"):
+                chunk = await loop.run_in_executor(None, next, chunks, None)
+            if chunk is None:
+                break
+            started = time.perf_counter()
+            with span("import.upsert"):
+                counts = await crud.bulk_upsert_products_async(session, chunk.rows)
+            summary.add(chunk, counts, (time.perf_counter() - started) * 1000)
+    except (WorkbookError, UploadLimitError) as exc:
+        # Nothing is committed: the whole upload lands in one transaction or not at all.
+        await session.rollback()
+        code = "INVALID_PARAM" if isinstance(exc, UploadLimitError) else "INVALID_FILE"
         raise HTTPException(
             status_code=400,
-            detail={"error": {"code": "INVALID_FILE", "message": "Failed to read Excel file"}},
+            detail={"error": {"code": code, "message": str(exc)}},
         ) from exc
+    finally:
+        await loop.run_in_executor(None, chunks.close)
 
-    sheet = workbook.active
-    mapping = _parse_column_mapping(column_mapping)
-
-    imported = 0
-    skipped = 0
-    warnings: list[ExcelImportWarning] = []
-
-    for row in range(2, sheet.max_row + 1):
-        product_code = _cell_value(sheet, mapping["product_code"], row)
-        product_name = _cell_value(sheet, mapping["product_name"], row)
-
-        if not product_code or not product_name:
-            skipped += 1
-            warnings.append(
-                ExcelImportWarning(
-                    row=row,
-                    field="product_code",
-                    reason="missing product_code or product_name",
-                )
-            )
-            continue
+    await crud.record_product_import_async(
+        session, digest, file.filename, summary.imported, summary.skipped
+    )
+    await session.commit()
 
-        unit_cost = _normalize_currency(_cell_value(sheet, mapping["unit_cost_per_kg"], row))
-        unit_price = _normalize_currency(_cell_value(sheet, mapping["unit_price_per_kg"], row))
+    return FastJSONResponse(summary.to_response())
 
-        if unit_cost is None or unit_price is None:
-            skipped += 1
-            warnings.append(
-                ExcelImportWarning(
-                    row=row,
-                    field="unit_cost_per_kg",
-                    reason="non-numeric",
-                )
-            )
-            continue
 
-        target_margin_rate = _normalize_rate(
-            _cell_value(sheet, mapping["target_margin_rate"], row)
-        )
-        min_margin_rate = _normalize_rate(
-            _cell_value(sheet, mapping.get("min_margin_rate", ""), row)
-            if mapping.get("min_margin_rate")
-            else None
+@app.post(
+    "/api/import/sales", response_model=SalesImportResponse, response_class=FastJSONResponse
+)
+def import_sales_file(
+    file: UploadFile = File(...),
+    file_format: Optional[str] = Form(default=None, alias="format"),
+    session: Session = Depends(get_session),
+) -> FastJSONResponse:
+    # Sync endpoint: the threadpool streams the spooled upload without blocking the loop.
+    try:
+        fmt = detect_format(file.filename, file_format)
+        summary = import_sales(
+            session,
+            file.file,
+            fmt,
+            settings.sales_import_chunk_size,
+            settings.sales_import_max_warnings,
         )
-        category = _cell_value(sheet, mapping.get("category", ""), row)
-
-        product_data = {
-            "product_code": str(product_code).strip(),
-            "product_name": str(product_name).strip(),
-            "category": str(category).strip() if category else None,
-            "unit_cost_per_kg": unit_cost,
-            "unit_price_per_kg": unit_price,
-            "target_margin_rate": target_margin_rate,
-            "min_margin_rate": min_margin_rate,
-            "unit": "JPY/kg",
-        }
-
-        crud.upsert_product(session, product_data)
-        imported += 1
+    except SalesFileError as exc:
+        session.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail={"error": {"code": "INVALID_FILE", "message": str(exc)}},
+        ) from exc
+    return FastJSONResponse(summary.to_response())
+
+
+@app.post("/api/import/jobs", response_model=ImportJobStatus, status_code=202)
+async def submit_import_job(
+    file: UploadFile = File(...),
+    column_mapping: Optional[str] = Form(default=None),
+    sheets: Optional[str] = Form(default=None),
+    session_factory: sessionmaker = Depends(get_sessionmaker),
+) -> ImportJobStatus:
+    content = await file.read()
+    mapping = _parse_column_mapping(column_mapping)
+    job = import_jobs.submit(
+        content,
+        mapping,
+        settings.import_chunk_size,
+        session_factory,
+        filename=file.filename,
+        sheets=_parse_sheet_selection(sheets),
+    )
+    return job.status(warnings_offset=0, warnings_limit=0)
 
-    session.commit()
 
-    return ExcelImportResponse(
-        imported=imported,
-        skipped=skipped,
-        warnings=warnings,
+@app.get(
+    "/api/import/jobs/{job_id}", response_model=ImportJobStatus, response_class=FastJSONResponse
+)
+def get_import_job(
+    job_id: str,
+    warnings_offset: int = Query(default=0, ge=0),
+    warnings_limit: int = Query(default=100, ge=0, le=1000),
+) -> FastJSONResponse:
+    job = import_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": {"code": "NOT_FOUND", "message": "import job not found"}},
+        )
+    return FastJSONResponse(
+        job.status(warnings_offset=warnings_offset, warnings_limit=warnings_limit)
     )
@@ -0,0 +1,103 @@
+"""In-process metrics primitives and connection pool instrumentation."""
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Seconds; tuned for pool waits and request latencies alike.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram compatible with the Prometheus exposition model."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            cumulative = []
+            running = 0
+            for upper, count in zip((*self.buckets, float("inf")), self._counts):
+                running += count
+                cumulative.append((upper, running))
+            return {"count": self.count, "sum": self.sum, "buckets": cumulative}
+
+
+class PoolMetrics:
+    """Counters fed by SQLAlchemy pool events and ``InstrumentedQueuePool``."""
+
+    def __init__(self) -> None:
+        self.connections_created = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.overflow_events = 0
+        self.checkout_timeouts = 0
+        self.wait_seconds = Histogram()
+        self._lock = threading.Lock()
+        self._engine: Optional[Engine] = None
+
+    def instrument(self, engine: Engine) -> None:
+        self._engine = engine
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.connections_created += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def _on_checkin(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.checkins += 1
+            self.checked_out = max(self.checked_out - 1, 0)
+
+    def record_overflow(self) -> None:
+        with self._lock:
+            self.overflow_events += 1
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.checkout_timeouts += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        pool = self._engine.pool if self._engine is not None else None
+        return {
+            "pool_class": type(pool).__name__ if pool is not None else None,
+            "status": pool.status() if pool is not None else None,
+            "connections_created": self.connections_created,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "checked_out": self.checked_out,
+            "peak_checked_out": self.peak_checked_out,
+            "overflow_events": self.overflow_events,
+            "checkout_timeouts": self.checkout_timeouts,
+            "wait_seconds": self.wait_seconds.snapshot(),
+        }
+
+
+pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
@@ -0,0 +1,40 @@
+"""Create missing tables from the ORM models.
+
+Importing the app no longer touches the database. Development setups create the
+schema in the FastAPI lifespan (``PRICING_CREATE_SCHEMA_ON_STARTUP``, on by
+default); deployments turn that off and run this once per release instead, so
+workers skip the ``create_all`` introspection queries on every cold start::
+
+    python -m app.migrate
+
+Supabase itself is still migrated with the scripts in ``sql/``.
+"""
+from __future__ import annotations
+
+import argparse
+from typing import List, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+
+from . import models  # noqa: F401  (registers the tables on Base.metadata)
+from .database import Base, get_engine
+
+
+def create_schema(engine: Optional[Engine] = None) -> List[str]:
+    """Run ``create_all`` and return the names of the tables it created."""
+    engine = engine or get_engine()
+    existing = set(inspect(engine).get_table_names())
+    Base.metadata.create_all(bind=engine)
+    return [table for table in Base.metadata.tables if table not in existing]
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.migrate")
+    parser.parse_args(argv)
+    created = create_schema()
+    print(f"created {len(created)} tables" + (f": {', '.join(created)}" if created else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,25 @@ from datetime import date, datetime
 from typing import Optional
 from uuid import uuid4
 
-from sqlalchemy import Date, DateTime, ForeignKey, Numeric, String, Text
+from sqlalchemy import (
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    Numeric,
+    String,
+    Text,
+    event,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .database import Base
+from .utils import PRODUCT_HASH_FIELDS, product_content_hash
+
+
+# Nil UUID used by the sales rollup for sales rows without a product.
+UNASSIGNED_PRODUCT_ID = "00000000-0000-0000-0000-000000000000"
 
 
 def _uuid() -> str:
@@ -16,6 +31,14 @@ def _uuid() -> str:
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Catalog filters; product_code's unique index serves the keyset order.
+        # The pg_trgm name index lives in sql/005_product_catalog_indexes.sql.
+        Index("ix_products_category_code", "category", "product_code"),
+        Index("ix_products_target_margin_rate", "target_margin_rate", "product_code"),
+        # max(updated_at) decides whether a duplicate workbook can be skipped.
+        Index("ix_products_updated_at", "updated_at"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid)
     product_code: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
@@ -26,6 +49,8 @@ class Product(Base):
     target_margin_rate: Mapped[Optional[float]] = mapped_column(Numeric(6, 4))
     min_margin_rate: Mapped[Optional[float]] = mapped_column(Numeric(6, 4))
     unit: Mapped[str] = mapped_column(Text, default="JPY/kg", nullable=False)
+    # utils.product_content_hash of the importable fields; unchanged rows are not rewritten.
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
@@ -34,8 +59,25 @@ class Product(Base):
     sales: Mapped[list["SalesData"]] = relationship(back_populates="product")
 
 
+@event.listens_for(Product, "before_insert")
+@event.listens_for(Product, "before_update")
+def _refresh_content_hash(mapper, connection, target: Product) -> None:
+    # Keeps the hash honest for ORM writes; the bulk importer sets it itself.
+    if target.unit is None:
+        # Column defaults are applied after this hook; hash what will be stored.
+        target.unit = "JPY/kg"
+    target.content_hash = product_content_hash(
+        {field: getattr(target, field) for field in PRODUCT_HASH_FIELDS}
+    )
+
+
 class PriceSimulation(Base):
     __tablename__ = "price_simulations"
+    __table_args__ = (
+        # History by product, newest first, and the unfiltered time-range listing.
+        Index("ix_price_simulations_product_simulation_at", "product_id", "simulation_at"),
+        Index("ix_price_simulations_simulation_at", "simulation_at"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid)
     product_id: Mapped[Optional[str]] = mapped_column(String(36), ForeignKey("products.id"))
@@ -54,6 +96,7 @@ class PriceSimulation(Base):
 
 class FixedCost(Base):
     __tablename__ = "fixed_costs"
+    __table_args__ = (Index("ix_fixed_costs_year_month", "year_month", "amount"),)
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid)
     year_month: Mapped[date] = mapped_column(Date, nullable=False)
@@ -64,6 +107,17 @@ class FixedCost(Base):
 
 class SalesData(Base):
     __tablename__ = "sales_data"
+    __table_args__ = (
+        # Covering index: month-range sums are answered without touching the heap.
+        Index(
+            "ix_sales_data_sale_date_amounts",
+            "sale_date",
+            "quantity_kg",
+            "unit_price_per_kg",
+            "unit_cost_per_kg",
+        ),
+        Index("ix_sales_data_product_id", "product_id"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid)
     product_id: Mapped[Optional[str]] = mapped_column(String(36), ForeignKey("products.id"))
@@ -74,3 +128,68 @@ class SalesData(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     product: Mapped[Optional[Product]] = relationship(back_populates="sales")
+
+
+class MonthlySalesRollup(Base):
+    """Per month/product sales totals maintained incrementally from ``sales_data``."""
+
+    __tablename__ = "monthly_sales_rollup"
+
+    year_month: Mapped[date] = mapped_column(Date, primary_key=True)
+    product_id: Mapped[str] = mapped_column(
+        String(36), primary_key=True, default=UNASSIGNED_PRODUCT_ID
+    )
+    revenue: Mapped[float] = mapped_column(Numeric(20, 6), nullable=False, default=0)
+    variable_cost: Mapped[float] = mapped_column(Numeric(20, 6), nullable=False, default=0)
+    quantity_kg: Mapped[float] = mapped_column(Numeric(16, 3), nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+
+class ProductImport(Base):
+    """Workbooks already applied, keyed by a hash of their bytes and column mapping.
+
+    A re-upload is skipped only while ``products_updated_at`` and ``product_count``
+    still match the catalog, i.e. nothing changed the products since that import.
+    """
+
+    __tablename__ = "product_imports"
+
+    content_sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    filename: Mapped[Optional[str]] = mapped_column(String(255))
+    imported: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    skipped: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    products_updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    product_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    imported_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+
+class MarginLadder(Base):
+    """Margin rates offered as price patterns for one product category.
+
+    Categories without rows fall back to ``utils.PRICE_PATTERN_MARGIN_RATES``.
+    """
+
+    __tablename__ = "margin_ladders"
+
+    category: Mapped[str] = mapped_column(String(100), primary_key=True)
+    margin_rate: Mapped[float] = mapped_column(Numeric(6, 4), primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class ProductPricePattern(Base):
+    """Precomputed ``cost / (1 - margin)`` prices, refreshed when cost or ladder changes."""
+
+    __tablename__ = "product_price_patterns"
+
+    product_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("products.id", ondelete="CASCADE"), primary_key=True
+    )
+    margin_rate: Mapped[float] = mapped_column(Numeric(6, 4), primary_key=True)
+    price_per_kg: Mapped[int] = mapped_column(Integer, nullable=False)
+    profit_per_kg: Mapped[int] = mapped_column(Integer, nullable=False)
+    unit_cost_per_kg: Mapped[float] = mapped_column(Numeric(14, 3), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
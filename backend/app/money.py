@@ -0,0 +1,76 @@
+"""Exact scaled-integer money arithmetic for the pricing hot path.
+
+Amounts are held as ``int`` multiples of the column precision: yen and kg
+×1000 (``Numeric(14, 3)``) and rates ×10000 (``Numeric(6, 4)``). Division
+rounds half away from zero, which is what ``Decimal``'s ``ROUND_HALF_UP``
+(四捨五入) does, so results match the ``Decimal`` code in ``utils`` exactly.
+
+Conversions are exact or nothing: ``to_scaled`` returns ``None`` for a value
+with more decimals than the scale holds, and callers fall back to ``Decimal``.
+Floats are read by their shortest repr, the same digits ``Decimal(str(x))`` sees.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Any, Optional, Sequence, Tuple
+
+YEN_SCALE = 1000
+QUANTITY_SCALE = 1000
+RATE_SCALE = 10000
+
+# Digits kept before half-up rounding of float arrays; far below a yen, far
+# above float64 noise.
+SNAP_DECIMALS = 6
+# Below this magnitude floats are spaced far closer than 1/RATE_SCALE, so no two
+# numbers with four decimals share a float and the round-trip check is exact.
+_FLOAT_EXACT_LIMIT = 1e9
+
+
+def to_scaled(value: Any, scale: int) -> Optional[int]:
+    """``value * scale`` as an ``int`` when that is exact, otherwise ``None``."""
+    kind = type(value)
+    if kind is int:
+        return value * scale
+    if kind is float:
+        if not -_FLOAT_EXACT_LIMIT < value < _FLOAT_EXACT_LIMIT:
+            return None  # also rejects nan and ±inf
+        scaled = round(value * scale)
+        # The division is correctly rounded, so equality means the float's
+        # shortest repr has at most log10(scale) decimals and equals scaled/scale.
+        return scaled if scaled / scale == value else None
+    if kind is Decimal:
+        if not value.is_finite():
+            return None
+        numerator, denominator = value.as_integer_ratio()
+        scaled, remainder = divmod(numerator * scale, denominator)
+        return None if remainder else scaled
+    return None
+
+
+def to_common_scale(values: Sequence[Decimal]) -> Tuple[int, Tuple[int, ...]]:
+    """Scale finite ``Decimal`` values to integers sharing the smallest exact scale."""
+    places = max([0, *(-value.as_tuple().exponent for value in values)])
+    scale = 10**places
+    return scale, tuple(int(value.scaleb(places)) for value in values)
+
+
+def div_half_up(numerator: int, denominator: int) -> int:
+    """``numerator / denominator`` rounded half away from zero (ROUND_HALF_UP)."""
+    if denominator < 0:
+        numerator, denominator = -numerator, -denominator
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if remainder * 2 >= denominator:
+        quotient += 1
+    return quotient if numerator >= 0 else -quotient
+
+
+def half_up_array(np: Any, values: Any, places: int) -> Any:
+    """Round a NumPy float array half away from zero to ``places`` decimals.
+
+    Values are snapped to ``SNAP_DECIMALS`` first so that float noise such as
+    ``0.49999999999`` for an exact half does not round down. ``np`` is passed in
+    so that importing this module never loads NumPy.
+    """
+    scale = 10**places
+    scaled = np.round(values * scale, SNAP_DECIMALS)
+    return np.sign(scaled) * np.floor(np.abs(scaled) + 0.5) / scale
@@ -0,0 +1,243 @@
+"""Request timing, per-request query accounting, spans and Prometheus export.
+
+``TimingMiddleware`` opens a ``RequestStats`` in a context variable for every
+request. SQLAlchemy cursor hooks add query counts and DB time to it (the
+context is copied into FastAPI's threadpool and SQLAlchemy's asyncio greenlets,
+so sync and async endpoints are both covered), and ``span()`` records named
+stages such as workbook parsing, upserts and rollup maintenance.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .metrics import DEFAULT_BUCKETS, Histogram, PoolMetrics
+
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar(
+    "pricing_request_stats", default=None
+)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.request_seconds: Dict[Tuple[str, str], Histogram] = {}
+        self.request_db_seconds: Dict[Tuple[str, str], Histogram] = {}
+        self.request_queries: Dict[Tuple[str, str], Histogram] = {}
+        self.responses: Dict[Tuple[str, str, str], int] = {}
+        self.query_seconds = Histogram()
+        self.span_seconds: Dict[str, Histogram] = {}
+
+    def _histogram(self, family: dict, key, buckets=DEFAULT_BUCKETS) -> Histogram:
+        histogram = family.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = family.setdefault(key, Histogram(buckets))
+        return histogram
+
+    def observe_request(
+        self, method: str, route: str, status: int, seconds: float, stats: RequestStats
+    ) -> None:
+        key = (method, route)
+        self._histogram(self.request_seconds, key).observe(seconds)
+        self._histogram(self.request_db_seconds, key).observe(stats.db_seconds)
+        self._histogram(self.request_queries, key, QUERY_COUNT_BUCKETS).observe(stats.queries)
+        with self._lock:
+            status_key = (method, route, str(status))
+            self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+    def observe_span(self, name: str, seconds: float) -> None:
+        self._histogram(self.span_seconds, name).observe(seconds)
+
+    def reset(self) -> None:
+        self.__init__()
+
+
+registry = Registry()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a named stage (``import.parse``, ``rollup.apply`` ...)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe_span(name, time.perf_counter() - started)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("pricing_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["pricing_query_started"].pop()
+    elapsed = time.perf_counter() - started
+    registry.query_seconds.observe(elapsed)
+    stats = _current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def instrument_queries(engine: Engine) -> None:
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class TimingMiddleware:
+    """ASGI middleware recording latency, query count and DB time per endpoint."""
+
+    def __init__(self, app, profiler=None) -> None:
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.profiler is not None:
+            self.profiler.start()
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_request.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            registry.observe_request(scope["method"], route_path, status, elapsed, stats)
+            if self.profiler is not None:
+                # Only queues the dump: the profiler's writer thread does the file I/O.
+                self.profiler.request_finished(scope["method"], route_path, started, elapsed)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels: str) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _render_histogram(
+    lines: List[str], name: str, histogram: Histogram, **labels: str
+) -> None:
+    snapshot = histogram.snapshot()
+    for upper, count in snapshot["buckets"]:
+        le = "+Inf" if upper == float("inf") else repr(float(upper))
+        lines.append(f"{name}_bucket{_labels(**labels, le=le)} {count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {snapshot['sum']}")
+    lines.append(f"{name}_count{_labels(**labels)} {snapshot['count']}")
+
+
+def render_prometheus(
+    pools: Dict[str, PoolMetrics], buffers: Optional[Dict[str, Any]] = None
+) -> str:
+    """Text exposition of the registry, pool metrics and write-behind ``buffers``."""
+    lines: List[str] = []
+
+    histogram_families = (
+        ("pricing_request_duration_seconds", "Request latency.", registry.request_seconds),
+        ("pricing_request_db_seconds", "DB time per request.", registry.request_db_seconds),
+        ("pricing_request_queries", "SQL statements per request.", registry.request_queries),
+    )
+    for name, help_text, family in histogram_families:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for (method, route), histogram in sorted(family.items()):
+            _render_histogram(lines, name, histogram, method=method, route=route)
+
+    lines += [
+        "# HELP pricing_responses_total Responses by status code.",
+        "# TYPE pricing_responses_total counter",
+    ]
+    for (method, route, status), count in sorted(registry.responses.items()):
+        lines.append(
+            f"pricing_responses_total{_labels(method=method, route=route, status=status)} {count}"
+        )
+
+    lines += [
+        "# HELP pricing_db_query_duration_seconds SQL statement latency.",
+        "# TYPE pricing_db_query_duration_seconds histogram",
+    ]
+    _render_histogram(lines, "pricing_db_query_duration_seconds", registry.query_seconds)
+
+    lines += [
+        "# HELP pricing_span_duration_seconds Named processing stages.",
+        "# TYPE pricing_span_duration_seconds histogram",
+    ]
+    for name, histogram in sorted(registry.span_seconds.items()):
+        _render_histogram(lines, "pricing_span_duration_seconds", histogram, span=name)
+
+    gauges = (
+        ("pricing_db_pool_checked_out", "gauge", "checked_out"),
+        ("pricing_db_pool_connections_created_total", "counter", "connections_created"),
+        ("pricing_db_pool_overflow_total", "counter", "overflow_events"),
+        ("pricing_db_pool_timeouts_total", "counter", "checkout_timeouts"),
+    )
+    for name, kind, attribute in gauges:
+        lines += [f"# TYPE {name} {kind}"]
+        for pool_name, metrics in pools.items():
+            lines.append(f"{name}{_labels(pool=pool_name)} {getattr(metrics, attribute)}")
+    lines += ["# TYPE pricing_db_pool_wait_seconds histogram"]
+    for pool_name, metrics in pools.items():
+        _render_histogram(
+            lines, "pricing_db_pool_wait_seconds", metrics.wait_seconds, pool=pool_name
+        )
+
+    buffer_metrics = (
+        ("pricing_write_behind_enqueued_total", "counter", "enqueued"),
+        ("pricing_write_behind_written_total", "counter", "written"),
+        ("pricing_write_behind_dropped_total", "counter", "dropped"),
+        ("pricing_write_behind_write_errors_total", "counter", "write_errors"),
+        ("pricing_write_behind_backpressure_waits_total", "counter", "backpressure_waits"),
+        ("pricing_write_behind_backpressure_seconds_total", "counter", "backpressure_seconds"),
+        ("pricing_write_behind_queue_depth", "gauge", "queue_depth"),
+    )
+    buffers = buffers or {}
+    snapshots = {buffer_name: buffer.stats() for buffer_name, buffer in buffers.items()}
+    for name, kind, key in buffer_metrics:
+        lines += [f"# TYPE {name} {kind}"]
+        for buffer_name, stats in snapshots.items():
+            lines.append(f"{name}{_labels(buffer=buffer_name)} {stats[key]}")
+    lines += ["# TYPE pricing_write_behind_flush_seconds histogram"]
+    for buffer_name, buffer in buffers.items():
+        _render_histogram(
+            lines,
+            "pricing_write_behind_flush_seconds",
+            buffer.flush_seconds_histogram,
+            buffer=buffer_name,
+        )
+
+    return "\n".join(lines) + "\n"
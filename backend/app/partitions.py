@@ -0,0 +1,99 @@
+"""Monthly range partitions of ``sales_data`` on PostgreSQL.
+
+``sql/008_sales_data_partitioning.sql`` turns ``sales_data`` into a table
+partitioned by ``sale_date`` month and adds ``ensure_sales_data_partition``.
+PostgreSQL cannot create a partition from inside an INSERT on its parent, so
+the application asks for the partition before writing a month it has not seen:
+the ORM flush hook below covers ``SalesData`` objects and
+``crud.insert_sales_rows`` covers the bulk (COPY) path.
+
+Each partition is created on its own short autocommit connection, so the
+catalog lock is not held for the rest of a long import transaction. Known
+months are cached per engine. SQLite and unmigrated PostgreSQL databases are
+left alone.
+"""
+from __future__ import annotations
+
+import threading
+import weakref
+from datetime import date
+from typing import Iterable, Set, Union
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from .models import SalesData
+
+_PARTITIONED_SQL = text(
+    "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table"
+    " WHERE partrelid = to_regclass('public.sales_data'))"
+)
+_ENSURE_SQL = text("SELECT public.ensure_sales_data_partition(:month)")
+
+
+class _EngineState:
+    def __init__(self, partitioned: bool) -> None:
+        self.partitioned = partitioned
+        self.months: Set[date] = set()
+
+
+class SalesPartitions:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._engines: "weakref.WeakKeyDictionary[Engine, _EngineState]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def ensure(self, bind: Union[Session, Connection, Engine], months: Iterable[date]) -> None:
+        """Create the partitions for ``months`` (first days) that may not exist yet."""
+        engine = _engine_of(bind)
+        if engine.dialect.name != "postgresql":
+            return
+        wanted = {month.replace(day=1) for month in months}
+        state = self._state(engine)
+        if not state.partitioned:
+            return
+        missing = sorted(wanted - state.months)
+        if not missing:
+            return
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            for month in missing:
+                connection.execute(_ENSURE_SQL, {"month": month})
+        with self._lock:
+            state.months.update(missing)
+
+    def forget(self, engine: Engine) -> None:
+        """Drop cached state, e.g. after running the partitioning migration."""
+        with self._lock:
+            self._engines.pop(engine, None)
+
+    def _state(self, engine: Engine) -> _EngineState:
+        with self._lock:
+            state = self._engines.get(engine)
+        if state is None:
+            with engine.connect() as connection:
+                state = _EngineState(bool(connection.execute(_PARTITIONED_SQL).scalar()))
+            with self._lock:
+                state = self._engines.setdefault(engine, state)
+        return state
+
+
+def _engine_of(bind: Union[Session, Connection, Engine]) -> Engine:
+    if isinstance(bind, Session):
+        bind = bind.get_bind()
+    return bind.engine if isinstance(bind, Connection) else bind
+
+
+def _ensure_flush_partitions(session: Session, flush_context, instances) -> None:
+    months = {
+        obj.sale_date
+        for obj in (*session.new, *session.dirty)
+        if isinstance(obj, SalesData) and obj.sale_date is not None
+    }
+    if months:
+        sales_partitions.ensure(session, months)
+
+
+sales_partitions = SalesPartitions()
+event.listen(Session, "before_flush", _ensure_flush_partitions)
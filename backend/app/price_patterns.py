@@ -0,0 +1,230 @@
+"""Per-category margin ladders and the precomputed ``product_price_patterns`` table.
+
+Ladders live in ``margin_ladders`` and are cached in memory (dropped on commit
+of any ladder write, and after ``PRICING_MARGIN_LADDER_CACHE_TTL_SECONDS`` so
+other workers pick up changes). A product's patterns are recomputed when its
+``unit_cost_per_kg`` or ``category`` changes: ORM writes (``crud.upsert_product``)
+are caught by the ``after_flush`` hook below, and ``crud.bulk_upsert_products``
+calls ``refresh_product_patterns`` itself.
+
+Backfill or repair the table with::
+
+    python -m app.price_patterns rebuild
+"""
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import delete, event, inspect, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .config import get_settings
+from .models import MarginLadder, Product, ProductPricePattern
+from .utils import PRICE_PATTERN_MARGIN_RATES, ensure_decimal, generate_price_patterns
+
+Bind = Union[Session, Connection]
+ProductCost = Tuple[str, Optional[str], Optional[Decimal]]
+Ladder = Tuple[Decimal, ...]
+
+_LADDER_WRITE_KEY = "margin_ladder_written"
+# Keeps ``product_id IN (...)`` lists well under driver parameter limits.
+REFRESH_BATCH_SIZE = 1000
+
+
+class MarginLadderCache:
+    """All ladders in one dict, loaded with a single query on first use."""
+
+    def __init__(self, ttl_seconds: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._ladders: Optional[Dict[str, Ladder]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def ladders(self, bind: Bind) -> Dict[str, Ladder]:
+        ladders = self._ladders
+        if ladders is not None and self._clock() - self._loaded_at < self.ttl_seconds:
+            return ladders
+        rows = bind.execute(
+            select(MarginLadder.category, MarginLadder.margin_rate).order_by(
+                MarginLadder.category, MarginLadder.margin_rate
+            )
+        ).all()
+        loaded: Dict[str, List[Decimal]] = {}
+        for category, margin_rate in rows:
+            loaded.setdefault(category, []).append(ensure_decimal(margin_rate))
+        with self._lock:
+            self._ladders = {category: tuple(rates) for category, rates in loaded.items()}
+            self._loaded_at = self._clock()
+            return self._ladders
+
+    def ladder_for(self, bind: Bind, category: Optional[str]) -> Ladder:
+        if category is None:
+            return PRICE_PATTERN_MARGIN_RATES
+        return self.ladders(bind).get(category, PRICE_PATTERN_MARGIN_RATES)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._ladders = None
+
+
+margin_ladders = MarginLadderCache(get_settings().margin_ladder_cache_ttl_seconds)
+
+
+def refresh_product_patterns(
+    bind: Bind, products: Iterable[ProductCost], ladder: Optional[Ladder] = None
+) -> int:
+    """Replace the stored patterns of ``(product_id, category, unit_cost)`` entries.
+
+    Each product uses its category's ladder unless ``ladder`` is given. Products
+    without a positive cost keep no patterns. Returns the rows written.
+    """
+    products = list(products)
+    if not products:
+        return 0
+    now = datetime.utcnow()
+    table = ProductPricePattern.__table__
+    written = 0
+    for offset in range(0, len(products), REFRESH_BATCH_SIZE):
+        batch = products[offset : offset + REFRESH_BATCH_SIZE]
+        bind.execute(delete(table).where(table.c.product_id.in_([item[0] for item in batch])))
+        rows = []
+        for product_id, category, unit_cost in batch:
+            if unit_cost is None or ensure_decimal(unit_cost) <= 0:
+                continue
+            for margin_rate, price, profit in generate_price_patterns(
+                unit_cost, ladder or margin_ladders.ladder_for(bind, category)
+            ):
+                rows.append(
+                    {
+                        "product_id": product_id,
+                        "margin_rate": margin_rate,
+                        "price_per_kg": price,
+                        "profit_per_kg": profit,
+                        "unit_cost_per_kg": unit_cost,
+                        "updated_at": now,
+                    }
+                )
+        if rows:
+            bind.execute(table.insert(), rows)
+            written += len(rows)
+    return written
+
+
+def rebuild_product_patterns(bind: Bind, category: Optional[str] = None) -> int:
+    """Recompute patterns for every product (or one category)."""
+    stmt = select(Product.id, Product.category, Product.unit_cost_per_kg)
+    if category is not None:
+        stmt = stmt.where(Product.category == category)
+    return refresh_product_patterns(bind, bind.execute(stmt).all())
+
+
+def get_margin_ladders(session: Session) -> Dict[str, Ladder]:
+    return margin_ladders.ladders(session)
+
+
+def set_margin_ladder(session: Session, category: str, margin_rates: Sequence[Decimal]) -> int:
+    """Replace ``category``'s ladder (empty resets to the default) and refresh its products.
+
+    Returns the number of products whose patterns were recomputed.
+    """
+    ladder = tuple(sorted(set(margin_rates)))
+    session.execute(delete(MarginLadder).where(MarginLadder.category == category))
+    session.add_all(MarginLadder(category=category, margin_rate=rate) for rate in ladder)
+    # The cached ladders are dropped once this transaction commits.
+    session.info[_LADDER_WRITE_KEY] = True
+    products = session.execute(
+        select(Product.id, Product.category, Product.unit_cost_per_kg).where(
+            Product.category == category
+        )
+    ).all()
+    refresh_product_patterns(session, products, ladder or PRICE_PATTERN_MARGIN_RATES)
+    return len(products)
+
+
+def get_price_patterns(
+    session: Session, product_ids: Sequence[str]
+) -> Dict[str, List[ProductPricePattern]]:
+    patterns: Dict[str, List[ProductPricePattern]] = {product_id: [] for product_id in product_ids}
+    if not product_ids:
+        return patterns
+    rows = session.execute(
+        select(ProductPricePattern)
+        .where(ProductPricePattern.product_id.in_(list(product_ids)))
+        .order_by(ProductPricePattern.product_id, ProductPricePattern.margin_rate)
+    ).scalars()
+    for row in rows:
+        patterns[row.product_id].append(row)
+    return patterns
+
+
+def _pattern_inputs_changed(product: Product) -> bool:
+    state = inspect(product)
+    return (
+        state.attrs.unit_cost_per_kg.history.has_changes()
+        or state.attrs.category.history.has_changes()
+    )
+
+
+def _refresh_flushed_products(session: Session, flush_context) -> None:
+    changed = [
+        (obj.id, obj.category, obj.unit_cost_per_kg)
+        for obj in (*session.new, *session.dirty)
+        if isinstance(obj, Product) and (obj in session.new or _pattern_inputs_changed(obj))
+    ]
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, Product)]
+    if any(
+        isinstance(obj, MarginLadder)
+        for obj in (*session.new, *session.dirty, *session.deleted)
+    ):
+        session.info[_LADDER_WRITE_KEY] = True
+    if not changed and not deleted:
+        return
+
+    # A cold ``margin_ladders`` entry selects from margin_ladders mid-flush; on the
+    # bare connection that read cannot trigger an autoflush of the flush in progress,
+    # and the pattern rows still land in the product change's transaction.
+    connection = session.connection()
+    refresh_product_patterns(connection, changed)
+    if deleted:
+        # Mirrors ON DELETE CASCADE for SQLite, which does not enforce foreign keys.
+        table = ProductPricePattern.__table__
+        connection.execute(delete(table).where(table.c.product_id.in_(deleted)))
+
+
+def _invalidate_committed_ladders(session: Session) -> None:
+    if session.info.pop(_LADDER_WRITE_KEY, False):
+        margin_ladders.invalidate()
+
+
+def _discard_ladder_writes(session: Session) -> None:
+    session.info.pop(_LADDER_WRITE_KEY, None)
+
+
+event.listen(Session, "after_flush", _refresh_flushed_products)
+event.listen(Session, "after_commit", _invalidate_committed_ladders)
+event.listen(Session, "after_rollback", _discard_ladder_writes)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.price_patterns")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    rebuild = subcommands.add_parser("rebuild", help="recompute product_price_patterns")
+    rebuild.add_argument("--category", help="only products of this category")
+    args = parser.parse_args(argv)
+
+    from .database import session_scope
+
+    with session_scope() as session:
+        rows = rebuild_product_patterns(session, args.category)
+    print(f"rebuilt {rows} product_price_patterns rows")
+
+
+if __name__ == "__main__":
+    main()
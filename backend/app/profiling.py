@@ -0,0 +1,144 @@
+"""Opt-in sampling profiler for slow requests.
+
+Enabled with ``PRICING_PROFILING_ENABLED=true``. A single daemon thread samples
+every thread's Python stack at ``profiling_interval_ms`` into a bounded ring
+buffer. When a request takes longer than ``profiling_slow_request_ms`` the
+samples taken during it are written to ``profiling_output_dir`` in the
+collapsed-stack format understood by ``flamegraph.pl`` and speedscope::
+
+    MainThread;app/main.py:get_break_even;app/crud.py:get_rollup_break_even_totals 12
+
+Samples cover the whole process, so concurrent requests show up in each
+other's profiles; the thread name prefix keeps them apart. Files are written by
+a single background writer thread, never on the event loop.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Deque, Optional, Tuple
+
+Sample = Tuple[float, Tuple[str, ...]]
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    parts = Path(filename).parts
+    if "app" in parts:
+        filename = "/".join(parts[parts.index("app") :])
+    else:
+        filename = Path(filename).name
+    return f"{filename}:{code.co_name}"
+
+
+class SamplingProfiler:
+    def __init__(
+        self,
+        interval_ms: float,
+        slow_request_ms: float,
+        output_dir: str,
+        history_seconds: float = 120,
+    ) -> None:
+        self.interval = interval_ms / 1000
+        self.slow_request_seconds = slow_request_ms / 1000
+        self.output_dir = Path(output_dir)
+        max_samples = max(int(history_seconds / self.interval), 1)
+        self._samples: Deque[Sample] = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self.profiles_written = 0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._writer = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="pricing-profiler-writer"
+            )
+            self._thread = threading.Thread(
+                target=self._run, name="pricing-profiler", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for queued profiles to be written."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            writer, self._writer = self._writer, None
+        if thread is not None:
+            self._stopped.set()
+            thread.join()
+        if writer is not None:
+            writer.shutdown(wait=True)
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            self.sample(skip_ident=own_ident)
+
+    def sample(self, skip_ident: Optional[int] = None) -> None:
+        now = time.perf_counter()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == skip_ident:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            stack.reverse()
+            self._samples.append((now, tuple(stack)))
+
+    def collapsed(self, started: float, finished: float) -> Counter:
+        stacks: Counter = Counter()
+        for timestamp, stack in list(self._samples):
+            if started <= timestamp <= finished:
+                stacks[";".join(stack)] += 1
+        return stacks
+
+    def request_finished(
+        self, method: str, route: str, started: float, elapsed: float
+    ) -> Optional[Path]:
+        """Queue the profile of a slow request for the writer thread and return its path.
+
+        Nothing is written when no samples fall inside the request.
+        """
+        if elapsed < self.slow_request_seconds:
+            return None
+        writer = self._writer
+        if writer is None:
+            return None
+        finished = started + elapsed
+        slug = route.strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+        path = self.output_dir / (
+            f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{method.lower()}-{slug}"
+            f"-{int(elapsed * 1000)}ms-{os.getpid()}.folded"
+        )
+        try:
+            writer.submit(self._write, path, started, finished)
+        except RuntimeError:  # stopped concurrently
+            return None
+        return path
+
+    def _write(self, path: Path, started: float, finished: float) -> None:
+        stacks = self.collapsed(started, finished)
+        if not stacks:
+            return
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        )
+        self.profiles_written += 1
@@ -0,0 +1,165 @@
+"""Read-replica routing for read-only endpoints.
+
+``PRICING_READ_DATABASE_URLS`` lists replicas; ``database.get_read_session``
+hands read-only endpoints a session on the next replica in round-robin order
+and everything else keeps using the primary. A replica that fails to connect
+is skipped for ``PRICING_READ_REPLICA_RETRY_SECONDS`` and the request falls
+back to the next replica or the primary.
+
+Replicas lag behind the primary, so after a commit that wrote data reads stay
+on the primary for ``PRICING_READ_YOUR_WRITES_SECONDS``: a break-even fetch
+right after an import sees the imported rows. Writes are detected with session
+events (ORM flushes and DML passed to ``Session.execute``) and the window is
+per process. ``price_simulations`` is written every second by the history
+buffer and nothing reads it back immediately, so it does not count.
+
+Sessions on a replica carry ``on_replica(session)``; process-wide caches such
+as the break-even cache are only filled from the primary, so a lagging replica
+cannot pin stale totals past the commit that invalidated them.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from .metrics import PoolMetrics
+
+_WROTE_KEY = "replicas_wrote"
+REPLICA_KEY = "replica"
+# Tables whose writes need not be visible to the next read.
+LAG_TOLERANT_TABLES = frozenset({"price_simulations"})
+
+
+class ReplicaRouter:
+    """Round-robin over replica engines, skipping ones that recently failed.
+
+    Each replica has its own ``PoolMetrics``, labelled ``replica-1``,
+    ``replica-2``, ... in the order of ``PRICING_READ_DATABASE_URLS``.
+    """
+
+    def __init__(
+        self,
+        engines: Sequence[Engine],
+        retry_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+        pool_metrics: Optional[Sequence[PoolMetrics]] = None,
+    ) -> None:
+        self.engines = list(engines)
+        self._pool_metrics = (
+            list(pool_metrics) if pool_metrics is not None else [PoolMetrics() for _ in engines]
+        )
+        self._retry_seconds = retry_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._next = 0
+        self._down_until: Dict[int, float] = {}
+
+    def candidates(self) -> List[Engine]:
+        """Healthy replicas, starting with the next one in round-robin order."""
+        with self._lock:
+            now = self._clock()
+            healthy = [
+                engine
+                for engine in self.engines
+                if self._down_until.get(id(engine), 0) <= now
+            ]
+            if not healthy:
+                return []
+            start = self._next % len(healthy)
+            self._next += 1
+            return healthy[start:] + healthy[:start]
+
+    def mark_down(self, engine: Engine) -> None:
+        with self._lock:
+            self._down_until[id(engine)] = self._clock() + self._retry_seconds
+
+    def mark_up(self, engine: Engine) -> None:
+        with self._lock:
+            self._down_until.pop(id(engine), None)
+
+    def pool_metrics(self) -> Dict[str, PoolMetrics]:
+        return {
+            f"replica-{index}": metrics
+            for index, metrics in enumerate(self._pool_metrics, start=1)
+        }
+
+    def status(self) -> List[Dict[str, object]]:
+        now = self._clock()
+        with self._lock:
+            healthy = [self._down_until.get(id(engine), 0) <= now for engine in self.engines]
+        return [
+            {
+                "pool": pool,
+                "url": engine.url.render_as_string(hide_password=True),
+                "healthy": is_healthy,
+                **metrics.snapshot(),
+            }
+            for engine, is_healthy, (pool, metrics) in zip(
+                self.engines, healthy, self.pool_metrics().items()
+            )
+        ]
+
+    def dispose(self) -> None:
+        for engine in self.engines:
+            engine.dispose()
+
+
+def on_replica(session: Session) -> bool:
+    """Whether ``database.get_read_session`` bound ``session`` to a replica."""
+    return bool(session.info.get(REPLICA_KEY))
+
+
+class WriteTracker:
+    """When this process last committed a write that reads should see."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._last: Optional[float] = None
+
+    def record(self) -> None:
+        self._last = self._clock()
+
+    def within(self, seconds: float) -> bool:
+        last = self._last
+        return last is not None and self._clock() - last < seconds
+
+    def reset(self) -> None:
+        self._last = None
+
+
+recent_writes = WriteTracker()
+
+
+def _mark_flushed_writes(session: Session, flush_context) -> None:
+    if any(
+        getattr(obj, "__tablename__", None) not in LAG_TOLERANT_TABLES
+        for obj in (*session.new, *session.dirty, *session.deleted)
+    ):
+        session.info[_WROTE_KEY] = True
+
+
+def _mark_executed_writes(state: ORMExecuteState) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, "table", None)
+        if getattr(table, "name", None) not in LAG_TOLERANT_TABLES:
+            state.session.info[_WROTE_KEY] = True
+
+
+def _record_committed_writes(session: Session) -> None:
+    if session.info.pop(_WROTE_KEY, False):
+        recent_writes.record()
+
+
+def _discard_writes(session: Session) -> None:
+    session.info.pop(_WROTE_KEY, None)
+
+
+event.listen(Session, "after_flush", _mark_flushed_writes)
+event.listen(Session, "do_orm_execute", _mark_executed_writes)
+event.listen(Session, "after_commit", _record_committed_writes)
+event.listen(Session, "after_rollback", _discard_writes)
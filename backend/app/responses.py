@@ -0,0 +1,53 @@
+"""Fast JSON rendering for the large list responses.
+
+FastAPI normally re-validates a returned model against ``response_model`` and
+walks it with ``jsonable_encoder`` before ``json.dumps``; for a batch of 50k
+simulations or 10k import warnings that is most of the request. Endpoints opt
+in by declaring ``response_class=FastJSONResponse`` and returning
+``FastJSONResponse(model)``: the model (already validated when it was built) is
+turned into a dict once and rendered with ``orjson``. Without ``orjson`` the
+stdlib encoder is used with the same output.
+"""
+from __future__ import annotations
+
+import json
+from decimal import Decimal
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.dict()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _stdlib_default(value: Any) -> Any:
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return _default(value)
+
+
+def dumps(content: Any) -> bytes:
+    """Encode ``content`` (models, dicts, lists) as compact UTF-8 JSON."""
+    if isinstance(content, BaseModel):
+        content = content.dict()
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_stdlib_default, ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,98 @@
+"""Incremental maintenance of ``monthly_sales_rollup``.
+
+Inserted ``SalesData`` rows are folded into the rollup as deltas in the same
+transaction. Updates and deletes are rare (past months never change), so the
+affected months are simply recomputed from ``sales_data``.
+
+Backfill or repair the table with::
+
+    python -m app.rollup rebuild [--from YYYY-MM] [--to YYYY-MM]
+"""
+from __future__ import annotations
+
+import argparse
+from datetime import date
+from typing import Optional, Set
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from . import crud
+from .models import SalesData
+from .observability import span
+
+
+def _months_touched(obj: SalesData) -> Set[date]:
+    history = inspect(obj).attrs.sale_date.history
+    values = [obj.sale_date, *history.deleted] if history.deleted else [obj.sale_date]
+    return {crud.month_start(value) for value in values if value is not None}
+
+
+def _maintain_sales_rollup(session: Session, flush_context) -> None:
+    inserted = [obj for obj in session.new if isinstance(obj, SalesData)]
+    rebuild: Set[date] = set()
+    for obj in session.dirty:
+        if isinstance(obj, SalesData) and session.is_modified(obj):
+            rebuild |= _months_touched(obj)
+    for obj in session.deleted:
+        if isinstance(obj, SalesData):
+            sale_date = inspect(obj).dict.get("sale_date")
+            if sale_date is not None:
+                rebuild.add(crud.month_start(sale_date))
+
+    if not inserted and not rebuild:
+        return
+
+    # Use the flush connection directly: session.execute() could re-enter autoflush.
+    connection = session.connection()
+    with span("rollup.apply"):
+        crud.apply_sales_rollup(
+            connection,
+            crud.sales_rollup_deltas(
+                (
+                    obj.sale_date,
+                    obj.product_id,
+                    obj.quantity_kg,
+                    obj.unit_price_per_kg,
+                    obj.unit_cost_per_kg,
+                )
+                for obj in inserted
+                if crud.month_start(obj.sale_date) not in rebuild
+            ),
+        )
+    for month in sorted(rebuild):
+        with span("rollup.rebuild"):
+            crud.rebuild_sales_rollup(connection, month, crud.next_month(month))
+
+
+event.listen(Session, "after_flush", _maintain_sales_rollup)
+
+
+def _parse_month(value: Optional[str]) -> Optional[date]:
+    if value is None:
+        return None
+    year, month = value.split("-")
+    return date(int(year), int(month), 1)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.rollup")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    rebuild = subcommands.add_parser("rebuild", help="recompute monthly_sales_rollup")
+    rebuild.add_argument("--from", dest="start", help="first month (YYYY-MM), inclusive")
+    rebuild.add_argument("--to", dest="end", help="last month (YYYY-MM), inclusive")
+    args = parser.parse_args(argv)
+
+    from .database import session_scope
+
+    start = _parse_month(args.start)
+    end = _parse_month(args.end)
+    with session_scope() as session:
+        rows = crud.rebuild_sales_rollup(
+            session, start, crud.next_month(end) if end is not None else None
+        )
+    print(f"rebuilt {rows} monthly_sales_rollup rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+"""Bulk ingestion of POS sales exports (CSV or Parquet) into ``sales_data``.
+
+Files are streamed in ``PRICING_SALES_IMPORT_CHUNK_SIZE`` row batches (pyarrow
+record batches validated column-wise for Parquet, the stdlib ``csv`` reader for
+CSV), product codes are resolved through a map loaded once per import, and each
+batch is written with ``crud.insert_sales_rows`` (``COPY`` on PostgreSQL) plus
+one rollup delta upsert. The whole file is one transaction.
+
+Command line::
+
+    python -m app.sales_import path/to/sales.parquet [--format csv|parquet]
+"""
+from __future__ import annotations
+
+import argparse
+import codecs
+import csv
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from functools import partial
+from typing import IO, Any, Dict, Iterable, Iterator, List, Mapping, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from . import crud
+from .cache import invalidate_months
+from .observability import span
+from .schemas import ExcelImportWarning, SalesImportResponse
+
+SALES_COLUMNS = (
+    "sale_date",
+    "product_code",
+    "quantity_kg",
+    "unit_price_per_kg",
+    "unit_cost_per_kg",
+)
+AMOUNT_COLUMNS = ("quantity_kg", "unit_price_per_kg", "unit_cost_per_kg")
+SALES_FORMATS = ("csv", "parquet")
+
+
+class SalesFileError(ValueError):
+    """Raised when the upload cannot be read as a sales export."""
+
+
+def detect_format(filename: Optional[str], explicit: Optional[str] = None) -> str:
+    if explicit:
+        fmt = explicit.lower()
+    elif filename and "." in filename:
+        fmt = filename.rsplit(".", 1)[1].lower()
+    else:
+        fmt = "csv"
+    if fmt not in SALES_FORMATS:
+        raise SalesFileError(f"unsupported format: {fmt} (expected csv or parquet)")
+    return fmt
+
+
+def _iter_csv_batches(stream: IO[bytes], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    # utf-8-sig: POS tools commonly prepend a BOM to CSV exports.
+    reader = csv.DictReader(codecs.iterdecode(stream, "utf-8-sig"))
+    batch: List[Dict[str, Any]] = []
+    try:
+        if "sale_date" not in (reader.fieldnames or ()):
+            raise SalesFileError("missing column: sale_date")
+        for record in reader:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise SalesFileError("Failed to read CSV file") from exc
+    if batch:
+        yield batch
+
+
+def _iter_parquet_batches(stream: IO[bytes], batch_size: int) -> Iterator[Any]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as exc:  # pragma: no cover - optional dependency
+        raise SalesFileError("Parquet import requires pyarrow") from exc
+
+    try:
+        parquet = pq.ParquetFile(stream)
+    except Exception as exc:
+        raise SalesFileError("Failed to read Parquet file") from exc
+    available = set(parquet.schema_arrow.names)
+    if "sale_date" not in available:
+        raise SalesFileError("missing column: sale_date")
+    columns = [column for column in SALES_COLUMNS if column in available]
+    # Corrupt pages only surface once their row group is decoded.
+    try:
+        yield from parquet.iter_batches(batch_size=batch_size, columns=columns)
+    except Exception as exc:
+        raise SalesFileError("Failed to read Parquet file") from exc
+
+
+def iter_sales_batches(stream: IO[bytes], fmt: str, batch_size: int) -> Iterator[Any]:
+    """Yield ``batch_size`` records at a time.
+
+    CSV batches are lists of dicts (column name -> raw string); Parquet batches
+    are ``pyarrow.RecordBatch`` objects for ``ParquetBatchNormalizer``.
+    """
+    if fmt == "parquet":
+        return _iter_parquet_batches(stream, batch_size)
+    return _iter_csv_batches(stream, batch_size)
+
+
+def _parse_date(value: Any) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value).strip().replace("/", "-")[:10])
+    except ValueError:
+        return None
+
+
+def _parse_amount(value: Any) -> Any:
+    """Return ``None`` for blanks, a number for numerics and ``False`` when invalid."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        return value
+    try:
+        number = Decimal(str(value).strip().replace(",", ""))
+    except InvalidOperation:
+        return False
+    return number if number.is_finite() else False
+
+
+@dataclass
+class SalesImportSummary:
+    max_warnings: int
+    imported: int = 0
+    skipped: int = 0
+    rows_processed: int = 0
+    warnings_total: int = 0
+    warnings: List[ExcelImportWarning] = field(default_factory=list)
+    months: Set[date] = field(default_factory=set)
+    elapsed_seconds: float = 0.0
+
+    def warn(self, row: int, field_name: str, reason: str) -> None:
+        self.skipped += 1
+        self.warnings_total += 1
+        if len(self.warnings) < self.max_warnings:
+            self.warnings.append(ExcelImportWarning(row=row, field=field_name, reason=reason))
+
+    def to_response(self) -> SalesImportResponse:
+        elapsed = self.elapsed_seconds
+        return SalesImportResponse(
+            imported=self.imported,
+            skipped=self.skipped,
+            rows_processed=self.rows_processed,
+            warnings_total=self.warnings_total,
+            warnings=self.warnings,
+            months=[f"{month:%Y-%m}" for month in sorted(self.months)],
+            elapsed_ms=round(elapsed * 1000, 3),
+            rows_per_second=round(self.rows_processed / elapsed, 1) if elapsed > 0 else 0.0,
+        )
+
+
+def normalize_sales_batch(
+    records: Iterable[Mapping[str, Any]],
+    first_row: int,
+    product_ids: Mapping[str, str],
+    summary: SalesImportSummary,
+) -> List[Dict[str, Any]]:
+    """Validate raw records into ``sales_data`` rows, recording warnings on ``summary``."""
+    rows: List[Dict[str, Any]] = []
+    for row_index, record in enumerate(records, start=first_row):
+        summary.rows_processed += 1
+        sale_date = _parse_date(record.get("sale_date"))
+        if sale_date is None:
+            summary.warn(row_index, "sale_date", "missing or invalid date")
+            continue
+
+        product_id = None
+        product_code = record.get("product_code")
+        if product_code not in (None, ""):
+            product_id = product_ids.get(str(product_code).strip())
+            if product_id is None:
+                summary.warn(row_index, "product_code", "unknown product_code")
+                continue
+
+        amounts = {}
+        for column in AMOUNT_COLUMNS:
+            amounts[column] = _parse_amount(record.get(column))
+            if amounts[column] is False:
+                summary.warn(row_index, column, "non-numeric")
+                break
+        else:
+            rows.append({"product_id": product_id, "sale_date": sale_date, **amounts})
+    return rows
+
+
+# Plain decimal notation as accepted by ``_parse_amount`` once separators are removed.
+_NUMBER_PATTERN = r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$"
+
+
+class ParquetBatchNormalizer:
+    """Columnar counterpart of ``normalize_sales_batch`` for pyarrow record batches.
+
+    Each column is validated with ``pyarrow.compute`` into a null/invalid mask;
+    only the rows that fail are visited in Python to record their warning, and
+    surviving rows are materialised column by column. Warnings follow the same
+    precedence as the CSV path (date, product code, then the first bad amount).
+    """
+
+    def __init__(self, product_ids: Mapping[str, str]) -> None:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        self._pa = pa
+        self._pc = pc
+        # Built once per import; ``index_in`` then resolves a whole batch at a time.
+        self._codes = pa.array(list(product_ids.keys()), type=pa.string())
+        self._ids = pa.array(list(product_ids.values()), type=pa.string())
+
+    def __call__(
+        self, batch: Any, first_row: int, summary: SalesImportSummary
+    ) -> List[Dict[str, Any]]:
+        pa, pc = self._pa, self._pc
+        summary.rows_processed += batch.num_rows
+
+        sale_dates = self._dates(self._column(batch, "sale_date"))
+        checks = [("sale_date", "missing or invalid date", pc.is_null(sale_dates))]
+
+        product_ids, unknown = self._product_ids(self._column(batch, "product_code"))
+        checks.append(("product_code", "unknown product_code", unknown))
+
+        amounts = {}
+        for column in AMOUNT_COLUMNS:
+            amounts[column], invalid = self._amounts(self._column(batch, column))
+            checks.append((column, "non-numeric", invalid))
+
+        # Fold the masks into the index of the first failing check per row;
+        # later checks are applied first so earlier ones take precedence.
+        failed = pa.nulls(batch.num_rows, pa.int8())
+        for index in reversed(range(len(checks))):
+            failed = pc.if_else(checks[index][2], pa.scalar(index, pa.int8()), failed)
+        rejected = pc.is_valid(failed)
+        positions = pc.indices_nonzero(rejected)
+        for position, index in zip(positions.to_pylist(), pc.take(failed, positions).to_pylist()):
+            field_name, reason, _ = checks[index]
+            summary.warn(first_row + position, field_name, reason)
+
+        keep = pc.invert(rejected)
+        columns = {"product_id": product_ids, "sale_date": sale_dates, **amounts}
+        values = [pc.filter(array, keep).to_pylist() for array in columns.values()]
+        return [dict(zip(columns, row)) for row in zip(*values)]
+
+    def _column(self, batch: Any, name: str) -> Any:
+        index = batch.schema.get_field_index(name)
+        if index < 0:
+            return self._pa.nulls(batch.num_rows)
+        return batch.column(index)
+
+    def _dates(self, array: Any) -> Any:
+        """``date32`` column; null where the value is missing or unparseable."""
+        pa, pc = self._pa, self._pc
+        if pa.types.is_date(array.type) or pa.types.is_timestamp(array.type):
+            return pc.cast(array, pa.date32())
+        if not pa.types.is_string(array.type) and not pa.types.is_large_string(array.type):
+            return pa.nulls(len(array), pa.date32())
+        text = pc.replace_substring(pc.utf8_trim_whitespace(array), "/", "-")
+        text = pc.utf8_slice_codeunits(text, 0, 10)
+        parsed = pc.strptime(text, format="%Y-%m-%d", unit="s", error_is_null=True)
+        return pc.cast(parsed, pa.date32())
+
+    def _product_ids(self, array: Any) -> Any:
+        """Resolved ids (null for blank codes) and the mask of unknown codes."""
+        pa, pc = self._pa, self._pc
+        codes = pc.cast(array, pa.string())
+        blank = pc.fill_null(pc.equal(codes, ""), True)
+        positions = pc.index_in(pc.utf8_trim_whitespace(codes), value_set=self._codes)
+        unknown = pc.and_(pc.invert(blank), pc.is_null(positions))
+        return pc.take(self._ids, positions), unknown
+
+    def _amounts(self, array: Any) -> Any:
+        """Numeric values (null for blanks) and the mask of non-numeric entries."""
+        pa, pc = self._pa, self._pc
+        if pa.types.is_floating(array.type):
+            return array, pc.fill_null(pc.invert(pc.is_finite(array)), False)
+        if (
+            pa.types.is_integer(array.type)
+            or pa.types.is_decimal(array.type)
+            or pa.types.is_null(array.type)
+        ):
+            return array, pa.repeat(False, len(array))
+        text = pc.replace_substring(pc.utf8_trim_whitespace(pc.cast(array, pa.string())), ",", "")
+        present = pc.fill_null(pc.not_equal(text, ""), False)
+        numeric = pc.fill_null(pc.match_substring_regex(text, _NUMBER_PATTERN), False)
+        invalid = pc.and_(present, pc.invert(numeric))
+        values = pc.if_else(numeric, text, pa.scalar(None, pa.string()))
+        return pc.cast(values, pa.float64()), invalid
+
+
+def import_sales(
+    session: Session,
+    stream: IO[bytes],
+    fmt: str,
+    chunk_size: int,
+    max_warnings: int,
+) -> SalesImportSummary:
+    """Stream ``stream`` into ``sales_data`` and the monthly rollup, then commit."""
+    started = time.perf_counter()
+    summary = SalesImportSummary(max_warnings=max_warnings)
+    product_ids = crud.get_product_id_map(session)
+    # CSV data starts below the header row; Parquet rows are numbered from 1.
+    next_row = 2 if fmt == "csv" else 1
+
+    if fmt == "parquet":
+        normalize = ParquetBatchNormalizer(product_ids)
+    else:
+        normalize = partial(normalize_sales_batch, product_ids=product_ids)
+
+    batches = iter_sales_batches(stream, fmt, chunk_size)
+    while True:
+        with span("sales_import.parse"):
+            records = next(batches, None)
+            if records is None:
+                break
+            rows = normalize(records, next_row, summary=summary)
+        next_row += len(records)
+
+        with span("sales_import.write"):
+            crud.insert_sales_rows(session, rows)
+        with span("rollup.apply"):
+            crud.apply_sales_rollup(
+                session,
+                crud.sales_rollup_deltas(
+                    (
+                        row["sale_date"],
+                        row["product_id"],
+                        row["quantity_kg"],
+                        row["unit_price_per_kg"],
+                        row["unit_cost_per_kg"],
+                    )
+                    for row in rows
+                ),
+            )
+        summary.imported += len(rows)
+        summary.months.update(crud.month_start(row["sale_date"]) for row in rows)
+
+    session.commit()
+    # Bulk rows bypass the ORM, so the cache hooks never saw these months.
+    invalidate_months(summary.months)
+    summary.elapsed_seconds = time.perf_counter() - started
+    return summary
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.sales_import")
+    parser.add_argument("path", help="CSV or Parquet sales export")
+    parser.add_argument("--format", choices=SALES_FORMATS, help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, help="rows per batch")
+    args = parser.parse_args(argv)
+
+    from .config import get_settings
+    from .database import get_sessionmaker
+
+    settings = get_settings()
+    fmt = detect_format(args.path, args.format)
+    session = get_sessionmaker()()
+    try:
+        with open(args.path, "rb") as stream:
+            summary = import_sales(
+                session,
+                stream,
+                fmt,
+                args.chunk_size or settings.sales_import_chunk_size,
+                settings.sales_import_max_warnings,
+            )
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+    response = summary.to_response()
+    print(
+        f"imported {response.imported} rows, skipped {response.skipped} "
+        f"({response.rows_per_second} rows/s, months: {', '.join(response.months) or '-'})"
+    )
+    for warning in response.warnings:
+        print(f"  row {warning.row}: {warning.field}: {warning.reason}")
+
+
+if __name__ == "__main__":
+    main()
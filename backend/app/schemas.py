@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-from datetime import date
-from typing import List, Optional
+from datetime import date, datetime
+from typing import Any, List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, confloat
 
 
 class PricePattern(BaseModel):
@@ -12,11 +12,83 @@ class PricePattern(BaseModel):
     profit_per_kg: int
 
 
+class MarginLadderRequest(BaseModel):
+    # Empty resets the category to the default ladder.
+    margin_rates: List[confloat(gt=0, lt=0.9)] = Field(default_factory=list)
+
+
+class MarginLadderResponse(BaseModel):
+    category: str
+    margin_rates: List[float]
+    products_refreshed: Optional[int] = None
+
+
+class MarginLadderListResponse(BaseModel):
+    default: List[float]
+    ladders: List[MarginLadderResponse]
+
+
+class ProductPricePatterns(BaseModel):
+    product_code: str
+    product_name: str
+    category: Optional[str]
+    unit_cost_per_kg: Optional[float]
+    price_patterns: List[PricePattern]
+
+
+class ProductPricePatternsResponse(BaseModel):
+    products: List[ProductPricePatterns]
+
+
+class OptimalPrice(BaseModel):
+    product_code: str
+    product_name: str
+    category: Optional[str]
+    unit_cost_per_kg: Optional[float]
+    unit_price_per_kg: Optional[float]
+    # Demand elasticity d ln(quantity) / d ln(price); "category" means the pooled fit.
+    elasticity: Optional[float]
+    elasticity_source: Optional[str]
+    observations: int
+    optimal_price_per_kg: Optional[int]
+    gross_margin_rate: Optional[float]
+    expected_quantity_kg: Optional[float]
+    expected_gross_profit: Optional[int]
+    # "none", "max_change" (clamped to the allowed price change) or "min_margin".
+    constraint: Optional[str]
+
+
+class OptimalPriceResponse(BaseModel):
+    items: List[OptimalPrice]
+
+
+class ProductListItem(BaseModel):
+    product_code: str
+    product_name: str
+    category: Optional[str]
+    unit_cost_per_kg: Optional[float]
+    unit_price_per_kg: Optional[float]
+    target_margin_rate: Optional[float]
+    min_margin_rate: Optional[float]
+    unit: str
+    updated_at: Optional[datetime]
+    price_patterns: Optional[List[PricePattern]] = None
+
+
+class ProductListResponse(BaseModel):
+    items: List[ProductListItem]
+    next_cursor: Optional[str]
+    limit: int
+
+
 class PriceSimulationRequest(BaseModel):
     product_name: str
     unit_cost_per_kg: float = Field(gt=0)
     target_margin_rate: float = Field(gt=0, lt=0.9)
     quantity_kg: Optional[float] = Field(default=None, ge=0)
+    # The guard uses min_margin_rate, or the catalog product's when only the code is given.
+    product_code: Optional[str] = None
+    min_margin_rate: Optional[float] = Field(default=None, ge=0, lt=0.9)
 
 
 class PriceSimulationResponse(BaseModel):
@@ -28,6 +100,52 @@ class PriceSimulationResponse(BaseModel):
     guard: dict
 
 
+class PriceSimulationHistoryItem(BaseModel):
+    id: str
+    simulation_at: datetime
+    product_code: Optional[str]
+    product_name: Optional[str]
+    input_cost_per_kg: float
+    target_margin_rate: float
+    calculated_price_per_kg: float
+    selected_price_per_kg: Optional[float]
+    quantity_kg: Optional[float]
+    gross_profit_total: Optional[float]
+    min_margin_rate: Optional[float]
+
+
+class PriceSimulationHistoryResponse(BaseModel):
+    items: List[PriceSimulationHistoryItem]
+    next_cursor: Optional[str]
+    limit: int
+
+
+class PriceSimulationBatchRequest(BaseModel):
+    # Items are validated one by one so a bad row does not reject the batch.
+    items: Optional[List[Any]] = None
+    product_codes: Optional[List[str]] = None
+    target_margin_rate: Optional[float] = None
+    quantity_kg: Optional[float] = None
+
+
+class PriceSimulationBatchError(BaseModel):
+    code: str
+    message: str
+
+
+class PriceSimulationBatchResult(BaseModel):
+    index: int
+    product_code: Optional[str] = None
+    result: Optional[PriceSimulationResponse] = None
+    error: Optional[PriceSimulationBatchError] = None
+
+
+class PriceSimulationBatchResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[PriceSimulationBatchResult]
+
+
 class BreakEvenResponse(BaseModel):
     year_month: str
     fixed_costs: int
@@ -40,13 +158,151 @@ class BreakEvenResponse(BaseModel):
     status: str
 
 
+class BreakEvenSeriesResponse(BaseModel):
+    from_month: str
+    to_month: str
+    months: List[BreakEvenResponse]
+
+
+class BreakEvenSensitivityRequest(BaseModel):
+    year_month: str
+    # Relative changes, e.g. [-0.1, -0.05, 0, 0.05, 0.1] for ±10% in 5% steps.
+    fixed_cost_changes: List[confloat(gt=-1, le=10)] = Field(default_factory=lambda: [0.0])
+    unit_cost_changes: List[confloat(gt=-1, le=10)] = Field(default_factory=lambda: [0.0])
+    price_changes: List[confloat(gt=-1, le=10)] = Field(default_factory=lambda: [0.0])
+    # Price and unit-cost changes apply to these categories only (all sales when omitted).
+    categories: Optional[List[str]] = None
+
+
+class BreakEvenSensitivityResponse(BaseModel):
+    year_month: str
+    categories: Optional[List[str]]
+    fixed_cost_changes: List[float]
+    unit_cost_changes: List[float]
+    price_changes: List[float]
+    # Grid columns below are flattened in (fixed_cost, unit_cost, price) order:
+    # index = (i * len(unit_cost_changes) + j) * len(price_changes) + k.
+    shape: List[int]
+    points: int
+    base: BreakEvenResponse
+    fixed_costs: List[int]
+    current_revenue: List[int]
+    variable_cost_rate: List[float]
+    gross_margin_rate: List[float]
+    break_even_revenue: List[int]
+    achievement_rate: List[float]
+    delta_revenue: List[int]
+    status: List[str]
+
+
+class BreakEvenProductBreakdown(BaseModel):
+    product_id: Optional[str]
+    product_code: Optional[str]
+    product_name: Optional[str]
+    category: Optional[str]
+    revenue: int
+    variable_cost: int
+    gross_profit: int
+    quantity_kg: float
+    gross_margin_rate: float
+    revenue_share: float
+
+
+class BreakEvenBreakdownResponse(BaseModel):
+    year_month: str
+    products: List[BreakEvenProductBreakdown]
+
+
+class GuardViolation(BaseModel):
+    product_id: str
+    product_code: str
+    product_name: str
+    category: Optional[str]
+    min_margin_rate: Optional[float]
+    target_margin_rate: Optional[float]
+    unit_price_per_kg: Optional[float]
+    list_margin_rate: Optional[float]
+    list_price_violation: bool
+    sale_lines: int
+    violating_lines: int
+    violating_quantity_kg: float
+    lost_gross_profit: int
+    first_violation_date: Optional[date]
+    last_violation_date: Optional[date]
+    worst_margin_rate: Optional[float]
+
+
+class GuardReportResponse(BaseModel):
+    from_month: str
+    to_month: str
+    level: str
+    total: int
+    offset: int
+    limit: int
+    violations: List[GuardViolation]
+
+
 class ExcelImportWarning(BaseModel):
     row: int
     field: str
     reason: str
+    # Worksheet (``member.xlsx:Sheet`` inside a ZIP upload) the row came from.
+    sheet: Optional[str] = None
+
+
+class ExcelImportChunk(BaseModel):
+    index: int
+    sheet: Optional[str] = None
+    rows: int
+    inserted: int
+    updated: int
+    unchanged: int = 0
+    parse_ms: float
+    write_ms: float
 
 
 class ExcelImportResponse(BaseModel):
     imported: int
     skipped: int
+    inserted: int = 0
+    updated: int = 0
+    # Rows whose content hash matched the stored product (not written).
+    unchanged: int = 0
+    # Imported rows not written because a later row (or sheet / file) has the
+    # same product_code.
+    superseded: int = 0
+    # True when the same workbook was already applied and nothing changed since.
+    duplicate: bool = False
     warnings: List[ExcelImportWarning]
+    chunks: List[ExcelImportChunk] = Field(default_factory=list)
+
+
+class SalesImportResponse(BaseModel):
+    imported: int
+    skipped: int
+    rows_processed: int
+    # warnings holds at most PRICING_SALES_IMPORT_MAX_WARNINGS entries.
+    warnings_total: int
+    warnings: List[ExcelImportWarning]
+    months: List[str]
+    elapsed_ms: float
+    rows_per_second: float
+
+
+class ImportJobStatus(BaseModel):
+    job_id: str
+    status: str
+    filename: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    rows_processed: int = 0
+    rows_per_second: float = 0.0
+    imported: int = 0
+    skipped: int = 0
+    warnings_total: int = 0
+    warnings_offset: int = 0
+    warnings: List[ExcelImportWarning] = Field(default_factory=list)
+    error: Optional[str] = None
+    # Final result once the job succeeds; its warnings hold the requested page.
+    result: Optional[ExcelImportResponse] = None
@@ -0,0 +1,97 @@
+"""What-if grids for the monthly break-even point.
+
+``/api/break-even/sensitivity`` loads the month's fixed costs and per-category
+revenue / variable cost once, then evaluates every combination of fixed-cost,
+unit-cost and selling-price changes with NumPy broadcasting. Price and unit-cost
+changes apply to the selected categories only (all sales by default) at
+unchanged volumes, so the result reflects the month's product mix.
+
+The arithmetic mirrors ``main._build_break_even``; outputs are rounded half-up
+(四捨五入) like ``round_jpy`` / ``round_rate`` after snapping away float noise,
+so the all-zero scenario equals ``GET /api/break-even/current``.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .money import SNAP_DECIMALS, half_up_array
+
+
+@dataclass(frozen=True)
+class MixTotals:
+    """Month aggregates split into the part the scenario changes and the rest."""
+
+    fixed_cost_total: Decimal
+    revenue: Decimal
+    variable_cost: Decimal
+    other_revenue: Decimal
+    other_variable_cost: Decimal
+
+
+def split_mix(
+    fixed_cost_total: Decimal,
+    category_totals: Sequence[Tuple[Optional[str], Decimal, Decimal]],
+    categories: Optional[Sequence[str]] = None,
+) -> MixTotals:
+    """Sum ``crud.get_rollup_category_totals`` rows into affected and other sales."""
+    selected = set(categories) if categories is not None else None
+    affected = [Decimal("0"), Decimal("0")]
+    other = [Decimal("0"), Decimal("0")]
+    for category, revenue, variable_cost in category_totals:
+        target = affected if selected is None or category in selected else other
+        target[0] += revenue
+        target[1] += variable_cost
+    return MixTotals(fixed_cost_total, affected[0], affected[1], other[0], other[1])
+
+
+def evaluate_grid(
+    totals: MixTotals,
+    fixed_cost_changes: Sequence[float],
+    unit_cost_changes: Sequence[float],
+    price_changes: Sequence[float],
+) -> Dict[str, List[Any]]:
+    """Break-even columns over the grid, flattened in (fixed, unit cost, price) order."""
+    import numpy as np
+
+    fixed = float(totals.fixed_cost_total) * (1 + np.asarray(fixed_cost_changes, float))
+    revenue = float(totals.other_revenue) + float(totals.revenue) * (
+        1 + np.asarray(price_changes, float)
+    )
+    variable_cost = float(totals.other_variable_cost) + float(totals.variable_cost) * (
+        1 + np.asarray(unit_cost_changes, float)
+    )
+    shape = (len(fixed), len(variable_cost), len(revenue))
+    fixed = np.broadcast_to(fixed[:, None, None], shape)
+    variable_cost = np.broadcast_to(variable_cost[None, :, None], shape)
+    revenue = np.broadcast_to(revenue[None, None, :], shape)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        has_revenue = revenue > 0
+        variable_cost_rate = np.where(has_revenue, variable_cost / revenue, 0.0)
+        margin = 1.0 - variable_cost_rate
+        has_margin = margin > 0
+        break_even = np.where(has_margin, fixed / margin, 0.0)
+        achievement = np.where(has_margin & (break_even > 0), revenue / break_even, 0.0)
+        delta = np.where(has_margin, revenue - break_even, -fixed)
+
+    # Compare thresholds on snapped values so an exact 100% is not read as 99.99...%.
+    snapped = np.round(achievement, SNAP_DECIMALS + 4)
+    status = np.where(snapped >= 1, "safe", np.where(snapped >= 0.8, "warning", "danger"))
+    return {
+        "fixed_costs": half_up_array(np, fixed, 0).astype(np.int64).ravel().tolist(),
+        "current_revenue": half_up_array(np, revenue, 0).astype(np.int64).ravel().tolist(),
+        "variable_cost_rate": np.where(
+            has_revenue, half_up_array(np, variable_cost_rate, 4), 0.0
+        ).ravel().tolist(),
+        "gross_margin_rate": np.where(has_margin, half_up_array(np, margin, 4), 0.0)
+        .ravel()
+        .tolist(),
+        "break_even_revenue": half_up_array(np, break_even, 0).astype(np.int64).ravel().tolist(),
+        "achievement_rate": np.where(achievement > 0, half_up_array(np, achievement, 4), 0.0)
+        .ravel()
+        .tolist(),
+        "delta_revenue": half_up_array(np, delta, 0).astype(np.int64).ravel().tolist(),
+        "status": status.ravel().tolist(),
+    }
@@ -1,11 +1,48 @@
 from __future__ import annotations
 
+import hashlib
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Iterable, Tuple
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
 
+from .money import QUANTITY_SCALE, RATE_SCALE, YEN_SCALE, div_half_up, to_scaled
 
-def _ensure_decimal(value: float | int | Decimal) -> Decimal:
-    """Convert incoming numeric values to ``Decimal`` preserving precision."""
+_ONE = Decimal("1")
+_ZERO = Decimal("0")
+
+PRICE_PATTERN_MARGIN_RATES = (
+    Decimal("0.10"),
+    Decimal("0.15"),
+    Decimal("0.20"),
+    Decimal("0.25"),
+    Decimal("0.30"),
+)
+# ``1 - margin`` divisors are computed once and shared by every simulation.
+_PRICE_PATTERN_DIVISORS = tuple(
+    (margin_rate, _ONE - margin_rate) for margin_rate in PRICE_PATTERN_MARGIN_RATES
+)
+_PRICE_PATTERN_SCALED = tuple(
+    (margin_rate, to_scaled(margin_rate, RATE_SCALE)) for margin_rate in PRICE_PATTERN_MARGIN_RATES
+)
+
+
+# Normalized product fields covered by ``products.content_hash``.
+PRODUCT_HASH_FIELDS = (
+    "product_name",
+    "category",
+    "unit_cost_per_kg",
+    "unit_price_per_kg",
+    "target_margin_rate",
+    "min_margin_rate",
+    "unit",
+)
+
+
+class PricingInputError(ValueError):
+    """Raised when simulation inputs are outside the accepted range."""
+
+
+def ensure_decimal(value: object) -> Decimal:
+    """Convert request inputs and DB results to ``Decimal`` preserving precision."""
     if isinstance(value, Decimal):
         return value
     return Decimal(str(value))
@@ -13,26 +50,278 @@ def _ensure_decimal(value: float | int | Decimal) -> Decimal:
 
 def round_jpy(value: float | Decimal) -> int:
     """Round to the nearest yen using 四捨五入 (ROUND_HALF_UP)."""
-    decimal_value = _ensure_decimal(value)
+    if type(value) is float:
+        scaled = to_scaled(value, YEN_SCALE)
+        if scaled is not None:
+            return div_half_up(scaled, YEN_SCALE)
+    decimal_value = ensure_decimal(value)
     return int(decimal_value.quantize(Decimal("1"), rounding=ROUND_HALF_UP))
 
 
 def round_rate(value: float | Decimal) -> Decimal:
     """Round rates to four decimal places (0.0001) using 四捨五入."""
-    decimal_value = _ensure_decimal(value)
+    decimal_value = ensure_decimal(value)
     return decimal_value.quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP)
 
 
-def generate_price_patterns(unit_cost_per_kg: float | Decimal) -> Iterable[Tuple[Decimal, int, int]]:
-    """Yield predefined price patterns calculated with ``Decimal`` precision."""
-    cost = _ensure_decimal(unit_cost_per_kg)
-    for margin_rate in (
-        Decimal("0.10"),
-        Decimal("0.15"),
-        Decimal("0.20"),
-        Decimal("0.25"),
-        Decimal("0.30"),
-    ):
-        price = cost / (Decimal("1") - margin_rate)
+def _canonical(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (int, float, Decimal)):
+        # 630, 630.0 and Decimal("630.000") (a Numeric(14, 3) round trip) hash alike.
+        return format(ensure_decimal(value).normalize(), "f")
+    return str(value)
+
+
+def product_content_hash(values: Mapping[str, Any]) -> str:
+    """SHA-256 over the normalized fields a product import can change."""
+    payload = "\x1f".join(_canonical(values.get(field)) for field in PRODUCT_HASH_FIELDS)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def below_margin(price: Any, cost: Any, margin_rate: Any) -> Any:
+    """True when ``price`` leaves less than ``margin_rate`` gross margin over ``cost``.
+
+    Written as ``price * (1 - margin) < cost`` (no division) so the same rule can be
+    applied to ``Decimal`` values and to SQLAlchemy column expressions in ``guard``.
+    """
+    return price * (1 - margin_rate) < cost
+
+
+def margin_floor_price(cost: Any, margin_rate: Any) -> Any:
+    """Lowest price that still earns ``margin_rate``: ``cost / (1 - margin)``."""
+    return cost / (1 - margin_rate)
+
+
+def price_guard(
+    unit_cost_per_kg: Decimal,
+    price_per_kg: Decimal,
+    min_margin_rate: Optional[float | Decimal],
+) -> Dict[str, Any]:
+    """Check one price against the product's minimum margin.
+
+    Without a ``min_margin_rate`` the price itself is the floor, so nothing is flagged.
+    """
+    if min_margin_rate is None:
+        return {
+            "min_allowed_price_per_kg": round_jpy(price_per_kg),
+            "min_margin_rate": None,
+            "is_below_min": False,
+            "warning_message": None,
+        }
+    min_rate = ensure_decimal(min_margin_rate)
+    is_below_min = bool(below_margin(price_per_kg, unit_cost_per_kg, min_rate))
+    return {
+        "min_allowed_price_per_kg": round_jpy(margin_floor_price(unit_cost_per_kg, min_rate)),
+        "min_margin_rate": float(round_rate(min_rate)),
+        "is_below_min": is_below_min,
+        "warning_message": "最低粗利率を下回る価格です" if is_below_min else None,
+    }
+
+
+def _scaled_rates(
+    margin_rates: Optional[Sequence[Any]],
+) -> Optional[Sequence[Tuple[Any, int]]]:
+    """``(rate, scaled rate)`` pairs, or ``None`` unless every rate is exact and below 1."""
+    if margin_rates is None:
+        return _PRICE_PATTERN_SCALED
+    scaled = [(margin_rate, to_scaled(margin_rate, RATE_SCALE)) for margin_rate in margin_rates]
+    if any(rate is None or rate >= RATE_SCALE for _, rate in scaled):
+        return None
+    return scaled
+
+
+def _fixed_price_patterns(
+    cost: int, rates: Sequence[Tuple[Any, int]]
+) -> List[Tuple[Any, int, int]]:
+    # cost / (1 - rate) in yen is cost·10 / (RATE_SCALE - rate) for cost in yen × 1000.
+    return [
+        (
+            margin_rate,
+            div_half_up(cost * 10, RATE_SCALE - rate),
+            div_half_up(cost * rate, YEN_SCALE * (RATE_SCALE - rate)),
+        )
+        for margin_rate, rate in rates
+    ]
+
+
+def generate_price_patterns(
+    unit_cost_per_kg: float | Decimal,
+    margin_rates: Optional[Sequence[Decimal]] = None,
+) -> Iterable[Tuple[Decimal, int, int]]:
+    """``(margin_rate, price, profit)`` per margin rate, rounded like ``round_jpy``.
+
+    ``margin_rates`` defaults to ``PRICE_PATTERN_MARGIN_RATES``; category ladders
+    are passed in by ``price_patterns``. Inputs that fit ``Numeric(14, 3)`` /
+    ``Numeric(6, 4)`` are computed exactly in scaled integers (``money``).
+    """
+    cost = to_scaled(unit_cost_per_kg, YEN_SCALE)
+    rates = _scaled_rates(margin_rates) if cost is not None else None
+    if rates is not None:
+        return _fixed_price_patterns(cost, rates)
+    return _decimal_price_patterns(unit_cost_per_kg, margin_rates)
+
+
+def _decimal_price_patterns(
+    unit_cost_per_kg: float | Decimal, margin_rates: Optional[Sequence[Decimal]]
+) -> Iterable[Tuple[Decimal, int, int]]:
+    cost = ensure_decimal(unit_cost_per_kg)
+    divisors = (
+        _PRICE_PATTERN_DIVISORS
+        if margin_rates is None
+        else [(margin_rate, _ONE - margin_rate) for margin_rate in margin_rates]
+    )
+    for margin_rate, divisor in divisors:
+        price = cost / divisor
         profit = price - cost
         yield margin_rate, round_jpy(price), round_jpy(profit)
+
+
+def _validate_simulation(
+    unit_cost: Any, margin_rate: Any, quantity: Any, min_margin_rate: Any, one: Any
+) -> None:
+    if unit_cost <= 0:
+        raise PricingInputError("unit_cost_per_kg must be greater than 0")
+    if margin_rate < 0 or margin_rate >= one:
+        raise PricingInputError("target_margin_rate must be between 0.0 and 0.9")
+    if quantity is not None and quantity < 0:
+        raise PricingInputError("quantity_kg must be greater than or equal to 0")
+    if min_margin_rate is not None and not 0 <= min_margin_rate < one:
+        raise PricingInputError("min_margin_rate must be between 0.0 and 0.9")
+
+
+def _simulate_price_fixed(
+    unit_cost_per_kg: Any,
+    target_margin_rate: Any,
+    quantity_kg: Any,
+    margin_rates: Optional[Sequence[Decimal]],
+    min_margin_rate: Any,
+) -> Optional[Dict[str, Any]]:
+    """``simulate_price`` in scaled integers; ``None`` when an input is not exact."""
+    cost = to_scaled(unit_cost_per_kg, YEN_SCALE)
+    rate = to_scaled(target_margin_rate, RATE_SCALE)
+    quantity = to_scaled(quantity_kg, QUANTITY_SCALE) if quantity_kg is not None else None
+    min_rate = to_scaled(min_margin_rate, RATE_SCALE) if min_margin_rate is not None else None
+    if (
+        cost is None
+        or rate is None
+        or (quantity is None and quantity_kg is not None)
+        or (min_rate is None and min_margin_rate is not None)
+    ):
+        return None
+    rates = _scaled_rates(margin_rates)
+    if rates is None:
+        return None
+    _validate_simulation(cost, rate, quantity, min_rate, RATE_SCALE)
+
+    # Exact values: price = cost·10 / divisor yen, profit = cost·rate / (1000·divisor) yen.
+    divisor = RATE_SCALE - rate
+    recommended_price = div_half_up(cost * 10, divisor)
+    gross_profit_total: Optional[int] = None
+    if quantity is not None:
+        gross_profit_total = div_half_up(
+            cost * rate * quantity, YEN_SCALE * QUANTITY_SCALE * divisor
+        )
+
+    if min_rate is None:
+        guard: Dict[str, Any] = {
+            "min_allowed_price_per_kg": recommended_price,
+            "min_margin_rate": None,
+            "is_below_min": False,
+            "warning_message": None,
+        }
+    else:
+        # price·(1 - min) < cost  ⇔  (1 - min) < (1 - rate)  ⇔  rate < min, as cost > 0.
+        is_below_min = rate < min_rate
+        guard = {
+            "min_allowed_price_per_kg": div_half_up(cost * 10, RATE_SCALE - min_rate),
+            "min_margin_rate": min_rate / RATE_SCALE,
+            "is_below_min": is_below_min,
+            "warning_message": "最低粗利率を下回る価格です" if is_below_min else None,
+        }
+
+    return {
+        "recommended_price_per_kg": recommended_price,
+        "gross_profit_per_kg": div_half_up(cost * rate, YEN_SCALE * divisor),
+        "gross_profit_total": gross_profit_total,
+        "margin_rate": rate / RATE_SCALE,
+        "price_patterns": [
+            {
+                "margin_rate": pattern_rate / RATE_SCALE,
+                "price_per_kg": price_per_kg,
+                "profit_per_kg": profit_per_kg,
+            }
+            for (_, pattern_rate), (_, price_per_kg, profit_per_kg) in zip(
+                rates, _fixed_price_patterns(cost, rates)
+            )
+        ],
+        "guard": guard,
+    }
+
+
+def simulate_price(
+    unit_cost_per_kg: float | Decimal,
+    target_margin_rate: float | Decimal,
+    quantity_kg: Optional[float | Decimal] = None,
+    margin_rates: Optional[Sequence[Decimal]] = None,
+    min_margin_rate: Optional[float | Decimal] = None,
+) -> Dict[str, Any]:
+    """Compute the cost-plus price simulation shared by single and batch endpoints.
+
+    Inputs with at most 3 (amounts) / 4 (rates) decimals take the exact integer
+    path; anything finer falls back to ``Decimal`` with identical rounding.
+    """
+    result = _simulate_price_fixed(
+        unit_cost_per_kg, target_margin_rate, quantity_kg, margin_rates, min_margin_rate
+    )
+    if result is not None:
+        return result
+    return _simulate_price_decimal(
+        unit_cost_per_kg, target_margin_rate, quantity_kg, margin_rates, min_margin_rate
+    )
+
+
+def _simulate_price_decimal(
+    unit_cost_per_kg: float | Decimal,
+    target_margin_rate: float | Decimal,
+    quantity_kg: Optional[float | Decimal],
+    margin_rates: Optional[Sequence[Decimal]],
+    min_margin_rate: Optional[float | Decimal],
+) -> Dict[str, Any]:
+    unit_cost = ensure_decimal(unit_cost_per_kg)
+    margin_rate = ensure_decimal(target_margin_rate)
+    quantity = ensure_decimal(quantity_kg) if quantity_kg is not None else None
+    _validate_simulation(
+        unit_cost,
+        margin_rate,
+        quantity,
+        ensure_decimal(min_margin_rate) if min_margin_rate is not None else None,
+        _ONE,
+    )
+
+    recommended_price = unit_cost / (_ONE - margin_rate)
+    gross_profit_per_kg = recommended_price - unit_cost
+
+    price_patterns = [
+        {
+            "margin_rate": float(round_rate(pattern_rate)),
+            "price_per_kg": price_per_kg,
+            "profit_per_kg": profit_per_kg,
+        }
+        for pattern_rate, price_per_kg, profit_per_kg in _decimal_price_patterns(
+            unit_cost, margin_rates
+        )
+    ]
+
+    gross_profit_total: Optional[int] = None
+    if quantity is not None:
+        gross_profit_total = round_jpy(gross_profit_per_kg * quantity)
+
+    return {
+        "recommended_price_per_kg": round_jpy(recommended_price),
+        "gross_profit_per_kg": round_jpy(gross_profit_per_kg),
+        "gross_profit_total": gross_profit_total,
+        "margin_rate": float(round_rate(margin_rate)),
+        "price_patterns": price_patterns,
+        "guard": price_guard(unit_cost, recommended_price, min_margin_rate),
+    }
@@ -0,0 +1,12 @@
+-- Indexes backing /api/break-even/current.
+-- The sales_data index covers every column summed by crud.get_sales_summary,
+-- so month-range aggregation is an index-only scan.
+
+CREATE INDEX IF NOT EXISTS ix_sales_data_sale_date_amounts
+  ON public.sales_data (sale_date, quantity_kg, unit_price_per_kg, unit_cost_per_kg);
+
+CREATE INDEX IF NOT EXISTS ix_sales_data_product_id
+  ON public.sales_data (product_id);
+
+CREATE INDEX IF NOT EXISTS ix_fixed_costs_year_month
+  ON public.fixed_costs (year_month, amount);
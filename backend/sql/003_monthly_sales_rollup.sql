@@ -0,0 +1,13 @@
+-- Monthly sales rollup read by /api/break-even/current.
+-- Sales rows without a product are stored under the nil UUID.
+-- Maintained incrementally by the API; backfill with `python -m app.rollup rebuild`.
+
+CREATE TABLE IF NOT EXISTS public.monthly_sales_rollup (
+  year_month DATE NOT NULL,
+  product_id UUID NOT NULL DEFAULT '00000000-0000-0000-0000-000000000000',
+  revenue NUMERIC(20,6) NOT NULL DEFAULT 0,
+  variable_cost NUMERIC(20,6) NOT NULL DEFAULT 0,
+  quantity_kg NUMERIC(16,3) NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP DEFAULT NOW(),
+  PRIMARY KEY (year_month, product_id)
+);
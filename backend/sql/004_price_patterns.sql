@@ -0,0 +1,21 @@
+-- Per-category margin ladders and precomputed price patterns.
+-- Categories without ladder rows use the built-in 10/15/20/25/30% ladder.
+-- Patterns are refreshed by the API on cost/category changes; backfill with
+-- `python -m app.price_patterns rebuild`.
+
+CREATE TABLE IF NOT EXISTS public.margin_ladders (
+  category VARCHAR(100) NOT NULL,
+  margin_rate NUMERIC(6,4) NOT NULL CHECK (margin_rate > 0 AND margin_rate < 0.9),
+  created_at TIMESTAMP DEFAULT NOW(),
+  PRIMARY KEY (category, margin_rate)
+);
+
+CREATE TABLE IF NOT EXISTS public.product_price_patterns (
+  product_id UUID NOT NULL REFERENCES public.products(id) ON DELETE CASCADE,
+  margin_rate NUMERIC(6,4) NOT NULL,
+  price_per_kg INTEGER NOT NULL,
+  profit_per_kg INTEGER NOT NULL,
+  unit_cost_per_kg NUMERIC(14,3) NOT NULL,
+  updated_at TIMESTAMP DEFAULT NOW(),
+  PRIMARY KEY (product_id, margin_rate)
+);
@@ -0,0 +1,15 @@
+-- Indexes behind GET /api/products.
+-- Keyset pagination orders by product_code (already unique-indexed); the
+-- composite indexes keep category and margin filters on the same order.
+-- pg_trgm lets both prefix and substring ILIKE searches on product_name use an index.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS ix_products_category_code
+  ON public.products (category, product_code);
+
+CREATE INDEX IF NOT EXISTS ix_products_target_margin_rate
+  ON public.products (target_margin_rate, product_code);
+
+CREATE INDEX IF NOT EXISTS ix_products_product_name_trgm
+  ON public.products USING gin (product_name gin_trgm_ops);
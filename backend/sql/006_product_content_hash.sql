@@ -0,0 +1,20 @@
+-- Incremental product re-import.
+-- products.content_hash is a SHA-256 over the importable fields; bulk imports
+-- skip rows whose hash is unchanged, so updated_at and catalog ETags stay put.
+-- product_imports remembers whole workbooks so an identical re-upload is a no-op
+-- while the catalog (max(updated_at), count) is unchanged since that import.
+
+ALTER TABLE public.products ADD COLUMN IF NOT EXISTS content_hash varchar(64);
+
+CREATE INDEX IF NOT EXISTS ix_products_updated_at
+  ON public.products (updated_at);
+
+CREATE TABLE IF NOT EXISTS public.product_imports (
+  content_sha256 varchar(64) PRIMARY KEY,
+  filename varchar(255),
+  imported integer NOT NULL DEFAULT 0,
+  skipped integer NOT NULL DEFAULT 0,
+  products_updated_at timestamp,
+  product_count integer NOT NULL DEFAULT 0,
+  imported_at timestamp NOT NULL DEFAULT now()
+);
@@ -0,0 +1,9 @@
+-- Simulation history written by the API's write-behind buffer (app/history.py).
+-- GET /api/price-simulations/history pages by (simulation_at, id), newest first,
+-- optionally for one product.
+
+CREATE INDEX IF NOT EXISTS ix_price_simulations_product_simulation_at
+  ON public.price_simulations (product_id, simulation_at);
+
+CREATE INDEX IF NOT EXISTS ix_price_simulations_simulation_at
+  ON public.price_simulations (simulation_at);
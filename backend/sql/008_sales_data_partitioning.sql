@@ -0,0 +1,91 @@
+-- Range-partition sales_data by sale_date month (PostgreSQL 13+).
+-- Break-even queries read one month and past months are never rewritten, so
+-- every month gets its own partition (sales_data_YYYYMM) and sale_date range
+-- filters prune all the others. SQLite development databases are unaffected.
+--
+-- Partitions are created on demand by ensure_sales_data_partition(month). The
+-- API calls it before writing a month it has not seen (app/partitions.py);
+-- other writers must do the same, since an INSERT for a month without a
+-- partition fails:
+--   SELECT public.ensure_sales_data_partition(DATE '2025-09-01');
+--
+-- The conversion copies existing rows inside one transaction and locks
+-- sales_data meanwhile; run it in a maintenance window. Re-running is a no-op.
+-- The primary key becomes (id, sale_date): partitioned tables need the
+-- partition key in every unique constraint. id stays unique per row.
+
+CREATE OR REPLACE FUNCTION public.ensure_sales_data_partition(p_month DATE)
+RETURNS TEXT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  month_start DATE := date_trunc('month', p_month)::date;
+  partition_name TEXT := 'sales_data_' || to_char(month_start, 'YYYYMM');
+BEGIN
+  IF to_regclass('public.' || partition_name) IS NULL THEN
+    -- Serialize concurrent writers creating the same month.
+    PERFORM pg_advisory_xact_lock(
+      hashtext('public.sales_data'), to_char(month_start, 'YYYYMM')::int
+    );
+    IF to_regclass('public.' || partition_name) IS NULL THEN
+      EXECUTE format(
+        'CREATE TABLE public.%I PARTITION OF public.sales_data FOR VALUES FROM (%L) TO (%L)',
+        partition_name,
+        month_start,
+        (month_start + INTERVAL '1 month')::date
+      );
+    END IF;
+  END IF;
+  RETURN partition_name;
+END;
+$$;
+
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'public.sales_data'::regclass
+  ) THEN
+    RETURN;
+  END IF;
+
+  ALTER TABLE public.sales_data RENAME TO sales_data_unpartitioned;
+  ALTER INDEX IF EXISTS public.ix_sales_data_sale_date_amounts
+    RENAME TO ix_sales_data_unpartitioned_sale_date_amounts;
+  ALTER INDEX IF EXISTS public.ix_sales_data_product_id
+    RENAME TO ix_sales_data_unpartitioned_product_id;
+  ALTER INDEX IF EXISTS public.sales_data_pkey RENAME TO sales_data_unpartitioned_pkey;
+
+  CREATE TABLE public.sales_data (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    product_id UUID REFERENCES public.products(id),
+    sale_date DATE NOT NULL,
+    quantity_kg NUMERIC(14,3),
+    unit_price_per_kg NUMERIC(14,3),
+    unit_cost_per_kg NUMERIC(14,3),
+    created_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (id, sale_date)
+  ) PARTITION BY RANGE (sale_date);
+
+  -- Same indexes as 002, now created on every partition.
+  CREATE INDEX ix_sales_data_sale_date_amounts
+    ON public.sales_data (sale_date, quantity_kg, unit_price_per_kg, unit_cost_per_kg);
+  CREATE INDEX ix_sales_data_product_id ON public.sales_data (product_id);
+
+  PERFORM public.ensure_sales_data_partition(month)
+  FROM (
+    SELECT DISTINCT date_trunc('month', sale_date)::date AS month
+    FROM public.sales_data_unpartitioned
+    UNION
+    SELECT date_trunc('month', NOW())::date
+    UNION
+    SELECT (date_trunc('month', NOW()) + INTERVAL '1 month')::date
+  ) AS months;
+
+  INSERT INTO public.sales_data
+    (id, product_id, sale_date, quantity_kg, unit_price_per_kg, unit_cost_per_kg, created_at)
+  SELECT id, product_id, sale_date, quantity_kg, unit_price_per_kg, unit_cost_per_kg, created_at
+  FROM public.sales_data_unpartitioned;
+
+  DROP TABLE public.sales_data_unpartitioned;
+END;
+$$;
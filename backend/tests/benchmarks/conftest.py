@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import json
+import platform
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.models import FixedCost, Product, SalesData, _uuid
+
+SALES_SCALES = {
+    "small": (1_000,),
+    "medium": (1_000, 100_000),
+    "large": (1_000, 100_000, 1_000_000),
+}
+WORKBOOK_SCALES = {
+    "small": (10_000,),
+    "medium": (10_000, 100_000),
+    "large": (10_000, 100_000),
+}
+BENCH_MONTH = date(2025, 8, 1)
+
+
+def _percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+class BenchmarkRecorder:
+    """Times callables, keeps results for the JSON report and checks the baseline."""
+
+    def __init__(self, baseline: Dict[str, Any], threshold: float) -> None:
+        self.baseline = baseline
+        self.threshold = threshold
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    def measure(
+        self,
+        name: str,
+        func: Callable[[], Any],
+        iterations: int,
+        warmup: int = 1,
+        units_per_call: int = 1,
+        unit: str = "ops",
+    ) -> Dict[str, Any]:
+        for _ in range(warmup):
+            func()
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - started) * 1000)
+
+        total_seconds = sum(samples) / 1000
+        result = {
+            "iterations": iterations,
+            "mean_ms": round(statistics.fmean(samples), 4),
+            "p50_ms": round(_percentile(samples, 0.50), 4),
+            "p95_ms": round(_percentile(samples, 0.95), 4),
+            "p99_ms": round(_percentile(samples, 0.99), 4),
+            "max_ms": round(max(samples), 4),
+            "throughput": round(iterations * units_per_call / total_seconds, 2)
+            if total_seconds
+            else None,
+            "throughput_unit": f"{unit}/s",
+        }
+        self.results[name] = result
+
+        previous = self.baseline.get(name)
+        if previous is not None:
+            limit = previous["p50_ms"] * (1 + self.threshold)
+            assert result["p50_ms"] <= limit, (
+                f"{name} regressed: p50 {result['p50_ms']}ms > {limit:.4f}ms "
+                f"(baseline {previous['p50_ms']}ms + {self.threshold:.0%})"
+            )
+        return result
+
+
+@pytest.fixture(scope="session")
+def benchmark_recorder(request) -> BenchmarkRecorder:
+    config = request.config
+    baseline_path: Optional[str] = config.getoption("--benchmark-baseline")
+    baseline: Dict[str, Any] = {}
+    if baseline_path:
+        baseline = json.loads(Path(baseline_path).read_text())["results"]
+    recorder = BenchmarkRecorder(baseline, config.getoption("--benchmark-threshold"))
+    yield recorder
+
+    if recorder.results:
+        report = {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": config.getoption("--benchmark-scale"),
+            "results": recorder.results,
+        }
+        Path(config.getoption("--benchmark-json")).write_text(
+            json.dumps(report, indent=2, ensure_ascii=False)
+        )
+
+
+@pytest.fixture()
+def bench(benchmark_recorder) -> BenchmarkRecorder:
+    return benchmark_recorder
+
+
+def pytest_generate_tests(metafunc):
+    scale = metafunc.config.getoption("--benchmark-scale")
+    if "sales_rows" in metafunc.fixturenames:
+        metafunc.parametrize("sales_rows", SALES_SCALES[scale], ids=lambda n: f"{n}-sales")
+    if "workbook_rows" in metafunc.fixturenames:
+        metafunc.parametrize("workbook_rows", WORKBOOK_SCALES[scale], ids=lambda n: f"{n}-rows")
+
+
+def seed_sales(session: Session, rows: int, products: int = 500, seed: int = 7) -> None:
+    """Insert ``rows`` synthetic sales lines for ``BENCH_MONTH`` and build the rollup."""
+    rng = random.Random(seed)
+    session.add(FixedCost(year_month=BENCH_MONTH, amount=38_277_000))
+    product_ids = [_uuid() for _ in range(products)]
+    session.execute(
+        Product.__table__.insert(),
+        [
+            {
+                "id": product_id,
+                "product_code": f"BENCH-{index:06d}",
+                "product_name": f"ベンチ商品{index}",
+                "category": f"CAT-{index % 20}",
+                "unit_cost_per_kg": 400 + index % 300,
+                "unit_price_per_kg": 520 + index % 380,
+                "target_margin_rate": 0.2,
+                "unit": "JPY/kg",
+            }
+            for index, product_id in enumerate(product_ids)
+        ],
+    )
+    batch = []
+    for _ in range(rows):
+        cost = rng.randint(300, 900)
+        batch.append(
+            {
+                "id": _uuid(),
+                "product_id": rng.choice(product_ids),
+                "sale_date": BENCH_MONTH + timedelta(days=rng.randrange(28)),
+                "quantity_kg": rng.randint(1, 2_000),
+                "unit_price_per_kg": round(cost * rng.uniform(1.05, 1.45), 3),
+                "unit_cost_per_kg": cost,
+            }
+        )
+        if len(batch) == 50_000:
+            session.execute(SalesData.__table__.insert(), batch)
+            batch = []
+    if batch:
+        session.execute(SalesData.__table__.insert(), batch)
+    # Core inserts bypass the ORM rollup hook, so backfill it like production would.
+    crud.rebuild_sales_rollup(session)
+    session.commit()
+
+
+HEADER = (None, None, "product_code", "product_name", "category", "cost", "price", "margin", "min")
+
+
+def build_workbook(rows: int, seed: int = 11, sheets: int = 1) -> bytes:
+    """Synthetic catalog; with ``sheets > 1`` the rows are split across sheets."""
+    from openpyxl import Workbook
+
+    rng = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    per_sheet = -(-rows // sheets)
+    for sheet_index in range(sheets):
+        sheet = workbook.create_sheet(f"S{sheet_index + 1}")
+        sheet.append(HEADER)
+        for index in range(sheet_index * per_sheet, min(rows, (sheet_index + 1) * per_sheet)):
+            cost = rng.randint(300, 900) / 1000
+            sheet.append(
+                (
+                    None,
+                    None,
+                    f"WB-{index:07d}",
+                    f"取込商品{index}",
+                    f"CAT-{index % 20}",
+                    cost,
+                    round(cost * 1.25, 3),
+                    20,
+                    0.1,
+                )
+            )
+    buffer = BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def build_sales_csv(rows: int, product_codes: list[str], seed: int = 13) -> bytes:
+    rng = random.Random(seed)
+    lines = ["sale_date,product_code,quantity_kg,unit_price_per_kg,unit_cost_per_kg"]
+    for _ in range(rows):
+        cost = rng.randint(300, 900)
+        sale_date = BENCH_MONTH + timedelta(days=rng.randrange(28))
+        lines.append(
+            f"{sale_date:%Y-%m-%d},{rng.choice(product_codes)},{rng.randint(1, 2_000)},"
+            f"{round(cost * rng.uniform(1.05, 1.45), 3)},{cost}"
+        )
+    return ("\n".join(lines) + "\n").encode()
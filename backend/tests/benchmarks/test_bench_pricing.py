@@ -0,0 +1,355 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+from app import compression, crud
+from app.cache import break_even_cache
+from app.importer import DEFAULT_COLUMN_MAPPING, iter_upload_chunks
+from app.elasticity import ElasticityModel
+from app.models import MonthlySalesRollup, Product, SalesData, _uuid
+from app.responses import dumps
+from app.schemas import ExcelImportResponse, ExcelImportWarning
+from app.utils import generate_price_patterns, round_jpy, round_rate, simulate_price
+
+from .conftest import BENCH_MONTH, build_sales_csv, build_workbook, seed_sales
+
+pytestmark = pytest.mark.benchmark
+
+
+def test_bench_utils(bench):
+    costs = [Decimal(620 + index) / Decimal("3") for index in range(1_000)]
+
+    bench.measure(
+        "utils.round_jpy", lambda: [round_jpy(cost) for cost in costs], 50, units_per_call=1_000
+    )
+    bench.measure(
+        "utils.round_rate", lambda: [round_rate(cost) for cost in costs], 50, units_per_call=1_000
+    )
+    bench.measure(
+        "utils.generate_price_patterns",
+        lambda: [list(generate_price_patterns(cost)) for cost in costs],
+        20,
+        units_per_call=1_000,
+    )
+    bench.measure(
+        "utils.simulate_price",
+        lambda: [simulate_price(cost, Decimal("0.2"), Decimal("1000")) for cost in costs],
+        20,
+        units_per_call=1_000,
+    )
+
+
+def test_bench_fixed_point_pricing(bench):
+    """Scaled-integer fast path versus the Decimal path on the same float inputs."""
+    from app.utils import _simulate_price_decimal, _simulate_price_fixed
+
+    costs = [round(400 + index * 0.731, 3) for index in range(1_000)]
+    fixed = bench.measure(
+        "utils.simulate_price[fixed-point]",
+        lambda: [_simulate_price_fixed(cost, 0.2, 1000.0, None, 0.15) for cost in costs],
+        20,
+        units_per_call=1_000,
+    )
+    decimal = bench.measure(
+        "utils.simulate_price[decimal]",
+        lambda: [_simulate_price_decimal(cost, 0.2, 1000.0, None, 0.15) for cost in costs],
+        20,
+        units_per_call=1_000,
+    )
+    bench.measure(
+        "utils.round_jpy[float]",
+        lambda: [round_jpy(cost) for cost in costs],
+        50,
+        units_per_call=1_000,
+    )
+    fixed["speedup"] = round(decimal["p50_ms"] / fixed["p50_ms"], 2)
+    assert fixed["p50_ms"] < decimal["p50_ms"]
+
+
+def test_bench_price_simulation_endpoint(bench, client: TestClient):
+    payload = {
+        "product_name": "商品A",
+        "unit_cost_per_kg": 620,
+        "target_margin_rate": 0.2,
+        "quantity_kg": 1000,
+    }
+    bench.measure(
+        "POST /api/price-simulations/calculate",
+        lambda: client.post("/api/price-simulations/calculate", json=payload),
+        300,
+        warmup=10,
+        unit="requests",
+    )
+
+
+def test_bench_break_even_endpoint(bench, client: TestClient, db_session, sales_rows):
+    seed_sales(db_session, sales_rows)
+    params = {"year_month": "2025-08"}
+
+    break_even_cache.enabled = False
+    try:
+        bench.measure(
+            f"GET /api/break-even/current[{sales_rows}-sales,uncached]",
+            lambda: client.get("/api/break-even/current", params=params),
+            100,
+            warmup=5,
+            unit="requests",
+        )
+    finally:
+        break_even_cache.enabled = True
+    bench.measure(
+        f"GET /api/break-even/current[{sales_rows}-sales,cached]",
+        lambda: client.get("/api/break-even/current", params=params),
+        300,
+        warmup=5,
+        unit="requests",
+    )
+
+
+def test_bench_excel_import(bench, client: TestClient, workbook_rows):
+    content = build_workbook(workbook_rows)
+
+    def upload():
+        response = client.post(
+            "/api/import/excel",
+            files={"file": ("bench.xlsx", content, "application/vnd.ms-excel")},
+        )
+        assert response.status_code == 200
+
+    bench.measure(
+        f"POST /api/import/excel[{workbook_rows}-rows]",
+        upload,
+        3,
+        warmup=1,
+        units_per_call=workbook_rows,
+        unit="rows",
+    )
+
+
+def test_bench_parallel_sheet_parse(bench, workbook_rows):
+    """Parse throughput of a 4-sheet workbook versus the number of pool workers."""
+    content = build_workbook(workbook_rows, sheets=4)
+    sheets = [f"S{index}" for index in range(1, 5)]
+    for workers in sorted({1, min(4, os.cpu_count() or 1)}):
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+
+            def parse():
+                for _ in iter_upload_chunks(pool, content, DEFAULT_COLUMN_MAPPING, 1000, sheets):
+                    pass
+
+            bench.measure(
+                f"iter_upload_chunks[{workbook_rows}-rows,4-sheets,{workers}-workers]",
+                parse,
+                3,
+                warmup=1,
+                units_per_call=workbook_rows,
+                unit="rows",
+            )
+
+
+def test_bench_sales_import(bench, client: TestClient, db_session, workbook_rows):
+    seed_sales(db_session, 0, products=200)
+    codes = [f"BENCH-{index:06d}" for index in range(200)]
+    product_ids = crud.get_product_id_map(db_session)
+    content = build_sales_csv(workbook_rows, codes)
+
+    def upload():
+        response = client.post("/api/import/sales", files={"file": ("pos.csv", content, "text/csv")})
+        assert response.status_code == 200
+
+    bulk = bench.measure(
+        f"POST /api/import/sales[{workbook_rows}-rows]",
+        upload,
+        3,
+        warmup=1,
+        units_per_call=workbook_rows,
+        unit="rows",
+    )
+
+    # Reference point: the same rows added one ORM object at a time.
+    orm_rows = min(workbook_rows, 2_000)
+    records = list(csv.DictReader(io.StringIO(content.decode())))[:orm_rows]
+
+    def orm_insert():
+        for record in records:
+            db_session.add(
+                SalesData(
+                    product_id=product_ids[record["product_code"]],
+                    sale_date=BENCH_MONTH,
+                    quantity_kg=Decimal(record["quantity_kg"]),
+                    unit_price_per_kg=Decimal(record["unit_price_per_kg"]),
+                    unit_cost_per_kg=Decimal(record["unit_cost_per_kg"]),
+                )
+            )
+            db_session.flush()
+        db_session.commit()
+
+    orm = bench.measure(
+        f"orm_sales_inserts[{orm_rows}-rows]",
+        orm_insert,
+        1,
+        warmup=0,
+        units_per_call=orm_rows,
+        unit="rows",
+    )
+    assert bulk["throughput"] > orm["throughput"]
+
+
+def test_bench_import_response_encoding(bench):
+    warnings = 10_000
+    response = ExcelImportResponse(
+        imported=0,
+        skipped=warnings,
+        warnings=[
+            ExcelImportWarning(row=row, field="原価(千円/kg)", reason="non-numeric")
+            for row in range(2, warnings + 2)
+        ],
+    )
+
+    def default_encoding():
+        # What FastAPI does for a plain response_model: re-validate, encode, dump.
+        validated = ExcelImportResponse.parse_obj(response.dict())
+        return json.dumps(
+            jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")
+        ).encode()
+
+    default = bench.measure(
+        f"encode_import_response_default[{warnings}-warnings]",
+        default_encoding,
+        10,
+        units_per_call=warnings,
+        unit="warnings",
+    )
+    fast = bench.measure(
+        f"encode_import_response_fast[{warnings}-warnings]",
+        lambda: dumps(response),
+        10,
+        units_per_call=warnings,
+        unit="warnings",
+    )
+    body = dumps(response)
+    assert json.loads(body) == json.loads(default_encoding())
+    fast["bytes"] = {"identity": len(body), "gzip": len(gzip.compress(body, 6))}
+    if compression.brotli is not None:
+        fast["bytes"]["br"] = len(compression.brotli.compress(body, quality=4))
+        bench.measure(
+            f"brotli_import_response[{warnings}-warnings]",
+            lambda: compression.brotli.compress(body, quality=4),
+            10,
+        )
+    bench.measure(
+        f"gzip_import_response[{warnings}-warnings]", lambda: gzip.compress(body, 6), 10
+    )
+    assert fast["p50_ms"] < default["p50_ms"]
+
+
+def test_bench_cold_start(bench, tmp_path):
+    """Fresh interpreters: importing the app, then running its lifespan startup."""
+    env = {**os.environ, "PRICING_DATABASE_URL": f"sqlite:///{tmp_path / 'cold.db'}"}
+    backend = Path(__file__).resolve().parents[2]
+
+    def run(code: str, **extra: str) -> None:
+        subprocess.run(
+            [sys.executable, "-c", code], cwd=backend, env={**env, **extra}, check=True
+        )
+
+    bench.measure("cold_start[import app.main]", lambda: run("import app.main"), 5)
+    startup = (
+        "from fastapi.testclient import TestClient\n"
+        "from app.main import app\n"
+        "with TestClient(app): pass\n"
+    )
+    bench.measure(
+        "cold_start[import+lifespan,create_schema]",
+        lambda: run(startup, PRICING_CREATE_SCHEMA_ON_STARTUP="true"),
+        5,
+    )
+    bench.measure(
+        "cold_start[import+lifespan,no_schema]",
+        lambda: run(startup, PRICING_CREATE_SCHEMA_ON_STARTUP="false"),
+        5,
+    )
+
+
+@pytest.mark.parametrize("products", [10_000, 100_000], ids=lambda n: f"{n}-skus")
+def test_bench_elasticity_catalog_solve(bench, db_session, products):
+    """Fit and solve every SKU from 11 months of rollup rows, then fold in one new month."""
+    rng = random.Random(17)
+    product_ids = [_uuid() for _ in range(products)]
+    db_session.execute(
+        Product.__table__.insert(),
+        [
+            {
+                "id": product_id,
+                "product_code": f"ELAST-{index:06d}",
+                "product_name": f"弾力性{index}",
+                "category": f"CAT-{index % 50}",
+                "unit_cost_per_kg": 400 + index % 300,
+                "unit_price_per_kg": 600 + index % 400,
+                "min_margin_rate": 0.15,
+                "unit": "JPY/kg",
+            }
+            for index, product_id in enumerate(product_ids)
+        ],
+    )
+
+    def rollup_rows(months, updated_at):
+        for month in months:
+            for product_id in product_ids:
+                price = rng.uniform(500, 1000)
+                quantity = 1000 * (price / 700) ** rng.uniform(-3, -1.2)
+                yield {
+                    "year_month": date(2024, month, 1),
+                    "product_id": product_id,
+                    "revenue": price * quantity,
+                    "variable_cost": 0,
+                    "quantity_kg": round(quantity, 3),
+                    "updated_at": updated_at,
+                }
+
+    db_session.execute(
+        MonthlySalesRollup.__table__.insert(),
+        list(rollup_rows(range(1, 12), datetime(2024, 12, 1))),
+    )
+    db_session.commit()
+    model = ElasticityModel(6, 0.2, refresh_seconds=3600, full_refresh_seconds=3600)
+
+    def full_load():
+        model.invalidate()
+        model.refresh(db_session)
+
+    bench.measure(f"elasticity.full_load[{products}-skus]", full_load, 3, units_per_call=products)
+    solve = bench.measure(
+        f"elasticity.solve[{products}-skus]",
+        lambda: list(model.solve(db_session).rows()),
+        5,
+        units_per_call=products,
+        unit="skus",
+    )
+    db_session.execute(
+        MonthlySalesRollup.__table__.insert(), list(rollup_rows([12], datetime.utcnow()))
+    )
+    db_session.commit()
+    bench.measure(
+        f"elasticity.incremental_refresh[{products}-skus]",
+        lambda: model.refresh(db_session, force=True),
+        3,
+        warmup=0,
+    )
+    assert solve["p50_ms"] < 10_000
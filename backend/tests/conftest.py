@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import os
 from collections.abc import Generator
 from datetime import date
@@ -8,39 +9,144 @@ from typing import Any
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 
+from app.cache import break_even_cache
 from app.main import app
-from app.database import Base, get_session
+from app.database import (
+    Base,
+    get_async_session,
+    get_read_session,
+    get_session,
+    get_sessionmaker,
+)
+from app.elasticity import price_elasticity
+from app.guard import min_margin_rates
+from app.history import simulation_history
 from app.models import FixedCost, Product, SalesData
+from app.observability import instrument_queries
+from app.price_patterns import margin_ladders
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmark", "pricing backend benchmarks")
+    group.addoption(
+        "--benchmark",
+        action="store_true",
+        default=False,
+        help="run the benchmark suite in tests/benchmarks (skipped by default)",
+    )
+    group.addoption(
+        "--benchmark-scale",
+        choices=("small", "medium", "large"),
+        default="small",
+        help="dataset sizes: small=1k sales/10k rows, medium=+100k, large=+1M sales",
+    )
+    group.addoption(
+        "--benchmark-json",
+        default="benchmark-results.json",
+        help="where to write benchmark results",
+    )
+    group.addoption(
+        "--benchmark-baseline",
+        default=None,
+        help="results JSON from a previous run to compare against",
+    )
+    group.addoption(
+        "--benchmark-threshold",
+        type=float,
+        default=0.25,
+        help="allowed p50 slowdown versus the baseline (0.25 = 25%%)",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: performance benchmark (run with --benchmark)")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmarks run only with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(scope="session")
+def test_database_path(tmp_path_factory):
+    # A file (not :memory:) so the sync and aiosqlite engines see the same data.
+    return tmp_path_factory.mktemp("db") / "pricing-test.db"
 
 
 @pytest.fixture(scope="session")
-def test_engine():
-    engine = create_engine("sqlite:///:memory:", future=True)
+def test_engine(test_database_path):
+    engine = create_engine(
+        f"sqlite:///{test_database_path}",
+        future=True,
+        connect_args={"check_same_thread": False},
+    )
+    instrument_queries(engine)
     Base.metadata.create_all(bind=engine)
-    return engine
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def async_test_sessionmaker(test_database_path):
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{test_database_path}")
+    instrument_queries(async_engine.sync_engine)
+    yield async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    asyncio.run(async_engine.dispose())
 
 
 @pytest.fixture()
 def db_session(test_engine) -> Generator[Session, None, None]:
-    connection = test_engine.connect()
-    transaction = connection.begin()
-    session = sessionmaker(bind=connection, autoflush=False, autocommit=False, future=True)()
+    session = sessionmaker(bind=test_engine, autoflush=False, autocommit=False, future=True)()
     yield session
+    session.rollback()
     session.close()
-    transaction.rollback()
-    connection.close()
+    with test_engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
 
 
 @pytest.fixture(autouse=True)
-def override_session_dependency(db_session):
+def override_session_dependency(db_session, async_test_sessionmaker):
     def _get_session():
         yield db_session
 
+    async def _get_async_session():
+        async with async_test_sessionmaker() as session:
+            yield session
+
+    def _get_sessionmaker():
+        return sessionmaker(bind=db_session.get_bind(), autoflush=False, future=True)
+
     app.dependency_overrides[get_session] = _get_session
+    app.dependency_overrides[get_read_session] = _get_session
+    app.dependency_overrides[get_async_session] = _get_async_session
+    app.dependency_overrides[get_sessionmaker] = _get_sessionmaker
     yield
+    # Write buffered history before db_session empties the tables.
+    simulation_history.flush()
     app.dependency_overrides.pop(get_session, None)
+    app.dependency_overrides.pop(get_read_session, None)
+    app.dependency_overrides.pop(get_async_session, None)
+    app.dependency_overrides.pop(get_sessionmaker, None)
+
+
+@pytest.fixture(autouse=True)
+def clear_break_even_cache():
+    break_even_cache.clear()
+    break_even_cache.reset_stats()
+    yield
+    break_even_cache.clear()
+    # Tables are emptied between tests, so cached ladders would be stale.
+    margin_ladders.invalidate()
+    min_margin_rates.invalidate()
+    price_elasticity.invalidate()
 
 
 @pytest.fixture()
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from datetime import date
+
+from fastapi.testclient import TestClient
+from sqlalchemy import Select, delete, select
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.models import MonthlySalesRollup, SalesData
+from app.utils import round_jpy
+
+
+def _query_plan(session: Session, stmt: Select) -> str:
+    compiled = stmt.compile(
+        dialect=session.get_bind().dialect, compile_kwargs={"literal_binds": True}
+    )
+    rows = session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}").all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def test_rollup_break_even_totals(seeded_db):
+    fixed_cost_total, revenue, variable_cost = crud.get_rollup_break_even_totals(
+        seeded_db, date(2025, 8, 1)
+    )
+    assert fixed_cost_total == 38_277_000
+    assert revenue == 1000 * 775 + 500 * 790
+    assert variable_cost == 1500 * 620
+
+
+def test_break_even_queries_use_indexes(db_session):
+    sales_plan = _query_plan(
+        db_session, crud._sales_summary_stmt(date(2025, 8, 1), date(2025, 9, 1))
+    )
+    assert "COVERING INDEX ix_sales_data_sale_date_amounts" in sales_plan
+
+    fixed_plan = _query_plan(db_session, crud._fixed_cost_total_stmt(date(2025, 8, 1)))
+    assert "COVERING INDEX ix_fixed_costs_year_month" in fixed_plan
+
+
+def test_rollup_tracks_orm_inserts_and_rebuild(client: TestClient, seeded_db):
+    rollup = seeded_db.execute(select(MonthlySalesRollup)).scalars().all()
+    assert [(row.year_month, float(row.quantity_kg)) for row in rollup] == [
+        (date(2025, 8, 1), 1500.0)
+    ]
+
+    product_id = rollup[0].product_id
+    seeded_db.add(
+        SalesData(
+            product_id=product_id,
+            sale_date=date(2025, 8, 25),
+            quantity_kg=100,
+            unit_price_per_kg=800,
+            unit_cost_per_kg=620,
+        )
+    )
+    seeded_db.commit()
+
+    totals = crud.get_rollup_break_even_totals(seeded_db, date(2025, 8, 1))
+    # The rollup agrees with summing sales_data directly.
+    assert totals == (
+        crud.get_fixed_cost_total(seeded_db, date(2025, 8, 1)),
+        *crud.get_sales_summary(seeded_db, date(2025, 8, 1), date(2025, 9, 1)),
+    )
+    assert totals[1] == 1000 * 775 + 500 * 790 + 100 * 800
+
+    seeded_db.execute(delete(MonthlySalesRollup))
+    assert crud.rebuild_sales_rollup(seeded_db) == 1
+    assert crud.get_rollup_break_even_totals(seeded_db, date(2025, 8, 1)) == totals
+
+    response = client.get("/api/break-even/products", params={"year_month": "2025-08"})
+    assert response.status_code == 200
+    products = response.json()["products"]
+    assert len(products) == 1
+    assert products[0]["product_code"] == "SKU-001"
+    assert products[0]["revenue"] == round_jpy(totals[1])
+    assert products[0]["revenue_share"] == 1.0
+
+
+def test_break_even_series_matches_single_month(client: TestClient, seeded_db):
+    response = client.get("/api/break-even/series", params={"from": "2025-07", "to": "2025-09"})
+    assert response.status_code == 200
+    data = response.json()
+    assert [month["year_month"] for month in data["months"]] == ["2025-07", "2025-08", "2025-09"]
+    for month in data["months"]:
+        single = client.get("/api/break-even/current", params={"year_month": month["year_month"]})
+        assert month == single.json()
+    assert data["months"][0]["fixed_costs"] == 34_222_000
+    assert data["months"][2]["fixed_costs"] == 0
+
+    response = client.get("/api/break-even/series", params={"from": "2025-09", "to": "2025-07"})
+    assert response.status_code == 400
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from app.cache import BreakEvenCache, LocalTTLBackend, break_even_cache
+from app.models import FixedCost
+from app.replicas import REPLICA_KEY
+from app.schemas import BreakEvenResponse
+
+
+def test_local_backend_evicts_and_expires():
+    now = [0.0]
+    backend = LocalTTLBackend(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    backend.set("a", "1")
+    backend.set("b", "2")
+    assert backend.get("a") == "1"
+    backend.set("c", "3")
+    assert backend.get("b") is None
+    assert backend.evictions == 1
+
+    now[0] = 11
+    assert backend.get("a") is None
+    assert backend.expirations == 1
+
+
+def test_fill_started_before_an_invalidation_is_dropped(client: TestClient):
+    cache = BreakEvenCache(LocalTTLBackend(max_entries=8, ttl_seconds=60))
+    stale = client.get("/api/break-even/current", params={"year_month": "2025-08"}).json()
+
+    cached, generation = cache.get("2025-08")
+    assert cached is None
+    cache.invalidate([date(2025, 8, 1)])  # a writer commits while the totals are read
+    cache.set("2025-08", BreakEvenResponse(**stale), generation)
+    assert cache.get("2025-08")[0] is None
+
+    cached, generation = cache.get("2025-08")
+    cache.set("2025-08", BreakEvenResponse(**stale), generation)
+    assert cache.get("2025-08")[0] == BreakEvenResponse(**stale)
+
+
+def test_break_even_cache_invalidated_by_writes(client: TestClient, seeded_db):
+    first = client.get("/api/break-even/current", params={"year_month": "2025-08"}).json()
+    second = client.get("/api/break-even/current", params={"year_month": "2025-08"}).json()
+    assert first == second
+    assert break_even_cache.stats()["hits"] == 1
+    invalidations = break_even_cache.stats()["invalidations"]
+
+    seeded_db.add(FixedCost(year_month=date(2025, 8, 1), amount=1_000_000))
+    seeded_db.commit()
+
+    third = client.get("/api/break-even/current", params={"year_month": "2025-08"}).json()
+    assert third["fixed_costs"] == first["fixed_costs"] + 1_000_000
+
+    stats = client.get("/api/cache/stats").json()["break_even"]
+    assert stats["invalidations"] == invalidations + 1
+    assert stats["misses"] == 2
+
+
+def test_break_even_cache_is_not_filled_from_replicas(client: TestClient, seeded_db):
+    seeded_db.info[REPLICA_KEY] = True
+    try:
+        for _ in range(2):
+            response = client.get("/api/break-even/current", params={"year_month": "2025-08"})
+            assert response.status_code == 200
+    finally:
+        seeded_db.info.pop(REPLICA_KEY)
+    assert break_even_cache.stats()["hits"] == 0
+
+    client.get("/api/break-even/current", params={"year_month": "2025-08"})
+    client.get("/api/break-even/current", params={"year_month": "2025-08"})
+    assert break_even_cache.stats()["hits"] == 1
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.elasticity import ElasticityModel
+from app.models import Product, SalesData
+
+pytest.importorskip("numpy")
+
+
+def _product(session, code, category, cost, price, min_margin=None):
+    product = Product(
+        product_code=code,
+        product_name=code,
+        category=category,
+        unit_cost_per_kg=cost,
+        unit_price_per_kg=price,
+        min_margin_rate=min_margin,
+        unit="JPY/kg",
+    )
+    session.add(product)
+    session.flush()
+    return product
+
+
+def _sell(session, product, month, price, elasticity, day=10):
+    # Constant-elasticity demand: 1000 kg at 500 円/kg.
+    session.add(
+        SalesData(
+            product_id=product.id,
+            sale_date=date(2025, month, day),
+            quantity_kg=round(1000 * (price / 500) ** elasticity, 3),
+            unit_price_per_kg=price,
+            unit_cost_per_kg=product.unit_cost_per_kg,
+        )
+    )
+
+
+@pytest.fixture()
+def demand_history(db_session):
+    vegetable = _product(db_session, "VEG-OWN", "青果", 400, 700, 0.1)
+    for month, price in enumerate((450, 500, 550, 600, 650, 700, 750, 800), start=1):
+        _sell(db_session, vegetable, month, price, -2)
+    sparse = _product(db_session, "VEG-SPARSE", "青果", 300, 520)
+    _sell(db_session, sparse, 1, 480, -2)
+    _sell(db_session, sparse, 2, 560, -2)
+    _product(db_session, "VEG-NEW", "青果", 600, 900, 0.5)
+    fish = _product(db_session, "FISH", "鮮魚", 300, 500)
+    for month, price in enumerate((400, 450, 500, 550, 600, 650), start=1):
+        _sell(db_session, fish, month, price, -0.5)
+    _product(db_session, "NO-COST", "青果", None, 500)
+    db_session.commit()
+    return db_session
+
+
+def _model(today=date(2026, 1, 1)):
+    return ElasticityModel(
+        min_observations=6,
+        max_price_change=0.2,
+        refresh_seconds=0,
+        full_refresh_seconds=3600,
+        today=lambda: today,
+    )
+
+
+def test_solver_picks_profit_maximizing_prices(demand_history):
+    rows = {row["product_code"]: row for row in _model().solve(demand_history).rows()}
+    assert list(rows) == ["FISH", "NO-COST", "VEG-NEW", "VEG-OWN", "VEG-SPARSE"]
+
+    own = rows["VEG-OWN"]
+    assert own["elasticity"] == pytest.approx(-2, abs=1e-3)
+    assert (own["elasticity_source"], own["observations"]) == ("product", 8)
+    # p* = c·b / (1 + b) = 400 · 2 = 800, inside ±20% of the 700 list price.
+    assert (own["optimal_price_per_kg"], own["constraint"]) == (800, "none")
+    assert own["gross_margin_rate"] == 0.5
+    assert own["expected_quantity_kg"] == pytest.approx(390.625, abs=0.01)
+    assert own["expected_gross_profit"] == pytest.approx(156_250, abs=5)
+
+    sparse = rows["VEG-SPARSE"]
+    assert (sparse["elasticity_source"], sparse["observations"]) == ("category", 2)
+    assert sparse["elasticity"] == pytest.approx(-2, abs=1e-3)
+    assert (sparse["optimal_price_per_kg"], sparse["constraint"]) == (600, "none")
+
+    # Pooled slope gives 1200, above the 1080 band edge, but the 50% margin floor is 1200.
+    new = rows["VEG-NEW"]
+    assert (new["elasticity_source"], new["observations"]) == ("category", 0)
+    assert (new["optimal_price_per_kg"], new["constraint"]) == (1200, "min_margin")
+    assert new["expected_quantity_kg"] is None
+
+    # Inelastic demand has no interior maximum: the band edge wins.
+    fish = rows["FISH"]
+    assert fish["elasticity"] == pytest.approx(-0.5, abs=1e-3)
+    assert (fish["optimal_price_per_kg"], fish["constraint"]) == (600, "max_change")
+
+    assert rows["NO-COST"]["optimal_price_per_kg"] is None
+    assert rows["NO-COST"]["constraint"] is None
+
+
+def test_incremental_refresh_matches_a_full_reload(demand_history):
+    today = [date(2025, 8, 15)]
+    model = ElasticityModel(6, 0.2, 0, 3600, today=lambda: today[0])
+    model.refresh(demand_history)
+    (own,) = model.solve(demand_history, ["VEG-OWN"]).rows()
+    assert own["observations"] == 7  # August is not over yet
+
+    fish = demand_history.query(Product).filter_by(product_code="FISH").one()
+    _sell(demand_history, fish, 3, 500, -0.5, day=20)  # a second sale in March
+    _sell(demand_history, fish, 7, 700, -0.5)
+    demand_history.commit()
+    today[0] = date(2025, 9, 1)
+    rows = {row["product_code"]: row for row in model.solve(demand_history).rows()}
+    assert rows["VEG-OWN"]["observations"] == 8
+    assert rows["FISH"]["observations"] == 7
+
+    fresh = _model(today[0]).solve(demand_history)
+    assert list(model.solve(demand_history).rows()) == list(fresh.rows())
+
+
+def test_price_optimization_endpoint(client: TestClient, demand_history):
+    response = client.get(
+        "/api/price-optimization", params={"product_codes": ["VEG-NEW", "VEG-OWN"]}
+    )
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert [item["product_code"] for item in items] == ["VEG-NEW", "VEG-OWN"]
+    assert [item["optimal_price_per_kg"] for item in items] == [1200, 800]
+
+    response = client.get("/api/price-optimization", params={"category": "鮮魚"})
+    assert [item["product_code"] for item in response.json()["items"]] == ["FISH"]
@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import pytest
+from fastapi.testclient import TestClient
+from openpyxl import Workbook
+from sqlalchemy import select
+
+from app import importer
+from app.config import get_settings
+from app.importer import LastSeen, ProductChunk
+from app.models import Product
+
+
+HEADER = (None, None, "product_code", "product_name", "category", "cost", "price", "margin")
+
+
+def _workbook_bytes(rows: list[tuple]) -> bytes:
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+    buffer = BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def test_excel_import_streams_in_chunks(client: TestClient, seeded_db, monkeypatch):
+    monkeypatch.setattr(get_settings(), "import_chunk_size", 2)
+    content = _workbook_bytes(
+        [
+            (None, None, "SKU-001", "更新商品", "青果", 0.630, 0.790, 20),
+            (None, None, "SKU-010", "商品10", None, 0.500, 0.650, 0.25),
+            (None, None, "SKU-011", "商品11", None, 0.400, 0.520, 0.2),
+            (None, None, "SKU-010", "商品10改", None, 0.510, 0.660, 0.25),
+            (None, None, None, "コードなし", None, 0.1, 0.2, 0.1),
+        ]
+    )
+
+    response = client.post(
+        "/api/import/excel",
+        files={"file": ("import.xlsx", content, "application/vnd.ms-excel")},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["imported"] == 4
+    assert data["skipped"] == 1
+    assert data["superseded"] == 1
+    assert [chunk["rows"] for chunk in data["chunks"]] == [2, 2, 1]
+    # Chunks are written as they are parsed: the first SKU-010 row is inserted,
+    # then overwritten by the later one.
+    assert [(chunk["inserted"], chunk["updated"]) for chunk in data["chunks"]] == [
+        (1, 1),
+        (1, 1),
+        (0, 0),
+    ]
+    assert {"row": 3, "field": "product_code", "reason": "superseded by Sheet row 5"} in [
+        {key: warning[key] for key in ("row", "field", "reason")} for warning in data["warnings"]
+    ]
+    assert all(chunk["write_ms"] >= 0 for chunk in data["chunks"])
+
+    products = {
+        product.product_code: product
+        for product in seeded_db.execute(select(Product)).scalars()
+    }
+    assert products["SKU-001"].product_name == "更新商品"
+    assert float(products["SKU-001"].unit_cost_per_kg) == 630
+    assert float(products["SKU-001"].target_margin_rate) == 0.2
+    assert products["SKU-010"].product_name == "商品10改"
+
+
+def _wait_for_job(client: TestClient, job_id: str, **params) -> dict:
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        data = client.get(f"/api/import/jobs/{job_id}", params=params).json()
+        if data["status"] in ("succeeded", "failed"):
+            return data
+        time.sleep(0.02)
+    raise AssertionError("import job did not finish")
+
+
+def test_background_import_job_reports_progress(client: TestClient, seeded_db):
+    rows = [(None, None, f"SKU-{index:03d}", f"商品{index}", None, 0.5, 0.6, 0.2) for index in range(5)]
+    rows += [(None, None, None, "コードなし", None, 0.1, 0.2, 0.1)] * 3
+    response = client.post(
+        "/api/import/jobs",
+        files={"file": ("import.xlsx", _workbook_bytes(rows), "application/vnd.ms-excel")},
+    )
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    data = _wait_for_job(client, job_id, warnings_offset=1, warnings_limit=1)
+    assert data["status"] == "succeeded"
+    assert data["rows_processed"] == 8
+    assert data["warnings_total"] == 3
+    assert [warning["row"] for warning in data["warnings"]] == [8]
+    assert data["result"]["imported"] == 5
+    assert data["result"]["skipped"] == 3
+    assert data["rows_per_second"] > 0
+
+    assert client.get("/api/import/jobs/unknown").status_code == 404
+
+
+def test_background_import_job_reports_invalid_file(client: TestClient):
+    response = client.post(
+        "/api/import/jobs",
+        files={"file": ("import.xlsx", b"not a workbook", "application/vnd.ms-excel")},
+    )
+    data = _wait_for_job(client, response.json()["job_id"])
+    assert data["status"] == "failed"
+    assert data["error"] == "Failed to read Excel file"
+
+
+def _post_workbook(client: TestClient, content: bytes) -> dict:
+    response = client.post(
+        "/api/import/excel",
+        files={"file": ("import.xlsx", content, "application/vnd.ms-excel")},
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_reimport_skips_unchanged_rows_and_duplicate_workbooks(client: TestClient, seeded_db):
+    rows = [
+        (None, None, "SKU-020", "商品20", "青果", 0.500, 0.650, 0.25),
+        (None, None, "SKU-021", "商品21", "青果", 0.400, 0.520, 0.2),
+    ]
+    content = _workbook_bytes(rows)
+    first = _post_workbook(client, content)
+    assert (first["inserted"], first["updated"], first["unchanged"]) == (2, 0, 0)
+    stamps = dict(seeded_db.execute(select(Product.product_code, Product.updated_at)).all())
+
+    again = _post_workbook(client, content)
+    assert again["duplicate"] is True
+    assert (again["imported"], again["unchanged"]) == (2, 2)
+
+    # Same rows in a different workbook file: hashed row by row, nothing rewritten.
+    rows.append((None, None, None, "コードなし", None, 0.1, 0.2, 0.1))
+    resaved = _post_workbook(client, _workbook_bytes(rows))
+    assert resaved["duplicate"] is False
+    assert (resaved["inserted"], resaved["updated"], resaved["unchanged"]) == (0, 0, 2)
+    seeded_db.expire_all()
+    assert dict(seeded_db.execute(select(Product.product_code, Product.updated_at)).all()) == stamps
+
+    rows[1] = (None, None, "SKU-021", "商品21", "青果", 0.450, 0.520, 0.2)
+    changed_content = _workbook_bytes(rows)
+    changed = _post_workbook(client, changed_content)
+    assert (changed["inserted"], changed["updated"], changed["unchanged"]) == (0, 1, 1)
+    seeded_db.expire_all()
+    products = {
+        product.product_code: product for product in seeded_db.execute(select(Product)).scalars()
+    }
+    assert float(products["SKU-021"].unit_cost_per_kg) == 450
+    assert products["SKU-020"].updated_at == stamps["SKU-020"]
+
+    # An edit since the last import means the same workbook must be applied again.
+    products["SKU-020"].product_name = "手修正"
+    seeded_db.commit()
+    reapplied = _post_workbook(client, changed_content)
+    assert reapplied["duplicate"] is False
+    assert (reapplied["updated"], reapplied["unchanged"]) == (1, 1)
+
+
+def _multi_sheet_bytes(sheets: dict[str, list[tuple]]) -> bytes:
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for title, rows in sheets.items():
+        sheet = workbook.create_sheet(title)
+        sheet.append(HEADER)
+        for row in rows:
+            sheet.append(row)
+    buffer = BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def _product(code: str, name: str, cost: float) -> tuple:
+    return (None, None, code, name, "青果", cost, round(cost * 1.3, 3), 0.2)
+
+
+def test_multi_sheet_import_merges_on_product_code(client: TestClient, seeded_db):
+    content = _multi_sheet_bytes(
+        {
+            "春": [_product("SKU-030", "春30", 0.5), _product("SKU-031", "春31", 0.4)],
+            "夏": [_product("SKU-031", "夏31", 0.45), _product("SKU-032", "夏32", 0.3)],
+        }
+    )
+
+    active_only = client.post(
+        "/api/import/excel", files={"file": ("catalog.xlsx", content)}
+    ).json()
+    assert [chunk["sheet"] for chunk in active_only["chunks"]] == ["春"]
+
+    data = client.post(
+        "/api/import/excel", files={"file": ("catalog.xlsx", content)}, data={"sheets": "*"}
+    ).json()
+    assert (data["imported"], data["superseded"]) == (4, 1)
+    assert [chunk["sheet"] for chunk in data["chunks"]] == ["春", "夏"]
+    assert data["warnings"] == [
+        {"row": 3, "field": "product_code", "reason": "superseded by 夏 row 2", "sheet": "春"}
+    ]
+    names = dict(seeded_db.execute(select(Product.product_code, Product.product_name)).all())
+    assert names["SKU-031"] == "夏31"
+
+    # An explicit list sets the precedence: later sheets win.
+    reordered = client.post(
+        "/api/import/excel",
+        files={"file": ("catalog.xlsx", content)},
+        data={"sheets": '["夏", "春"]'},
+    ).json()
+    assert reordered["superseded"] == 1
+    seeded_db.expire_all()
+    names = dict(seeded_db.execute(select(Product.product_code, Product.product_name)).all())
+    assert names["SKU-031"] == "春31"
+
+    missing = client.post(
+        "/api/import/excel",
+        files={"file": ("catalog.xlsx", content)},
+        data={"sheets": '["秋"]'},
+    )
+    assert missing.status_code == 400
+    assert missing.json()["detail"]["error"] == {
+        "code": "INVALID_FILE",
+        "message": "Sheet not found: 秋",
+    }
+    invalid = client.post(
+        "/api/import/excel", files={"file": ("catalog.xlsx", content)}, data={"sheets": "春"}
+    )
+    assert invalid.json()["detail"]["error"]["code"] == "INVALID_PARAM"
+
+
+def test_zip_of_workbooks_imports_members_in_name_order(client: TestClient, seeded_db):
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w") as bundle:
+        bundle.writestr("b_supplier.xlsx", _workbook_bytes([_product("SKU-040", "B40", 0.6)]))
+        bundle.writestr(
+            "a_supplier.xlsx",
+            _workbook_bytes([_product("SKU-040", "A40", 0.5), _product("SKU-041", "A41", 0.4)]),
+        )
+        bundle.writestr("readme.txt", "ignored")
+
+    data = client.post(
+        "/api/import/excel", files={"file": ("catalog.zip", archive.getvalue())}
+    ).json()
+    assert (data["imported"], data["superseded"], data["inserted"]) == (3, 1, 2)
+    assert [chunk["sheet"] for chunk in data["chunks"]] == [
+        "a_supplier.xlsx:Sheet",
+        "b_supplier.xlsx:Sheet",
+    ]
+    names = dict(seeded_db.execute(select(Product.product_code, Product.product_name)).all())
+    assert (names["SKU-040"], names["SKU-041"]) == ("B40", "A41")
+
+    empty = BytesIO()
+    with zipfile.ZipFile(empty, "w") as bundle:
+        bundle.writestr("readme.txt", "no workbooks")
+    response = client.post("/api/import/excel", files={"file": ("empty.zip", empty.getvalue())})
+    assert response.status_code == 400
+    assert response.json()["detail"]["error"]["message"] == "ZIP archive contains no Excel workbooks"
+
+
+def _chunk(sheet: str, rows: dict[int, str]) -> ProductChunk:
+    return ProductChunk(
+        index=0,
+        sheet=sheet,
+        rows=[{"product_code": code} for code in rows.values()],
+        row_numbers=list(rows),
+    )
+
+
+def test_last_seen_ranks_rows_by_request_order_not_arrival():
+    last_seen = LastSeen()
+    # The second sheet's chunk is parsed first.
+    late = last_seen.resolve(1, _chunk("夏", {2: "A", 3: "B"}))
+    assert [row["product_code"] for row in late.rows] == ["A", "B"]
+
+    early = last_seen.resolve(0, _chunk("春", {2: "A", 3: "C", 4: "C"}))
+    assert [row["product_code"] for row in early.rows] == ["C"]
+    assert early.row_numbers == [4]
+    assert (early.superseded, early.overwritten) == (2, 0)
+    assert [(w.sheet, w.row, w.reason) for w in early.warnings] == [
+        ("春", 2, "superseded by 夏 row 2"),
+        ("春", 3, "superseded by 春 row 4"),
+    ]
+
+    # A later sheet replaces a row that was already written.
+    again = last_seen.resolve(2, _chunk("秋", {2: "B"}))
+    assert [row["product_code"] for row in again.rows] == ["B"]
+    assert (again.superseded, again.overwritten) == (0, 1)
+    assert [(w.sheet, w.row, w.reason) for w in again.warnings] == [
+        ("夏", 3, "superseded by 秋 row 2")
+    ]
+
+
+def test_zip_upload_limits_are_checked_before_extracting(
+    client: TestClient, seeded_db, monkeypatch
+):
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as bundle:
+        for name in ("a.xlsx", "b.xlsx", "c.xlsx"):
+            bundle.writestr(name, _workbook_bytes([_product("SKU-050", name, 0.5)]))
+    content = archive.getvalue()
+
+    def post() -> dict:
+        response = client.post("/api/import/excel", files={"file": ("bundle.zip", content)})
+        assert response.status_code == 400
+        return response.json()["detail"]["error"]
+
+    monkeypatch.setattr(get_settings(), "import_zip_max_members", 2)
+    assert post() == {
+        "code": "INVALID_PARAM",
+        "message": "ZIP archive may contain at most 2 Excel workbooks",
+    }
+
+    monkeypatch.setattr(get_settings(), "import_zip_max_members", 3)
+    monkeypatch.setattr(get_settings(), "import_zip_max_uncompressed_bytes", 1024)
+    error = post()
+    assert error["code"] == "INVALID_PARAM"
+    assert "at most 1024 bytes" in error["message"]
+    assert seeded_db.execute(
+        select(Product).where(Product.product_code == "SKU-050")
+    ).first() is None
+
+
+def test_import_job_shares_the_sheet_aware_digest(client: TestClient, seeded_db):
+    content = _multi_sheet_bytes(
+        {"春": [_product("SKU-060", "春60", 0.5)], "夏": [_product("SKU-061", "夏61", 0.4)]}
+    )
+    synced = client.post(
+        "/api/import/excel", files={"file": ("catalog.xlsx", content)}, data={"sheets": "*"}
+    ).json()
+    assert (synced["imported"], synced["duplicate"]) == (2, False)
+
+    def submit(**data) -> dict:
+        response = client.post(
+            "/api/import/jobs", files={"file": ("catalog.xlsx", content)}, data=data
+        )
+        assert response.status_code == 202
+        return _wait_for_job(client, response.json()["job_id"])
+
+    # Same bytes, mapping and sheets: the job recognises the synchronous import.
+    again = submit(sheets="*")
+    assert again["status"] == "succeeded"
+    assert (again["result"]["duplicate"], again["result"]["imported"]) == (True, 2)
+
+    # A different sheet selection is a different import, and the job honours it.
+    summer = submit(sheets='["夏"]')
+    assert summer["result"]["duplicate"] is False
+    assert [chunk["sheet"] for chunk in summer["result"]["chunks"]] == ["夏"]
+
+
+def test_broken_parse_pool_is_replaced_on_the_next_import(client: TestClient, monkeypatch):
+    broken = ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn"))
+    with pytest.raises(BrokenProcessPool):
+        broken.submit(os._exit, 1).result()
+    monkeypatch.setattr(importer, "_parse_executor", broken)
+    content = _workbook_bytes([_product("SKU-070", "商品70", 0.5)])
+
+    response = client.post("/api/import/excel", files={"file": ("import.xlsx", content)})
+    assert response.status_code == 400
+    assert response.json()["detail"]["error"]["code"] == "INVALID_FILE"
+    assert importer._parse_executor is None
+
+    try:
+        response = client.post("/api/import/excel", files={"file": ("import.xlsx", content)})
+        assert response.status_code == 200
+        assert response.json()["inserted"] == 1
+    finally:
+        fresh = importer._parse_executor
+        if fresh is not None and fresh is not broken:
+            fresh.shutdown(wait=True)
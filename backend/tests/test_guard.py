@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from datetime import date
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app import crud
+from app.models import Product, SalesData
+
+
+def _seed_guard_data(session) -> None:
+    safe = Product(
+        product_code="G-SAFE",
+        product_name="安全",
+        unit_cost_per_kg=600,
+        unit_price_per_kg=800,
+        min_margin_rate=0.1,
+        target_margin_rate=0.2,
+    )
+    thin = Product(
+        product_code="G-THIN",
+        product_name="薄利",
+        unit_cost_per_kg=900,
+        unit_price_per_kg=950,
+        min_margin_rate=0.1,
+        target_margin_rate=0.25,
+    )
+    listed = Product(
+        product_code="G-LIST",
+        product_name="定価割れ",
+        unit_cost_per_kg=500,
+        unit_price_per_kg=520,
+        min_margin_rate=0.2,
+        target_margin_rate=0.3,
+    )
+    session.add_all([safe, thin, listed])
+    session.flush()
+    session.add_all(
+        [
+            SalesData(product_id=safe.id, sale_date=date(2025, 8, 3), quantity_kg=10,
+                      unit_price_per_kg=800, unit_cost_per_kg=600),
+            # Thin margins: 900 / 0.9 = 1000 is the min price.
+            SalesData(product_id=thin.id, sale_date=date(2025, 8, 4), quantity_kg=100,
+                      unit_price_per_kg=950, unit_cost_per_kg=900),
+            SalesData(product_id=thin.id, sale_date=date(2025, 8, 18), quantity_kg=50,
+                      unit_price_per_kg=980, unit_cost_per_kg=900),
+            SalesData(product_id=thin.id, sale_date=date(2025, 9, 1), quantity_kg=999,
+                      unit_price_per_kg=1, unit_cost_per_kg=900),
+        ]
+    )
+    session.commit()
+
+
+def test_guard_report_lists_sales_and_list_price_violations(client: TestClient, db_session):
+    _seed_guard_data(db_session)
+
+    response = client.get("/api/guard/violations", params={"from": "2025-08", "to": "2025-08"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 2
+    thin, listed = data["violations"]
+    assert thin["product_code"] == "G-THIN"
+    assert thin["sale_lines"] == 2
+    assert thin["violating_lines"] == 2
+    assert thin["violating_quantity_kg"] == 150
+    assert thin["lost_gross_profit"] == (1000 - 950) * 100 + (1000 - 980) * 50
+    assert thin["first_violation_date"] == "2025-08-04"
+    assert thin["last_violation_date"] == "2025-08-18"
+    assert thin["list_price_violation"] is True
+
+    assert listed["product_code"] == "G-LIST"
+    assert listed["sale_lines"] == 0
+    assert listed["lost_gross_profit"] == 0
+    assert listed["list_margin_rate"] == 0.0385
+
+    page = client.get(
+        "/api/guard/violations",
+        params={"from": "2025-08", "to": "2025-08", "offset": 1, "limit": 1},
+    ).json()
+    assert [v["product_code"] for v in page["violations"]] == ["G-LIST"]
+    past_end = client.get(
+        "/api/guard/violations",
+        params={"from": "2025-08", "to": "2025-08", "offset": 5},
+    ).json()
+    assert past_end["total"] == 2 and past_end["violations"] == []
+
+    target = client.get(
+        "/api/guard/violations",
+        params={"from": "2025-08", "to": "2025-08", "level": "target"},
+    ).json()
+    assert {v["product_code"] for v in target["violations"]} == {"G-THIN", "G-LIST"}
+
+
+def test_simulation_guard_uses_min_margin_rate(client: TestClient, db_session):
+    _seed_guard_data(db_session)
+    payload = {"product_name": "薄利", "unit_cost_per_kg": 900, "target_margin_rate": 0.05}
+
+    explicit = client.post(
+        "/api/price-simulations/calculate", json={**payload, "min_margin_rate": 0.1}
+    ).json()["guard"]
+    assert explicit == {
+        "min_allowed_price_per_kg": 1000,
+        "min_margin_rate": 0.1,
+        "is_below_min": True,
+        "warning_message": "最低粗利率を下回る価格です",
+    }
+
+    from_catalog = client.post(
+        "/api/price-simulations/calculate", json={**payload, "product_code": "G-THIN"}
+    ).json()["guard"]
+    assert from_catalog == explicit
+
+    batch = client.post(
+        "/api/price-simulations/batch",
+        json={"product_codes": ["G-SAFE"], "target_margin_rate": 0.05},
+    ).json()
+    assert batch["results"][0]["result"]["guard"]["is_below_min"] is True
+
+
+def test_simulation_guard_reads_min_margin_rate_from_the_cached_catalog(
+    client: TestClient, db_session
+):
+    _seed_guard_data(db_session)
+    payload = {
+        "product_code": "G-THIN",
+        "product_name": "薄利",
+        "unit_cost_per_kg": 900,
+        "target_margin_rate": 0.05,
+    }
+
+    def min_price() -> int:
+        response = client.post("/api/price-simulations/calculate", json=payload)
+        return response.json()["guard"]["min_allowed_price_per_kg"]
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        if "FROM products" in statement:  # history writes may land meanwhile
+            statements.append(statement)
+
+    event.listen(db_session.get_bind(), "before_cursor_execute", count)
+    try:
+        assert min_price() == 1000
+        assert len(statements) == 1
+        assert min_price() == 1000
+        assert len(statements) == 1  # no query once the catalog is cached
+
+        product = db_session.query(Product).filter_by(product_code="G-THIN").one()
+        product.min_margin_rate = 0.25
+        db_session.commit()
+        assert min_price() == 1200
+
+        crud.bulk_upsert_products(
+            db_session,
+            [{"product_code": "G-THIN", "product_name": "薄利", "unit_cost_per_kg": 900,
+              "min_margin_rate": 0.1}],
+        )
+        db_session.commit()
+        assert min_price() == 1000
+    finally:
+        event.remove(db_session.get_bind(), "before_cursor_execute", count)
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.history import WriteBehindBuffer, simulation_history
+from app.models import PriceSimulation
+
+
+def _row(product_code=None) -> dict:
+    return {
+        "simulation_at": datetime.utcnow(),
+        "product_code": product_code,
+        "product_name": "テスト商品",
+        "min_margin_rate": None,
+        "input_cost_per_kg": Decimal("620"),
+        "target_margin_rate": Decimal("0.2"),
+        "calculated_price_per_kg": 775,
+        "quantity_kg": None,
+        "gross_profit_total": None,
+    }
+
+
+def _wait_until(condition, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_calculate_records_history(client: TestClient, seeded_db):
+    for cost, code in ((620, "SKU-001"), (500, None), (640, "SKU-001")):
+        response = client.post(
+            "/api/price-simulations/calculate",
+            json={
+                "product_name": "テスト商品",
+                "product_code": code,
+                "unit_cost_per_kg": cost,
+                "target_margin_rate": 0.2,
+            },
+        )
+        assert response.status_code == 200
+    assert simulation_history.flush(timeout=5)
+
+    everything = client.get("/api/price-simulations/history").json()
+    assert [item["input_cost_per_kg"] for item in everything["items"]] == [640, 500, 620]
+    assert everything["items"][0]["calculated_price_per_kg"] == 800
+    assert everything["next_cursor"] is None
+
+    first = client.get(
+        "/api/price-simulations/history", params={"product_code": "SKU-001", "limit": 1}
+    ).json()
+    assert [item["input_cost_per_kg"] for item in first["items"]] == [640]
+    second = client.get(
+        "/api/price-simulations/history",
+        params={"product_code": "SKU-001", "limit": 1, "cursor": first["next_cursor"]},
+    ).json()
+    assert [item["input_cost_per_kg"] for item in second["items"]] == [620]
+    assert second["items"][0]["product_code"] == "SKU-001"
+
+    invalid = client.get("/api/price-simulations/history", params={"cursor": "%%%"})
+    assert invalid.status_code == 400
+
+
+def test_buffer_flushes_on_size_and_age(db_session):
+    factory = sessionmaker(bind=db_session.get_bind(), future=True)
+    buffer = WriteBehindBuffer(max_queue=100, batch_size=2, flush_seconds=0.05)
+    try:
+        buffer.record(_row(), factory)
+        buffer.record(_row(), factory)
+        _wait_until(lambda: buffer.written == 2)
+        buffer.record(_row(), factory)
+        # Below the batch size: written once the row is flush_seconds old.
+        _wait_until(lambda: buffer.written == 3)
+    finally:
+        buffer.stop()
+    count = db_session.execute(select(func.count()).select_from(PriceSimulation)).scalar_one()
+    assert count == 3
+
+
+def test_buffer_drops_and_backpressures_when_full(db_session):
+    gate = threading.Event()
+    factory = sessionmaker(bind=db_session.get_bind(), future=True)
+
+    def slow_factory():
+        gate.wait(5)
+        return factory()
+
+    buffer = WriteBehindBuffer(
+        max_queue=1, batch_size=1, flush_seconds=60, overflow="block", block_seconds=0.01
+    )
+    try:
+        assert buffer.record(_row(), slow_factory)
+        _wait_until(lambda: buffer.queue_depth == 0)  # the writer holds row 1
+        assert buffer.record(_row(), slow_factory)  # row 2 fills the queue
+        assert not buffer.record(_row(), slow_factory)  # waited, then dropped
+        stats = buffer.stats()
+        assert stats["backpressure_waits"] == 1
+        assert stats["backpressure_seconds"] > 0
+        assert stats["dropped"] == 1
+
+        buffer.overflow = "drop"
+        assert not buffer.record(_row(), slow_factory)
+        assert buffer.stats()["backpressure_waits"] == 1
+        assert buffer.stats()["dropped"] == 2
+
+        gate.set()
+        assert buffer.flush(timeout=5)
+        assert buffer.stats()["written"] == 2
+    finally:
+        gate.set()
+        buffer.stop()
+
+
+def test_history_metrics_are_exported(client: TestClient):
+    text = client.get("/metrics").text
+    assert 'pricing_write_behind_dropped_total{buffer="price_simulations"}' in text
+    assert 'pricing_write_behind_queue_depth{buffer="price_simulations"}' in text
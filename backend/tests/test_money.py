@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from decimal import Decimal
+from fractions import Fraction
+
+import pytest
+
+from app.main import _build_break_even
+from app.money import RATE_SCALE, YEN_SCALE, div_half_up, to_scaled
+from app.utils import (
+    _simulate_price_decimal,
+    _simulate_price_fixed,
+    generate_price_patterns,
+    round_jpy,
+    round_rate,
+)
+
+hypothesis = pytest.importorskip("hypothesis")
+from hypothesis import example, given, settings, strategies as st  # noqa: E402
+
+YEN = st.decimals(min_value=Decimal("0.001"), max_value=Decimal("10000000"), places=3)
+RATE = st.decimals(min_value=Decimal("0"), max_value=Decimal("0.9999"), places=4)
+QUANTITY = st.decimals(min_value=Decimal("0"), max_value=Decimal("1000000"), places=3)
+# monthly_sales_rollup sums quantity × price, so revenue carries 6 decimals.
+AMOUNT = st.decimals(min_value=Decimal("-1000000"), max_value=Decimal("10000000000"), places=6)
+
+
+def _as(kind, value):
+    return float(value) if kind is float and value is not None else value
+
+
+def _decimal_break_even(fixed_cost_total, revenue, variable_cost):
+    """The Decimal implementation ``_build_break_even`` used before ``money``."""
+    variable_cost_rate = round_rate(variable_cost / revenue) if revenue > 0 else Decimal("0")
+    raw = Decimal("1") - (variable_cost / revenue if revenue > 0 else Decimal("0"))
+    gross_margin_rate = round_rate(raw) if raw > 0 else Decimal("0")
+    if raw <= 0:
+        break_even, achievement, delta = None, Decimal("0"), -fixed_cost_total
+    else:
+        break_even = fixed_cost_total / raw
+        achievement = revenue / break_even if break_even > 0 else Decimal("0")
+        delta = revenue - break_even
+    return {
+        "fixed_costs": round_jpy(fixed_cost_total),
+        "current_revenue": round_jpy(revenue),
+        "variable_cost_rate": float(variable_cost_rate),
+        "gross_margin_rate": float(gross_margin_rate),
+        "break_even_revenue": round_jpy(break_even) if break_even is not None else 0,
+        "achievement_rate": float(round_rate(achievement)) if achievement > 0 else 0.0,
+        "delta_revenue": round_jpy(delta),
+    }
+
+
+def _exact_status(fixed_cost_total, revenue, variable_cost):
+    fixed, sales, variable = map(Fraction, (fixed_cost_total, revenue, variable_cost))
+    margin = 1 - variable / sales if sales > 0 else Fraction(1)
+    if margin <= 0 or fixed <= 0:
+        return "danger"
+    achievement = sales * margin / fixed
+    return "safe" if achievement >= 1 else "warning" if achievement >= Fraction(4, 5) else "danger"
+
+
+def test_to_scaled_is_exact_or_none():
+    assert to_scaled(620.5, YEN_SCALE) == 620_500
+    assert to_scaled(0.285, YEN_SCALE) == 285  # 0.285 * 1000 == 284.99999999999997
+    assert to_scaled(0.2, RATE_SCALE) == 2000
+    assert to_scaled(Decimal("0.2000"), RATE_SCALE) == 2000
+    assert to_scaled(12, YEN_SCALE) == 12_000
+    assert to_scaled(620.1234, YEN_SCALE) is None
+    assert to_scaled(Decimal("1.0005"), YEN_SCALE) is None
+    assert to_scaled(float("nan"), YEN_SCALE) is None
+    assert to_scaled(float("inf"), YEN_SCALE) is None
+    assert to_scaled(Decimal("Infinity"), YEN_SCALE) is None
+
+
+def test_div_half_up_rounds_away_from_zero():
+    assert [div_half_up(n, 2) for n in (-3, -1, 1, 3)] == [-2, -1, 1, 2]
+    assert div_half_up(5, 10) == 1
+    assert div_half_up(4, 10) == 0
+    assert div_half_up(-5, 10) == -1
+    assert div_half_up(7, -2) == -4
+
+
+@settings(max_examples=500, deadline=None)
+@given(
+    cost=YEN,
+    rate=RATE,
+    quantity=st.none() | QUANTITY,
+    min_rate=st.none() | RATE,
+    ladder=st.none() | st.lists(RATE, min_size=1, max_size=6),
+    kind=st.sampled_from([float, Decimal]),
+)
+@example(
+    cost=Decimal("620"), rate=Decimal("0.3"), quantity=None, min_rate=None, ladder=None, kind=float
+)
+@example(  # Decimal flags this price although it earns exactly the minimum margin.
+    cost=Decimal("1000"),
+    rate=Decimal("0.7"),
+    quantity=Decimal("1"),
+    min_rate=Decimal("0.7"),
+    ladder=None,
+    kind=Decimal,
+)
+def test_fixed_simulation_matches_decimal(cost, rate, quantity, min_rate, ladder, kind):
+    args = (_as(kind, cost), _as(kind, rate), _as(kind, quantity), ladder, _as(kind, min_rate))
+    fixed = _simulate_price_fixed(*args)
+    assert fixed is not None
+    reference = _simulate_price_decimal(*args)
+
+    # Decimal rounds cost / (1 - rate) to 28 digits before comparing, so at
+    # rate == min_rate it can flag a price that sits exactly on the floor.
+    if min_rate is not None:
+        assert fixed["guard"]["is_below_min"] is (rate < min_rate)
+        for result in (fixed, reference):
+            result["guard"].pop("is_below_min")
+            result["guard"].pop("warning_message")
+    assert fixed == reference
+
+
+@settings(max_examples=200, deadline=None)
+@given(cost=YEN, ladder=st.none() | st.lists(RATE, min_size=1, max_size=6))
+def test_fixed_price_patterns_match_decimal(cost, ladder):
+    fixed = list(generate_price_patterns(float(cost), ladder))
+    divisors = ladder or [Decimal(rate) for rate in ("0.10", "0.15", "0.20", "0.25", "0.30")]
+    reference = [
+        (rate, round_jpy(cost / (1 - rate)), round_jpy(cost / (1 - rate) - cost))
+        for rate in divisors
+    ]
+    assert [row[1:] for row in fixed] == [row[1:] for row in reference]
+
+
+def test_inexact_inputs_fall_back_to_decimal():
+    assert _simulate_price_fixed(620.12345, 0.2, None, None, None) is None
+    assert _simulate_price_fixed(620, 0.12345, None, None, None) is None
+    assert round_jpy(0.0005) == 0
+    assert round_jpy(2.5) == 3
+    assert round_jpy(-2.5) == -3
+    assert round_jpy(1234.56789) == 1235
+
+
+@settings(max_examples=500, deadline=None)
+@given(fixed_cost=AMOUNT, revenue=AMOUNT, variable_cost=AMOUNT)
+@example(fixed_cost=Decimal("38277000"), revenue=Decimal("0"), variable_cost=Decimal("0"))
+@example(fixed_cost=Decimal("700"), revenue=Decimal("1000"), variable_cost=Decimal("300"))
+def test_fixed_break_even_matches_decimal(fixed_cost, revenue, variable_cost):
+    result = _build_break_even("2025-08", fixed_cost, revenue, variable_cost).dict()
+    assert result.pop("status") == _exact_status(fixed_cost, revenue, variable_cost)
+    result.pop("year_month")
+    assert result == _decimal_break_even(fixed_cost, revenue, variable_cost)
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from app.observability import registry, span
+from app.profiling import SamplingProfiler
+
+
+def test_request_metrics_count_queries_per_endpoint(client, seeded_db):
+    registry.reset()
+
+    response = client.get("/api/break-even/current", params={"year_month": "2025-08"})
+    assert response.status_code == 200
+
+    key = ("GET", "/api/break-even/current")
+    assert registry.request_seconds[key].count == 1
+    # Rollup totals are one statement; the DB time is attributed to the request.
+    assert registry.request_queries[key].sum == 1
+    assert registry.request_db_seconds[key].sum > 0
+    assert registry.responses[("GET", "/api/break-even/current", "200")] == 1
+
+
+def test_prometheus_endpoint_exposes_requests_spans_and_pool(client):
+    registry.reset()
+    with span("import.parse"):
+        pass
+    client.post(
+        "/api/price-simulations/calculate",
+        json={"product_name": "テスト", "unit_cost_per_kg": 620, "target_margin_rate": 0.25},
+    )
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert (
+        'pricing_request_duration_seconds_count{method="POST",'
+        'route="/api/price-simulations/calculate"} 1'
+    ) in body
+    assert 'pricing_span_duration_seconds_count{span="import.parse"} 1' in body
+    assert 'pricing_span_duration_seconds_count{span="pricing.simulate"} 1' in body
+    assert 'pricing_db_pool_checked_out{pool="sync"}' in body
+    assert 'pricing_request_duration_seconds_bucket{method="POST",' in body
+
+
+def _busy_wait(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_sampling_profiler_dumps_collapsed_stacks_for_slow_requests(tmp_path):
+    profiler = SamplingProfiler(interval_ms=1, slow_request_ms=20, output_dir=str(tmp_path))
+    writers = []
+    write = profiler._write
+
+    def record_writer(*args):
+        writers.append(threading.current_thread().name)
+        write(*args)
+
+    profiler._write = record_writer
+    profiler.start()
+    try:
+        started = time.perf_counter()
+        _busy_wait(0.1)
+        elapsed = time.perf_counter() - started
+        assert profiler.request_finished("GET", "/fast", started, 0.001) is None
+        path = profiler.request_finished("GET", "/api/slow/{id}", started, elapsed)
+    finally:
+        profiler.stop()
+
+    assert path is not None and path.name.endswith(".folded")
+    assert [name.split("_")[0] for name in writers] == ["pricing-profiler-writer"]
+    assert profiler.profiles_written == 1
+    assert "get-api_slow_id" in path.name
+    lines = path.read_text().splitlines()
+    assert any("_busy_wait" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app import crud
+from app.models import ProductPricePattern
+from app.utils import generate_price_patterns
+
+
+def _stored_patterns(session, product_id):
+    rows = session.execute(
+        select(ProductPricePattern)
+        .where(ProductPricePattern.product_id == product_id)
+        .order_by(ProductPricePattern.margin_rate)
+    ).scalars()
+    return [(float(row.margin_rate), row.price_per_kg) for row in rows]
+
+
+def test_generate_price_patterns_accepts_a_ladder():
+    assert list(generate_price_patterns(Decimal("600"), [Decimal("0.4"), Decimal("0.5")])) == [
+        (Decimal("0.4"), 1000, 400),
+        (Decimal("0.5"), 1200, 600),
+    ]
+    assert len(list(generate_price_patterns(600))) == 5
+
+
+def test_upsert_product_refreshes_patterns_on_cost_change(db_session):
+    product = crud.upsert_product(
+        db_session,
+        {"product_code": "PP-1", "product_name": "商品", "unit_cost_per_kg": Decimal("600")},
+    )
+    db_session.commit()
+    assert _stored_patterns(db_session, product.id)[0] == (0.1, 667)
+
+    crud.upsert_product(
+        db_session, {"product_code": "PP-1", "product_name": "商品", "unit_cost_per_kg": 900}
+    )
+    db_session.commit()
+    assert _stored_patterns(db_session, product.id)[0] == (0.1, 1000)
+
+
+def test_margin_ladder_drives_stored_and_batch_patterns(client: TestClient, seeded_db):
+    response = client.put("/api/margin-ladders/青果", json={"margin_rates": [0.35, 0.2]})
+    assert response.status_code == 200
+    assert response.json() == {
+        "category": "青果",
+        "margin_rates": [0.2, 0.35],
+        "products_refreshed": 1,
+    }
+
+    patterns = client.get("/api/price-patterns", params={"product_codes": ["SKU-001"]}).json()
+    assert patterns["products"][0]["price_patterns"] == [
+        {"margin_rate": 0.2, "price_per_kg": 775, "profit_per_kg": 155},
+        {"margin_rate": 0.35, "price_per_kg": 954, "profit_per_kg": 334},
+    ]
+
+    batch = client.post(
+        "/api/price-simulations/batch", json={"product_codes": ["SKU-001"]}
+    ).json()
+    assert [p["margin_rate"] for p in batch["results"][0]["result"]["price_patterns"]] == [
+        0.2,
+        0.35,
+    ]
+
+    ladders = client.get("/api/margin-ladders").json()
+    assert ladders["default"] == [0.1, 0.15, 0.2, 0.25, 0.3]
+    assert ladders["ladders"] == [
+        {"category": "青果", "margin_rates": [0.2, 0.35], "products_refreshed": None}
+    ]
+
+    # Resetting the ladder restores the default patterns.
+    client.put("/api/margin-ladders/青果", json={"margin_rates": []})
+    patterns = client.get("/api/price-patterns", params={"product_codes": ["SKU-001"]}).json()
+    assert len(patterns["products"][0]["price_patterns"]) == 5
+
+
+def test_bulk_import_refreshes_only_changed_products(db_session):
+    def rows(first_cost, second_name):
+        return [
+            {"product_code": "BK-1", "product_name": "A", "category": None,
+             "unit_cost_per_kg": first_cost},
+            {"product_code": "BK-2", "product_name": second_name, "category": None,
+             "unit_cost_per_kg": 300},
+        ]
+
+    def second_stamp():
+        return db_session.execute(
+            select(ProductPricePattern.updated_at).where(
+                ProductPricePattern.product_id == ids["BK-2"]
+            )
+        ).scalars().first()
+
+    crud.bulk_upsert_products(db_session, rows(600, "B"))
+    db_session.commit()
+    products = crud.get_products_by_codes(db_session, ["BK-1", "BK-2"])
+    ids = {code: product.id for code, product in products.items()}
+    stamp = second_stamp()
+
+    # Only BK-1's cost changes; BK-2's rename must not rewrite its patterns.
+    crud.bulk_upsert_products(db_session, rows(900, "B2"))
+    db_session.commit()
+    assert _stored_patterns(db_session, ids["BK-1"])[0] == (0.1, 1000)
+    assert second_stamp() == stamp
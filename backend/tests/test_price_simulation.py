@@ -6,6 +6,8 @@ from io import BytesIO
 from fastapi.testclient import TestClient
 from openpyxl import Workbook
 
+from app import crud
+from app.config import get_settings
 from app.utils import round_jpy
 
 
@@ -69,3 +71,67 @@ def test_excel_import(client: TestClient, seeded_db):
     assert data["imported"] == 1
     assert data["skipped"] == 1
     assert len(data["warnings"]) == 1
+
+
+def test_price_simulation_batch_matches_single(client: TestClient, seeded_db):
+    items = [
+        {"product_name": "A", "unit_cost_per_kg": 620, "target_margin_rate": 0.2, "quantity_kg": 1000},
+        {"product_name": "B", "unit_cost_per_kg": 333.335, "target_margin_rate": 0.175},
+        {"product_name": "C", "unit_cost_per_kg": 0.005, "target_margin_rate": 0.3333, "quantity_kg": 12.5},
+    ]
+    response = client.post(
+        "/api/price-simulations/batch",
+        json={
+            "items": items + [{"product_name": "bad", "unit_cost_per_kg": -1, "target_margin_rate": 0.2}],
+            "product_codes": ["SKU-001", "SKU-404"],
+        },
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["succeeded"] == 4
+    assert data["failed"] == 2
+
+    results = data["results"]
+    for item, result in zip(items, results):
+        single = client.post("/api/price-simulations/calculate", json=item).json()
+        assert result["result"] == single
+    assert results[3]["error"]["code"] == "INVALID_PARAM"
+    assert results[4]["product_code"] == "SKU-001"
+    assert results[4]["result"]["recommended_price_per_kg"] == 775
+    assert results[5]["error"]["code"] == "NOT_FOUND"
+
+
+def test_price_simulation_batch_rejects_bad_items_one_by_one(client: TestClient, seeded_db):
+    response = client.post(
+        "/api/price-simulations/batch",
+        json={
+            "items": ["SKU-001", {"product_code": {"x": 1}, "unit_cost_per_kg": 620}],
+            "product_codes": ["SKU-001"],
+        },
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["succeeded"], data["failed"]) == (1, 2)
+    assert data["results"][0]["error"] == {
+        "code": "INVALID_PARAM",
+        "message": "item must be an object",
+    }
+    assert data["results"][1]["error"]["code"] == "INVALID_PARAM"
+    assert data["results"][2]["result"]["recommended_price_per_kg"] == 775
+
+
+def test_price_simulation_batch_limit_is_checked_before_lookups(
+    client: TestClient, monkeypatch
+):
+    monkeypatch.setattr(get_settings(), "price_simulation_batch_limit", 2)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("oversized batch reached the database")
+
+    monkeypatch.setattr(crud, "get_products_by_codes", fail)
+    response = client.post(
+        "/api/price-simulations/batch",
+        json={"items": [{}], "product_codes": ["SKU-001", "SKU-002"]},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"]["error"]["code"] == "INVALID_PARAM"
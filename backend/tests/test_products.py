@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+
+from app import crud
+
+
+def _seed_catalog(session, count: int = 12) -> None:
+    crud.bulk_upsert_products(
+        session,
+        [
+            {
+                "product_code": f"CAT-{index:03d}",
+                "product_name": f"{'トマト' if index % 3 == 0 else 'きゅうり'} 100%_{index}",
+                "category": "青果" if index % 2 == 0 else "精肉",
+                "unit_cost_per_kg": 500 + index,
+                "unit_price_per_kg": 700 + index,
+                "target_margin_rate": round(0.1 + index * 0.01, 4),
+                "min_margin_rate": None,
+                "unit": "JPY/kg",
+            }
+            for index in range(count)
+        ],
+    )
+    session.commit()
+
+
+def test_products_keyset_pagination_walks_the_catalog(client: TestClient, db_session):
+    _seed_catalog(db_session)
+    codes = []
+    cursor = None
+    pages = 0
+    while True:
+        params = {"limit": 5, **({"cursor": cursor} if cursor else {})}
+        data = client.get("/api/products", params=params).json()
+        codes += [item["product_code"] for item in data["items"]]
+        pages += 1
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert pages == 3
+    assert codes == [f"CAT-{index:03d}" for index in range(12)]
+
+    assert client.get("/api/products", params={"cursor": "%%%"}).status_code == 400
+
+
+def test_products_filters_and_search(client: TestClient, db_session):
+    _seed_catalog(db_session)
+
+    data = client.get(
+        "/api/products",
+        params={"category": "青果", "min_margin_rate": 0.14, "max_margin_rate": 0.2},
+    ).json()
+    assert [item["product_code"] for item in data["items"]] == [
+        "CAT-004", "CAT-006", "CAT-008", "CAT-010",
+    ]
+
+    data = client.get("/api/products", params={"q": "トマト", "match": "prefix"}).json()
+    assert [item["product_code"] for item in data["items"]] == [
+        "CAT-000", "CAT-003", "CAT-006", "CAT-009",
+    ]
+    # LIKE wildcards in the query are matched literally.
+    data = client.get("/api/products", params={"q": "100%_1"}).json()
+    assert [item["product_code"] for item in data["items"]] == ["CAT-001", "CAT-010", "CAT-011"]
+
+    data = client.get("/api/products", params={"limit": 1, "include_patterns": True}).json()
+    assert data["items"][0]["price_patterns"][0] == {
+        "margin_rate": 0.1,
+        "price_per_kg": 556,
+        "profit_per_kg": 56,
+    }
+
+
+def test_products_etag_revalidation(client: TestClient, db_session):
+    _seed_catalog(db_session, count=3)
+    first = client.get("/api/products")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache"
+
+    cached = client.get("/api/products", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    crud.upsert_product(
+        db_session, {"product_code": "CAT-001", "product_name": "改名", "unit_cost_per_kg": 900}
+    )
+    db_session.commit()
+    changed = client.get("/api/products", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["items"][1]["product_name"] == "改名"
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import gzip
+import json
+from datetime import date
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+from app import compression, crud
+from app.responses import dumps
+from app.schemas import ExcelImportResponse, ExcelImportWarning, GuardViolation
+
+
+def test_fast_json_matches_default_encoding():
+    violation = GuardViolation(
+        product_id="p-1",
+        product_code="SKU-001",
+        product_name="テスト商品",
+        category=None,
+        min_margin_rate=0.1,
+        target_margin_rate=None,
+        unit_price_per_kg=640.5,
+        list_margin_rate=None,
+        list_price_violation=True,
+        sale_lines=3,
+        violating_lines=2,
+        violating_quantity_kg=12.5,
+        lost_gross_profit=1234,
+        first_violation_date=date(2025, 8, 5),
+        last_violation_date=date(2025, 8, 20),
+        worst_margin_rate=0.03,
+    )
+    response = ExcelImportResponse(
+        imported=1,
+        skipped=1,
+        warnings=[ExcelImportWarning(row=7, field="原価", reason="non-numeric")],
+    )
+    for model in (violation, response):
+        assert json.loads(dumps(model)) == jsonable_encoder(model)
+
+
+def test_choose_encoding_prefers_brotli_and_honours_q_zero():
+    assert compression.choose_encoding("gzip, deflate, br") == (
+        "br" if compression.brotli is not None else "gzip"
+    )
+    assert compression.choose_encoding("gzip, br;q=0") == "gzip"
+    assert compression.choose_encoding("identity") is None
+    assert compression.choose_encoding("") is None
+
+
+def test_large_responses_are_compressed(client: TestClient, seeded_db):
+    params = {"from": "2024-01", "to": "2025-12"}
+    plain = client.get(
+        "/api/break-even/series", params=params, headers={"Accept-Encoding": "identity"}
+    )
+    assert plain.status_code == 200
+    assert "content-encoding" not in plain.headers
+    assert len(plain.content) >= 1024
+
+    compressed = client.get(
+        "/api/break-even/series", params=params, headers={"Accept-Encoding": "gzip"}
+    )
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["vary"]
+    assert int(compressed.headers["content-length"]) < len(plain.content)
+    assert compressed.json() == plain.json()
+
+    small = client.get("/api/cache/stats", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+
+def test_streamed_catalog_is_compressed_with_a_weak_etag(client: TestClient, db_session):
+    crud.bulk_upsert_products(
+        db_session,
+        [
+            {"product_code": f"SKU-{index:03d}", "product_name": f"商品{index}", "unit": "JPY/kg"}
+            for index in range(30)
+        ],
+    )
+    db_session.commit()
+
+    response = client.get("/api/products", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert len(response.json()["items"]) == 30
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+
+    cached = client.get(
+        "/api/products", headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+    )
+    assert cached.status_code == 304
+
+
+@pytest.mark.skipif(compression.brotli is None, reason="brotli is not installed")
+def test_brotli_round_trip():
+    encoder = compression._Encoder("br", 6, 4)
+    payload = b'{"warnings":[' + b'{"row":1},' * 500 + b"]}"
+    body = encoder.chunk(payload[:100]) + encoder.finish(payload[100:])
+    assert compression.brotli.decompress(body) == payload
+
+
+def test_gzip_stream_round_trip():
+    encoder = compression._Encoder("gzip", 6, 4)
+    payload = b"x" * 5000
+    body = encoder.chunk(payload[:2000]) + encoder.chunk(payload[2000:]) + encoder.finish()
+    assert gzip.decompress(body) == payload
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+from datetime import date
+from io import BytesIO
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from app.config import get_settings
+from app.models import MonthlySalesRollup, SalesData
+
+CSV_CONTENT = (
+    "\ufeffsale_date,product_code,quantity_kg,unit_price_per_kg,unit_cost_per_kg\n"
+    "2025-08-25,SKU-001,200,800,620\n"
+    "2025/09/01,SKU-001,100,810,630\n"
+    "2025-09-02,,50,500,400\n"
+    "not-a-date,SKU-001,1,1,1\n"
+    "2025-09-03,SKU-999,1,1,1\n"
+    "2025-09-04,SKU-001,abc,1,1\n"
+).encode("utf-8")
+
+
+def test_sales_csv_import_updates_rollup_and_cache(client: TestClient, seeded_db, monkeypatch):
+    monkeypatch.setattr(get_settings(), "sales_import_chunk_size", 2)
+    before = client.get("/api/break-even/current", params={"year_month": "2025-08"}).json()
+
+    response = client.post(
+        "/api/import/sales", files={"file": ("pos.csv", CSV_CONTENT, "text/csv")}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["imported"] == 3
+    assert data["skipped"] == 3
+    assert data["rows_processed"] == 6
+    assert data["months"] == ["2025-08", "2025-09"]
+    assert data["rows_per_second"] > 0
+    assert [(w["row"], w["field"], w["reason"]) for w in data["warnings"]] == [
+        (5, "sale_date", "missing or invalid date"),
+        (6, "product_code", "unknown product_code"),
+        (7, "quantity_kg", "non-numeric"),
+    ]
+
+    assert seeded_db.execute(select(func.count()).select_from(SalesData)).scalar_one() == 5
+    september = seeded_db.execute(
+        select(func.sum(MonthlySalesRollup.revenue)).where(
+            MonthlySalesRollup.year_month == date(2025, 9, 1)
+        )
+    ).scalar_one()
+    assert float(september) == 100 * 810 + 50 * 500
+
+    # The August response was cached before the import and must be recomputed.
+    after = client.get("/api/break-even/current", params={"year_month": "2025-08"}).json()
+    assert after["current_revenue"] == before["current_revenue"] + 200 * 800
+
+
+def test_sales_parquet_import(client: TestClient, seeded_db):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pa.table(
+        {
+            "sale_date": [date(2025, 8, 26), date(2025, 8, 27)],
+            "product_code": ["SKU-001", None],
+            "quantity_kg": [10.0, 20.0],
+            "unit_price_per_kg": [800.0, 500.0],
+            "unit_cost_per_kg": [620.0, None],
+        }
+    )
+    buffer = BytesIO()
+    pq.write_table(table, buffer)
+
+    response = client.post(
+        "/api/import/sales",
+        files={"file": ("pos.parquet", buffer.getvalue(), "application/octet-stream")},
+    )
+    assert response.status_code == 200
+    assert response.json()["imported"] == 2
+    assert seeded_db.execute(select(func.count()).select_from(SalesData)).scalar_one() == 4
+
+
+def test_sales_import_rejects_unreadable_files(client: TestClient, seeded_db):
+    response = client.post(
+        "/api/import/sales",
+        files={"file": ("pos.csv", b"date,code\n2025-08-01,SKU-001\n", "text/csv")},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"]["error"]["code"] == "INVALID_FILE"
+
+    response = client.post(
+        "/api/import/sales", files={"file": ("pos.xlsx", b"", "application/octet-stream")}
+    )
+    assert response.status_code == 400
+
+
+def test_sales_parquet_import_validates_columns(client: TestClient, seeded_db):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pa.table(
+        {
+            "sale_date": [
+                "2025-08-26", "2025/09/01", "not-a-date", "2025-09-03", "2025-09-04", ""
+            ],
+            "product_code": [" SKU-001", None, "SKU-001", "SKU-999", "SKU-001", "SKU-001"],
+            "quantity_kg": ["1,200", "20", "1", "1", "abc", "1"],
+            "unit_price_per_kg": ["800", "500", "1", "1", "x", "1"],
+            "unit_cost_per_kg": ["620", "", "1", "1", "1", "1"],
+        }
+    )
+    buffer = BytesIO()
+    pq.write_table(table, buffer)
+
+    response = client.post(
+        "/api/import/sales",
+        files={"file": ("pos.parquet", buffer.getvalue(), "application/octet-stream")},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["imported"] == 2
+    assert data["months"] == ["2025-08", "2025-09"]
+    assert [(w["row"], w["field"], w["reason"]) for w in data["warnings"]] == [
+        (3, "sale_date", "missing or invalid date"),
+        (4, "product_code", "unknown product_code"),
+        (5, "quantity_kg", "non-numeric"),
+        (6, "sale_date", "missing or invalid date"),
+    ]
+    rows = seeded_db.execute(
+        select(SalesData.sale_date, SalesData.product_id, SalesData.quantity_kg)
+        .where(SalesData.sale_date >= date(2025, 8, 26))
+        .order_by(SalesData.sale_date)
+    ).all()
+    assert [(row.sale_date, row.product_id is None, float(row.quantity_kg)) for row in rows] == [
+        (date(2025, 8, 26), False, 1200.0),
+        (date(2025, 9, 1), True, 20.0),
+    ]
+
+
+def test_sales_parquet_import_rejects_corrupt_pages(client: TestClient, seeded_db):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pa.table({"sale_date": [date(2025, 8, 26)] * 100, "quantity_kg": [1.0] * 100})
+    buffer = BytesIO()
+    pq.write_table(table, buffer)
+    content = bytearray(buffer.getvalue())
+    # The footer still parses, so the damage only shows once the first page is decoded.
+    content[4:44] = bytes(byte ^ 0xFF for byte in content[4:44])
+
+    response = client.post(
+        "/api/import/sales",
+        files={"file": ("pos.parquet", bytes(content), "application/octet-stream")},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"]["error"]["code"] == "INVALID_FILE"
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from decimal import Decimal
+from itertools import product
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import _build_break_even
+from app.sensitivity import MixTotals, evaluate_grid
+
+pytest.importorskip("numpy")
+
+CHANGES = [-0.1, -0.05, 0, 0.05, 0.1]
+
+
+def _post(client: TestClient, **payload):
+    return client.post("/api/break-even/sensitivity", json={"year_month": "2025-08", **payload})
+
+
+def test_zero_scenario_matches_current_break_even(client: TestClient, seeded_db):
+    current = client.get("/api/break-even/current", params={"year_month": "2025-08"}).json()
+    data = _post(client).json()
+
+    assert data["shape"] == [1, 1, 1]
+    assert data["base"] == current
+    for column in (
+        "fixed_costs",
+        "current_revenue",
+        "variable_cost_rate",
+        "gross_margin_rate",
+        "break_even_revenue",
+        "achievement_rate",
+        "delta_revenue",
+        "status",
+    ):
+        assert data[column] == [current[column]], column
+
+
+def test_grid_rounding_matches_decimal_path():
+    totals = MixTotals(
+        fixed_cost_total=Decimal("38277000"),
+        revenue=Decimal("1170000"),
+        variable_cost=Decimal("930000"),
+        other_revenue=Decimal("333333.333"),
+        other_variable_cost=Decimal("250000.5"),
+    )
+    columns = evaluate_grid(totals, CHANGES, CHANGES, CHANGES)
+    assert len(columns["status"]) == len(CHANGES) ** 3
+
+    for index, (fixed, cost, price) in enumerate(product(CHANGES, CHANGES, CHANGES)):
+        expected = _build_break_even(
+            "2025-08",
+            totals.fixed_cost_total * (1 + Decimal(str(fixed))),
+            totals.other_revenue + totals.revenue * (1 + Decimal(str(price))),
+            totals.other_variable_cost + totals.variable_cost * (1 + Decimal(str(cost))),
+        )
+        for column, values in columns.items():
+            assert values[index] == getattr(expected, column), (column, fixed, cost, price)
+
+
+def test_changes_only_touch_selected_categories(client: TestClient, seeded_db):
+    everything = _post(client, price_changes=[0, 0.1]).json()
+    assert everything["current_revenue"][1] > everything["current_revenue"][0]
+
+    other = _post(client, price_changes=[0, 0.1], categories=["精肉"]).json()
+    assert other["current_revenue"][0] == other["current_revenue"][1]
+
+    fixed = _post(client, fixed_cost_changes=[0, 0.1]).json()
+    assert fixed["fixed_costs"][1] == round(fixed["fixed_costs"][0] * 1.1)
+
+
+def test_grid_size_is_capped(client: TestClient, seeded_db, monkeypatch):
+    monkeypatch.setattr(get_settings(), "break_even_sensitivity_max_points", 100)
+    response = _post(
+        client, fixed_cost_changes=CHANGES, unit_cost_changes=CHANGES, price_changes=CHANGES
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"]["error"]["code"] == "INVALID_PARAM"
+
+    assert _post(client, price_changes=CHANGES * 20).status_code == 200
+    assert _post(client, price_changes=[]).status_code == 400
+    assert _post(client, price_changes=[-1]).status_code == 422
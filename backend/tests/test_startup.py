@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.migrate import create_schema
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+# Loaded on demand by the endpoints that need them, never while booting a worker.
+HEAVY_MODULES = {
+    "openpyxl",
+    "pyarrow",
+    "numpy",
+    "pandas",
+    "psycopg2",
+    "asyncpg",
+    "aiosqlite",
+    "sqlite3",
+}
+
+
+def _python(tmp_path: Path, *args: str, **env: str) -> subprocess.CompletedProcess:
+    environment = {
+        **os.environ,
+        "PRICING_DATABASE_URL": f"sqlite:///{tmp_path / 'boot.db'}",
+        **env,
+    }
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=BACKEND_DIR,
+        env=environment,
+        capture_output=True,
+        text=True,
+        timeout=60,
+        check=True,
+    )
+
+
+def test_importing_the_app_stays_off_the_database_and_heavy_modules(tmp_path):
+    result = _python(tmp_path, "-X", "importtime", "-c", "import app.main")
+    imported = {
+        line.rsplit("|", 1)[1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and "|" in line
+    }
+    assert "app.main" in imported
+    assert {name.split(".")[0] for name in imported} & HEAVY_MODULES == set()
+    assert not (tmp_path / "boot.db").exists()
+
+
+@pytest.mark.parametrize("create_schema_on_startup", ["true", "false"])
+def test_lifespan_creates_the_schema_unless_disabled(tmp_path, create_schema_on_startup):
+    script = (
+        "from fastapi.testclient import TestClient\n"
+        "from sqlalchemy import inspect\n"
+        "from app.database import get_engine\n"
+        "from app.main import app\n"
+        "with TestClient(app):\n"
+        "    print(sorted(inspect(get_engine()).get_table_names()))\n"
+    )
+    result = _python(
+        tmp_path, "-c", script, PRICING_CREATE_SCHEMA_ON_STARTUP=create_schema_on_startup
+    )
+    tables = result.stdout.strip()
+    if create_schema_on_startup == "true":
+        assert "'products'" in tables and "'sales_data'" in tables
+    else:
+        assert tables == "[]"
+
+
+def test_create_schema_reports_only_new_tables(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrate.db'}", future=True)
+    try:
+        created = create_schema(engine)
+        assert {"products", "sales_data", "price_simulations"} <= set(created)
+        assert create_schema(engine) == []
+    finally:
+        engine.dispose()
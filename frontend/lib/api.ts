@@ -12,7 +12,9 @@ export interface PriceSimulationResponse {
   price_patterns: PricePattern[];
   guard: {
     min_allowed_price_per_kg: number;
+    min_margin_rate: number | null;
     is_below_min: boolean;
+    warning_message: string | null;
   };
 }
 
@@ -28,6 +30,70 @@ export interface BreakEvenResponse {
   status: 'safe' | 'warning' | 'danger';
 }
 
+export interface BreakEvenSeriesResponse {
+  from_month: string;
+  to_month: string;
+  months: BreakEvenResponse[];
+}
+
+export interface BreakEvenSensitivityRequest {
+  year_month: string;
+  fixed_cost_changes?: number[];
+  unit_cost_changes?: number[];
+  price_changes?: number[];
+  categories?: string[] | null;
+}
+
+// Grid columns are flattened in (fixed_cost, unit_cost, price) order.
+export interface BreakEvenSensitivityResponse {
+  year_month: string;
+  categories: string[] | null;
+  fixed_cost_changes: number[];
+  unit_cost_changes: number[];
+  price_changes: number[];
+  shape: [number, number, number];
+  points: number;
+  base: BreakEvenResponse;
+  fixed_costs: number[];
+  current_revenue: number[];
+  variable_cost_rate: number[];
+  gross_margin_rate: number[];
+  break_even_revenue: number[];
+  achievement_rate: number[];
+  delta_revenue: number[];
+  status: BreakEvenResponse['status'][];
+}
+
+export interface ProductListItem {
+  product_code: string;
+  product_name: string;
+  category: string | null;
+  unit_cost_per_kg: number | null;
+  unit_price_per_kg: number | null;
+  target_margin_rate: number | null;
+  min_margin_rate: number | null;
+  unit: string;
+  updated_at: string | null;
+  price_patterns?: PricePattern[];
+}
+
+export interface ProductListResponse {
+  items: ProductListItem[];
+  next_cursor: string | null;
+  limit: number;
+}
+
+export interface ProductListParams {
+  cursor?: string | null;
+  limit?: number;
+  category?: string;
+  min_margin_rate?: number;
+  max_margin_rate?: number;
+  q?: string;
+  match?: 'prefix' | 'substring';
+  include_patterns?: boolean;
+}
+
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_BASE_URL ?? 'http://localhost:8000';
 
 export async function calculatePriceSimulation(payload: {
@@ -54,3 +120,43 @@ export async function getBreakEven(yearMonth: string): Promise<BreakEvenResponse
   }
   return res.json();
 }
+
+export async function getBreakEvenSeries(
+  fromMonth: string,
+  toMonth: string
+): Promise<BreakEvenSeriesResponse> {
+  const params = new URLSearchParams({ from: fromMonth, to: toMonth });
+  const res = await fetch(`${API_BASE_URL}/api/break-even/series?${params.toString()}`);
+  if (!res.ok) {
+    throw new Error('分岐点推移の取得に失敗しました');
+  }
+  return res.json();
+}
+
+export async function getBreakEvenSensitivity(
+  payload: BreakEvenSensitivityRequest
+): Promise<BreakEvenSensitivityResponse> {
+  const res = await fetch(`${API_BASE_URL}/api/break-even/sensitivity`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(payload)
+  });
+  if (!res.ok) {
+    throw new Error('感度分析に失敗しました');
+  }
+  return res.json();
+}
+
+export async function listProducts(params: ProductListParams = {}): Promise<ProductListResponse> {
+  const query = new URLSearchParams();
+  Object.entries(params).forEach(([key, value]) => {
+    if (value !== undefined && value !== null && value !== '') {
+      query.set(key, String(value));
+    }
+  });
+  const res = await fetch(`${API_BASE_URL}/api/products?${query.toString()}`);
+  if (!res.ok) {
+    throw new Error('商品一覧の取得に失敗しました');
+  }
+  return res.json();
+}